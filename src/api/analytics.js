@@ -7,6 +7,29 @@ export const analyticsApi = {
     return http.get(`/analytics/city/${cityId}`, params)
   },
 
+  // 批量获取多个分析数据（queries: [{ id, path, params, body }]，返回 { id: { code, message, data } }）
+  batchQuery(queries, params = {}) {
+    return http.post(`/analytics/batch`, { queries, params })
+  },
+
+  // 一次请求获取仪表盘首屏的全部图表数据
+  getDashboard(cityId, areaIds = []) {
+    return this.batchQuery([
+      { id: 'hotRanking', path: 'hot-ranking' },
+      { id: 'hourlyFlow', path: 'hourly-flow' },
+      { id: 'category', path: 'category-distribution' },
+      { id: 'sentiment', path: 'sentiment-analysis' },
+      { id: 'trend', path: 'consumption-trend' },
+      { id: 'radar', path: 'radar-comparison', body: { areaIds } },
+      { id: 'heatmap', path: 'heatmap' }
+    ], { cityId })
+  },
+
+  // 获取城市仪表盘快照（后台预渲染，data.sections 的键与 getDashboard 一致）
+  getDashboardSnapshot(cityId) {
+    return http.get(`/analytics/dashboard/${cityId}`)
+  },
+
   // 获取商圈热度排行数据
   getHotRankingData(cityId, params = {}) {
     return http.get(`/analytics/hot-ranking`, { cityId, ...params })
@@ -42,6 +65,11 @@ export const analyticsApi = {
     return http.get(`/analytics/heatmap`, { cityId, ...params })
   },
 
+  // 获取单个热力图瓦片（layer: area | store）
+  getHeatmapTile(z, x, y, layer = 'area') {
+    return http.get(`/analytics/heatmap/tiles/${z}/${x}/${y}`, { layer })
+  },
+
   // 获取实时数据
   getRealTimeData(cityId) {
     return http.get(`/analytics/realtime/${cityId}`)
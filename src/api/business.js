@@ -1,5 +1,8 @@
 import { http } from '../utils/request'
 
+// 商圈列表增量同步缓存：cityId -> { cursor, areas: Map<id, area> }
+const areaSyncCache = new Map()
+
 // 商圈相关API
 export const businessApi = {
   // 获取商圈列表
@@ -67,6 +70,42 @@ export const businessApi = {
     return http.get('/business-areas', { cityId: cityId })
   },
 
+  // 同步城市商圈列表：首次分页全量获取，之后只拉取游标之后的新增/修改/删除
+  async syncBusinessAreas(cityId) {
+    const entry = areaSyncCache.get(cityId)
+    if (entry) {
+      try {
+        let hasMore = true
+        while (hasMore) {
+          const delta = await http.get('/business-areas', { cityId, since: entry.cursor })
+          delta.deleted.forEach(id => entry.areas.delete(id))
+          delta.changes.forEach(area => entry.areas.set(area.id, area))
+          entry.cursor = delta.cursor
+          hasMore = delta.hasMore
+        }
+        return [...entry.areas.values()]
+      } catch (error) {
+        // 游标过期等情况回退到全量获取
+        areaSyncCache.delete(cityId)
+      }
+    }
+
+    const areas = new Map()
+    let cursor = null
+    let page = 1
+    let hasNext = true
+    while (hasNext) {
+      const data = await http.get('/business-areas', { cityId, page, pageSize: 100 })
+      // 以第一页的游标为准，分页期间发生的变更会在下次增量中返回
+      cursor = cursor || data.cursor
+      data.list.forEach(area => areas.set(area.id, area))
+      hasNext = data.hasNext
+      page += 1
+    }
+    areaSyncCache.set(cityId, { cursor, areas })
+    return [...areas.values()]
+  },
+
   // 获取商圈分析数据
   getAreaAnalytics(areaId) {
     return http.get(`/business-areas/${areaId}/analytics`)
@@ -82,11 +121,16 @@ export const businessApi = {
     return http.get('/business-areas/nearby', { longitude, latitude, radius })
   },
 
-  // 爬取商圈详细数据（大众点评等）
+  // 获取商圈详细数据（大众点评等），数据过期时服务端在后台刷新
   crawlAreaDetails(areaId) {
     return http.post(`/business-areas/${areaId}/crawl-details`)
   },
 
+  // 查询商圈后台刷新状态（wait: 等待刷新完成的秒数，长轮询）
+  getCrawlStatus(areaId, wait = 0) {
+    return http.get(`/business-areas/${areaId}/crawl-status`, { wait })
+  },
+
   // 检查商圈数据是否存在
   checkAreaDataExists(areaId) {
     return http.get(`/business-areas/${areaId}/check-data`)
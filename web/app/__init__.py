@@ -5,6 +5,7 @@ Flask应用工厂函数（修复CORS预检OPTIONS与限流冲突）
 """
 
 import os
+import sys
 from flask import Flask, jsonify, request, make_response
 from flask_jwt_extended import JWTManager
 from flask_limiter import Limiter
@@ -13,6 +14,17 @@ from flask_cors import CORS
 from config.config import Config
 from app.extensions import db, migrate, jwt
 from app.utils.response import success_response, error_response
+from app.utils import db_routing, sharding, sqlite
+
+def _running_migrations():
+    """是否为 flask db 命令（迁移完成前表结构与模型不一致）"""
+    if not sys.argv:
+        return False
+    program = os.path.normpath(sys.argv[0])
+    if os.path.basename(program) not in ('flask', 'flask.exe') \
+            and os.path.basename(os.path.dirname(program)) != 'flask':
+        return False
+    return 'db' in sys.argv[1:]
 
 def create_app(config_class=Config):
     """创建Flask应用实例"""
@@ -20,9 +32,21 @@ def create_app(config_class=Config):
     
     # 加载配置
     app.config.from_object(config_class)
+    app.config['SQLALCHEMY_BINDS'] = {
+        **app.config.get('SQLALCHEMY_BINDS', {}),
+        **db_routing.replica_binds(app.config),
+        **sharding.shard_binds(app.config)
+    }
+    if sqlite.is_sqlite(app.config.get('SQLALCHEMY_DATABASE_URI')):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite.engine_options(app.config)
 
     # ===== 初始化扩展 =====
     db.init_app(app)
+    # 在建立第一个连接之前为SQLite引擎（主库、副本和分片）注册 PRAGMA 和写线程的 BEGIN IMMEDIATE
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                sqlite.install(engine, app.config)
     migrate.init_app(app, db)
     jwt.init_app(app)
 
@@ -143,11 +167,14 @@ def create_app(config_class=Config):
     # 健康检查
     @app.route('/api/health')
     def health_check():
-        return success_response({
+        health = {
             'status': 'healthy',
             'service': '城市商圈消费热度分析API',
             'version': '1.0.0'
-        })
+        }
+        if db_routing.replica_keys(db.engines):
+            health['replicas'] = db_routing.status(db.engines)
+        return success_response(health)
     
     # API文档
     @app.route('/api/docs')
@@ -168,9 +195,57 @@ def create_app(config_class=Config):
     # 注册CLI命令
     from app.crawler.commands import register_commands
     register_commands(app)
+    from app.services.commands import register_commands as register_service_commands
+    register_service_commands(app)
     
-    # 创建数据库表
+    # flask db 命令：表结构由迁移管理，不自动建表，也不在启动时加载或重建派生数据
+    if _running_migrations():
+        return app
+    
+    # 创建数据库表（只读副本的表结构由主库同步，分片只创建店铺相关的表）
     with app.app_context():
-        db.create_all()
+        replicas = db_routing.replica_keys(db.engines)
+        db.create_all(bind_key=[key for key in db.engines if key not in replicas
+                                and not str(key).startswith(sharding.SHARD_PREFIX)])
+    sharding.init_app(app)
+    
+    # 初始化搜索索引
+    from app.services import search_index
+    search_index.init_app(app)
+    
+    # 加载城市参考数据（前缀树、KD树、行政层级）
+    from app.services import reference_data
+    reference_data.init_app(app)
+    
+    # 注册商圈店铺统计的增量维护
+    from app.services import store_stats
+    store_stats.init_app(app)
+    
+    # 标签/设施关联（列表接口按标签筛选）
+    from app.services import labels
+    labels.init_app(app)
+    
+    # 营业时段位图（openAt=/openNow= 筛选，写入时生成）
+    from app.services import opening_index
+    
+    # 商圈店铺数（爬取批次后按店铺汇总更新，店铺按边界归属）
+    from app.services import area_boundaries
+    
+    # 商圈评分（爬取批次后由店铺数据重新计算热度、评分、人均消费）
+    from app.services import area_scoring
+    
+    # 城市/区县汇总（爬取批次结束后刷新）
+    from app.services import region_stats
+    region_stats.init_app(app)
+    
+    # 注册指标历史记录和排行榜快照（爬取批次后处理阶段）
+    from app.services import metric_history, hot_ranking
+    
+    # 变更事件发件箱及其处理器（热力图瓦片按事件增量重建）
+    from app.services import outbox, heatmap_tiles
+    heatmap_tiles.init_app(app)
+    
+    # 城市仪表盘快照（爬取批次后在后台重新生成）
+    from app.services import dashboard_snapshot
     
     return app
@@ -5,54 +5,67 @@
 """
 
 import random
-from datetime import datetime, timedelta
-from flask import Blueprint, request
-from sqlalchemy import func, desc
+from datetime import datetime
+from flask import Blueprint, request, current_app
+from sqlalchemy import func
 from app.extensions import db
 from app.models.city import City
 from app.models.business_area import BusinessArea
 from app.models.store import Store
-from app.utils.response import success_response, error_response
+from app.models.statistics import RegionStats
+from app.utils.response import (
+    success_response, error_response, json_response, response_format, compact_rows, make_fragment, ROW_FORMATS,
+    accepted_encoding, precompressed_response
+)
+from app.utils import mvt, request_cache, sharding
+from app.services import region_stats, metric_history, hot_ranking, heatmap_tiles, delta_sync, reference_data
+from app.services import batch_query as batch_query_service, dashboard_snapshot, distributions
 
 # 创建数据分析蓝图
 analytics_bp = Blueprint('analytics', __name__)
 
+def _city_record(city_id):
+    """城市记录（读取内存参考数据，不查询数据库）"""
+    return reference_data.get_snapshot().records.get(city_id)
+
+def _city_summary(city_id):
+    """城市汇总（未指定城市时为所有城市合计），同一请求内只读取一次"""
+    def load():
+        stats = region_stats.get_totals(city_id or None)
+        if stats is None:
+            return None
+        summary = {column.name: getattr(stats, column.name) for column in RegionStats.__table__.columns}
+        summary['avg_area_rating'] = stats.avg_area_rating
+        summary['type_distribution'] = stats.get_type_distribution()
+        summary['level_distribution'] = stats.get_level_distribution()
+        return summary
+    return request_cache.memoize(('city_summary', city_id or None), load)
+
 @analytics_bp.route('/city/<city_id>', methods=['GET', 'OPTIONS'])
 def get_city_analytics(city_id):
     """获取城市整体分析数据"""
     try:
-        city = City.query.get(city_id)
+        city = _city_record(city_id)
         if not city:
             return error_response('城市不存在', 404)
         
-        # 获取城市商圈统计
-        business_areas = city.business_areas.all()
-        total_stores = sum(area.store_count for area in business_areas)
-        avg_rating = sum(area.rating for area in business_areas if area.rating > 0) / max(len([area for area in business_areas if area.rating > 0]), 1)
-        total_hot_value = sum(area.hot_value for area in business_areas)
+        # 读取城市汇总（按爬取批次刷新）
+        stats = _city_summary(city_id)
+        districts = region_stats.get_district_stats(city_id)
         
         analytics_data = {
-            'city_info': city.to_dict(),
+            'city_info': city,
             'overview': {
-                'total_business_areas': len(business_areas),
-                'total_stores': total_stores,
-                'avg_rating': round(avg_rating, 2),
-                'total_hot_value': total_hot_value,
-                'active_areas': len([area for area in business_areas if area.hot_value > 5000])
+                'total_business_areas': stats['area_count'] if stats else 0,
+                'total_stores': stats['area_store_count'] if stats else 0,
+                'avg_rating': round(stats['avg_area_rating'], 2) if stats else 0,
+                'total_hot_value': stats['hot_value_sum'] if stats else 0,
+                'active_areas': stats['active_area_count'] if stats else 0
             },
             'area_distribution': {
-                'by_type': dict(
-                    db.session.query(BusinessArea.type, func.count(BusinessArea.id))
-                    .filter_by(city_id=city_id)
-                    .group_by(BusinessArea.type)
-                    .all()
-                ),
-                'by_level': dict(
-                    db.session.query(BusinessArea.level, func.count(BusinessArea.id))
-                    .filter_by(city_id=city_id)
-                    .group_by(BusinessArea.level)
-                    .all()
-                )
+                'by_type': stats['type_distribution'] if stats else {},
+                'by_level': stats['level_distribution'] if stats else {},
+                'by_district': {district.region_id: district.area_count for district in districts}
             }
         }
         
@@ -67,23 +80,27 @@ def get_hot_ranking_data():
     try:
         city_id = request.args.get('cityId', '')
         limit = int(request.args.get('limit', 10))
+        page = int(request.args.get('page', 1))
         
-        query = BusinessArea.query
-        if city_id:
-            query = query.filter_by(city_id=city_id)
+        # 从内存排行榜读取一页
+        _, items = hot_ranking.get_ranking(city_id or None, (page - 1) * limit, limit)
         
-        areas = query.order_by(desc(BusinessArea.hot_value)).limit(limit).all()
+        # 最近一周热度增长率（来自指标历史）
+        growth = metric_history.growth_rates(
+            [item['id'] for item in items],
+            {item['cityId'] for item in items},
+            days=int(request.args.get('days', 7))
+        )
         
         ranking_data = []
-        for i, area in enumerate(areas):
-            # 模拟增长率数据
-            growth_rate = round(random.uniform(-5, 25), 1)
+        for item in items:
             ranking_data.append({
-                'name': area.name,
-                'hotValue': area.hot_value,
-                'value': area.hot_value,
-                'growthRate': growth_rate,
-                'rank': i + 1
+                'name': item['name'],
+                'hotValue': item['hotValue'],
+                'value': item['hotValue'],
+                'growthRate': growth.get(item['id']),
+                'rank': item['rank'],
+                'rankDelta': item['rankDelta']
             })
         
         return success_response(ranking_data, '获取热度排行数据成功')
@@ -98,7 +115,7 @@ def get_hourly_flow_data():
         city_id = request.args.get('cityId', '')
         date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
         
-        # 生成24小时客流模拟数据
+        # 24小时客流分布曲线（爬取数据只有日均客流，小时分布沿用典型曲线）
         hours = [f"{i:02d}:00" for i in range(24)]
         
         # 工作日客流模式
@@ -113,18 +130,28 @@ def get_hourly_flow_data():
             1100, 1350, 1200, 980, 850, 1180, 1450, 1280, 950, 680, 450, 320
         ]
         
-        # 根据城市调整数据
-        if city_id:
-            city = City.query.get(city_id)
+        # 按最近四周工作日/周末的实际日均客流，将小时分布曲线换算为客流量
+        weekday_total, weekend_total = metric_history.daily_flow_by_daytype(city_id or None)
+        if weekday_total or weekend_total:
+            weekday_base, weekend_base = sum(weekday_flow), sum(weekend_flow)
+            if weekday_total:
+                weekday_flow = [int(x * weekday_total / weekday_base) for x in weekday_flow]
+            if weekend_total:
+                weekend_flow = [int(x * weekend_total / weekend_base) for x in weekend_flow]
+        
+        # 没有历史数据时按城市规模调整
+        elif city_id:
+            city = _city_record(city_id)
             if city:
                 # 根据城市规模调整客流量
                 multiplier = 1.0
-                if city.population:
-                    if city.population > 10000000:  # 超大城市
+                population = city['population']
+                if population:
+                    if population > 10000000:  # 超大城市
                         multiplier = 1.5
-                    elif city.population > 5000000:  # 大城市
+                    elif population > 5000000:  # 大城市
                         multiplier = 1.2
-                    elif city.population < 1000000:  # 小城市
+                    elif population < 1000000:  # 小城市
                         multiplier = 0.8
                 
                 weekday_flow = [int(x * multiplier) for x in weekday_flow]
@@ -148,23 +175,31 @@ def get_category_distribution():
     try:
         city_id = request.args.get('cityId', '')
         
-        # 构建查询
-        if city_id:
-            # 通过商圈关联查询该城市的店铺分类分布
-            category_data = db.session.query(
+        def category_totals(area_ids=None):
+            query = db.session.query(
                 Store.category,
                 func.count(Store.id).label('count'),
                 func.sum(Store.avg_price * Store.review_count).label('total_value')
-            ).join(BusinessArea).filter(
-                BusinessArea.city_id == city_id
-            ).group_by(Store.category).all()
+            )
+            if area_ids is not None:
+                query = query.filter(Store.business_area_id.in_(area_ids))
+            return [tuple(row) for row in query.group_by(Store.category).all()]
+
+        # 构建查询
+        if city_id:
+            # 先查该城市的商圈，再按商圈ID统计店铺分类（店铺可能在城市所在的分片中）
+            area_ids = [row[0] for row in db.session.query(BusinessArea.id).filter(BusinessArea.city_id == city_id)]
+            with sharding.use_city(city_id):
+                category_data = category_totals(area_ids)
         else:
-            # 全局统计
-            category_data = db.session.query(
-                Store.category,
-                func.count(Store.id).label('count'),
-                func.sum(Store.avg_price * Store.review_count).label('total_value')
-            ).group_by(Store.category).all()
+            # 全局统计：合并各分片的结果
+            merged = {}
+            for _, rows in sharding.fan_out(category_totals):
+                for category, count, total_value in rows:
+                    totals = merged.setdefault(category, [0, 0])
+                    totals[0] += count
+                    totals[1] += total_value or 0
+            category_data = [(category, count, total_value) for category, (count, total_value) in merged.items()]
         
         # 定义分类映射和颜色
         category_mapping = {
@@ -200,30 +235,53 @@ def get_category_distribution():
     except Exception as e:
         return error_response(f'获取消费类型分布数据失败: {str(e)}', 500)
 
+@analytics_bp.route('/distribution', methods=['GET', 'OPTIONS'])
+def get_distribution():
+    """
+    店铺价格、评分、评价数的分布（商圈 areaId / 区县 districtId / 城市 cityId 范围）
+    fields: avg_price,rating,review_count（默认全部）；quantiles: 0.5,0.9 或 50,90；
+    bins: 分箱数（如 10）或边界（如 0,50,100,200）
+    """
+    try:
+        scope = next(((level, request.args[name]) for level, name in
+                      (('area', 'areaId'), ('district', 'districtId'), ('city', 'cityId'))
+                      if request.args.get(name)), None)
+        if scope is None:
+            return error_response('需要提供 areaId、districtId 或 cityId', 400)
+        fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+        unknown = [field for field in fields if field not in distributions.FIELDS]
+        if unknown:
+            return error_response(f"不支持的字段: {','.join(unknown)}", 400)
+        try:
+            quantiles = distributions.parse_quantiles(request.args.get('quantiles'))
+            bins = distributions.parse_bins(request.args.get('bins'))
+        except ValueError as e:
+            return error_response(f'分布参数格式错误: {str(e)}', 400)
+        
+        result = distributions.describe(*scope, fields=fields or None, quantiles=quantiles, bins=bins)
+        if result is None:
+            return error_response('范围不存在', 404)
+        
+        return success_response({'level': scope[0], 'id': scope[1], 'fields': result}, '获取分布数据成功')
+        
+    except Exception as e:
+        return error_response(f'获取分布数据失败: {str(e)}', 500)
+
 @analytics_bp.route('/sentiment-analysis', methods=['GET', 'OPTIONS'])
 def get_sentiment_analysis():
     """获取情感分析数据"""
     try:
         city_id = request.args.get('cityId', '')
         
-        # 基于评分计算情感分析（模拟）
-        if city_id:
-            stores = db.session.query(Store).join(BusinessArea).filter(
-                BusinessArea.city_id == city_id
-            ).all()
-        else:
-            stores = Store.query.all()
+        # 基于店铺评分分布计算情感分析（读取城市汇总，未指定城市时合计所有城市）
+        stats = _city_summary(city_id)
+        total_stores = stats['store_count'] if stats else 0
         
-        if stores:
-            total_stores = len(stores)
-            high_rating = len([s for s in stores if s.rating >= 4.0])
-            medium_rating = len([s for s in stores if 3.0 <= s.rating < 4.0])
-            low_rating = len([s for s in stores if s.rating < 3.0])
-            
+        if total_stores:
             sentiment_data = {
-                'positive': round(high_rating / total_stores * 100, 1),
-                'neutral': round(medium_rating / total_stores * 100, 1),
-                'negative': round(low_rating / total_stores * 100, 1)
+                'positive': round(stats['high_rating_count'] / total_stores * 100, 1),
+                'neutral': round(stats['medium_rating_count'] / total_stores * 100, 1),
+                'negative': round(stats['low_rating_count'] / total_stores * 100, 1)
             }
         else:
             # 默认数据
@@ -245,27 +303,9 @@ def get_consumption_trend():
         city_id = request.args.get('cityId', '')
         days = int(request.args.get('days', 30))
         
-        # 生成最近N天的日期
-        end_date = datetime.now()
-        dates = []
-        sales_data = []
-        customer_data = []
-        
-        for i in range(days):
-            date = end_date - timedelta(days=days-1-i)
-            dates.append(date.strftime('%m-%d'))
-            
-            # 模拟销售额和客流量数据
-            base_sales = random.randint(12000, 18000)
-            base_customers = random.randint(2500, 4000)
-            
-            # 周末数据通常更高
-            if date.weekday() >= 5:  # 周末
-                base_sales = int(base_sales * 1.3)
-                base_customers = int(base_customers * 1.4)
-            
-            sales_data.append(base_sales)
-            customer_data.append(base_customers)
+        # 按天降采样的指标历史：客流合计与估算消费额（客单价 × 客流）
+        dates, sales_data, customer_data = metric_history.daily_totals(city_id or None, days)
+        dates = [date.strftime('%m-%d') for date in dates]
         
         trend_data = {
             'dates': dates,
@@ -317,14 +357,16 @@ def get_radar_comparison_data():
             rating = getattr(area, 'rating', 0) or 0
             store_count = getattr(area, 'store_count', 0) or 0
             facilities = getattr(area, 'facilities', []) or []
+            # 缺失指标的模拟值按商圈固定，同一商圈每次请求（及仪表盘快照）结果一致
+            rng = random.Random(area.id)
             
             values = [
-                min(100, max(0, customer_flow / 100 if customer_flow else random.randint(30, 80))),  # 客流量
-                min(100, max(0, avg_consumption / 10 if avg_consumption else random.randint(40, 90))),  # 消费水平
-                min(100, max(0, rating * 20 if rating else random.randint(60, 95))),  # 用户评价
-                random.randint(60, 95),  # 交通便利（模拟）
-                min(100, len(facilities) * 15 if facilities else random.randint(40, 85)),  # 配套设施
-                min(100, max(0, store_count / 5 if store_count else random.randint(20, 70)))  # 品牌丰富度
+                min(100, max(0, customer_flow / 100 if customer_flow else rng.randint(30, 80))),  # 客流量
+                min(100, max(0, avg_consumption / 10 if avg_consumption else rng.randint(40, 90))),  # 消费水平
+                min(100, max(0, rating * 20 if rating else rng.randint(60, 95))),  # 用户评价
+                rng.randint(60, 95),  # 交通便利（模拟）
+                min(100, len(facilities) * 15 if facilities else rng.randint(40, 85)),  # 配套设施
+                min(100, max(0, store_count / 5 if store_count else rng.randint(20, 70)))  # 品牌丰富度
             ]
             
             radar_data.append({
@@ -359,38 +401,104 @@ def get_radar_comparison_data():
     except Exception as e:
         return error_response(f'获取雷达图对比数据失败: {str(e)}', 500)
 
+def _parse_bbox(value):
+    """解析 bbox 参数 minLng,minLat,maxLng,maxLat"""
+    bbox = tuple(float(part) for part in value.split(','))
+    if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise ValueError(value)
+    return bbox
+
 @analytics_bp.route('/heatmap', methods=['GET', 'OPTIONS'])
 def get_heatmap_data():
-    """获取热力图数据"""
+    """获取热力图数据（按 bbox + 缩放级别读取预聚合瓦片的网格单元）"""
     try:
         city_id = request.args.get('cityId', '')
         zoom = int(request.args.get('zoom', 10))
+        layer = request.args.get('layer', 'area')
+        if layer not in heatmap_tiles.LAYERS:
+            return error_response('不支持的热力图图层', 400)
+        fmt = response_format()
+        if fmt is None:
+            return error_response('不支持的响应格式', 406)
+        
+        if request.args.get('bbox'):
+            try:
+                bbox = _parse_bbox(request.args['bbox'])
+            except ValueError:
+                return error_response('bbox格式应为 minLng,minLat,maxLng,maxLat', 400)
+        else:
+            # 未指定视野时取城市（或全部）商圈的范围
+            bbox = heatmap_tiles.extent(city_id)
+            if bbox is None:
+                return success_response({'layer': layer, 'zoom': zoom, 'bbox': None, 'bins': compact_rows([], fmt)},
+                                        '获取热力图数据成功', fmt=fmt)
+        
+        until = delta_sync.horizon()
+        since = request.args.get('since')  # 增量同步游标：只返回之后重建过的瓦片
+        if since:
+            try:
+                since_time, _ = delta_sync.decode_cursor(since)
+            except ValueError as e:
+                return error_response(str(e), 400)
+            z, reset, tiles = heatmap_tiles.changed_tiles(layer, bbox, zoom, since_time, max(until, since_time))
+            return success_response({
+                'layer': layer,
+                'zoom': z,
+                'bbox': list(bbox),
+                'reset': reset,
+                'tiles': [dict(tile, bins=compact_rows(tile['bins'], fmt)) for tile in tiles],
+                'cursor': delta_sync.encode_cursor(max(until, since_time))
+            }, '获取热力图增量成功', compress=True, fmt=fmt)
+        
+        z, bins = heatmap_tiles.query_bbox(layer, bbox, zoom)
+        return success_response({
+            'layer': layer,
+            'zoom': z,
+            'bbox': list(bbox),
+            'bins': compact_rows(bins, fmt),
+            'cursor': delta_sync.encode_cursor(until)
+        }, '获取热力图数据成功', compress=True, fmt=fmt)
         
-        # 构建查询
-        query = BusinessArea.query
-        if city_id:
-            query = query.filter_by(city_id=city_id)
+    except Exception as e:
+        return error_response(f'获取热力图数据失败: {str(e)}', 500)
+
+@analytics_bp.route('/heatmap/tiles/<int:z>/<int:x>/<int:y>', methods=['GET', 'OPTIONS'])
+def get_heatmap_tile(z, x, y):
+    """获取单个热力图瓦片（支持 Mapbox Vector Tile）"""
+    try:
+        layer = request.args.get('layer', 'area')
+        if layer not in heatmap_tiles.LAYERS:
+            return error_response('不支持的热力图图层', 400)
+        fmt = response_format((*ROW_FORMATS, 'mvt'))
+        if fmt is None:
+            return error_response('不支持的响应格式', 406)
         
-        areas = query.all()
+        bins = heatmap_tiles.get_tile(layer, z, x, y)
+        if bins is None:
+            return error_response('瓦片坐标超出范围', 400)
         
-        heatmap_data = []
-        for area in areas:
-            heatmap_data.append({
-                'name': area.name,
-                'longitude': area.longitude,
-                'latitude': area.latitude,
-                'hotValue': area.hot_value,
-                'value': area.hot_value,
-                'type': area.type,
-                'level': area.level,
-                'rating': area.rating,
-                'storeCount': area.store_count
-            })
+        if fmt == 'mvt':
+            features = heatmap_tiles.tile_features(z, x, y, bins, mvt.DEFAULT_EXTENT)
+            return json_response(mvt.encode({layer: features}), compress=True, fmt=fmt)
         
-        return success_response(heatmap_data, '获取热力图数据成功')
+        return success_response({'layer': layer, 'z': z, 'x': x, 'y': y, 'bins': compact_rows(bins, fmt)},
+                                '获取热力图瓦片成功', compress=True, fmt=fmt)
         
     except Exception as e:
-        return error_response(f'获取热力图数据失败: {str(e)}', 500)
+        return error_response(f'获取热力图瓦片失败: {str(e)}', 500)
+
+@analytics_bp.route('/dashboard/<city_id>', methods=['GET', 'OPTIONS'])
+def get_dashboard_snapshot(city_id):
+    """获取城市仪表盘快照（预渲染、预压缩，支持 If-None-Match）"""
+    try:
+        snapshot = dashboard_snapshot.load(city_id, accepted_encoding())
+        if snapshot is None:
+            return error_response('城市不存在', 404)
+        etag, body, encoding = snapshot
+        return precompressed_response(body, etag, encoding)
+        
+    except Exception as e:
+        return error_response(f'获取仪表盘快照失败: {str(e)}', 500)
 
 @analytics_bp.route('/realtime/<city_id>', methods=['GET', 'OPTIONS'])
 def get_realtime_data(city_id):
@@ -430,4 +538,31 @@ def get_realtime_data(city_id):
         return success_response(realtime_data, '获取实时数据成功')
         
     except Exception as e:
-        return error_response(f'获取实时数据失败: {str(e)}', 500)
\ No newline at end of file
+        return error_response(f'获取实时数据失败: {str(e)}', 500)
+@analytics_bp.route('/batch', methods=['POST', 'OPTIONS'])
+def batch_query():
+    """
+    批量执行多个分析查询，合并为一个响应
+    请求体：{"params": {公共参数}, "queries": [{"id": "ranking", "path": "hot-ranking", "params": {...}}, ...]}
+    带 body 的子查询按POST执行；响应 data 为 {子查询ID: 子查询的完整响应}，单个子查询失败不影响其他子查询
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        queries = payload.get('queries')
+        max_queries = current_app.config.get('BATCH_MAX_QUERIES', 20)
+        if not isinstance(queries, list) or not queries:
+            return error_response('queries不能为空', 400)
+        if len(queries) > max_queries:
+            return error_response(f'单次最多{max_queries}个子查询', 400)
+        try:
+            plans = batch_query_service.plan(queries, payload.get('params') or {})
+        except ValueError as e:
+            return error_response(str(e), 400)
+        
+        # 子查询共享请求级查找缓存，分组并发执行
+        results = batch_query_service.execute(plans)
+        return success_response({query_id: make_fragment(body) for query_id, body in results},
+                                '批量查询完成', compress=True)
+        
+    except Exception as e:
+        return error_response(f'批量查询失败: {str(e)}', 500)
@@ -4,14 +4,20 @@
 商圈相关API接口
 """
 
-from flask import Blueprint, request
+from datetime import datetime
+from flask import Blueprint, request, current_app
 from flask_jwt_extended import jwt_required
-from sqlalchemy import or_, desc, func
+from sqlalchemy import or_, desc
 from app.extensions import db
 from app.models.business_area import BusinessArea
 from app.models.store import Store
 from app.models.city import City
-from app.utils.response import success_response, error_response, paginated_response
+from app.models.discovery import AreaCandidate
+from app.utils.response import success_response, error_response, paginated_response, response_format, compact_rows
+from app.utils.fragments import area_card_fragment
+from app.services import search_index, post_crawl, metric_history, hot_ranking, delta_sync, area_refresh, labels, store_search, opening_index
+from app.services import area_boundaries, crawl_writes, write_queue
+from app.services.store_stats import get_area_with_stats
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,6 +25,50 @@ logger = logging.getLogger(__name__)
 # 创建商圈蓝图
 business_bp = Blueprint('business', __name__)
 
+def _delta_response(load_changes, fmt, message, fragment=None):
+    """增量同步响应：{'changes': 新增/修改的行, 'deleted': 删除的ID, 'cursor', 'hasMore'}"""
+    try:
+        rows, deleted, cursor, has_more = load_changes()
+    except delta_sync.CursorExpired:
+        return error_response('同步游标已过期，请重新获取全量数据', 410)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    
+    if fmt == 'json' and fragment:
+        items = [fragment(row) for row in rows]
+    else:
+        items = [row.to_dict() for row in rows]
+    
+    return success_response({
+        'changes': compact_rows(items, fmt),
+        'deleted': deleted,
+        'cursor': cursor,
+        'hasMore': has_more
+    }, message, compress=True, fmt=fmt)
+
+def _label_filter(model):
+    """tags=、facilities=（逗号分隔）筛选条件，match=any 时命中任一即可，默认需全部命中"""
+    return labels.criterion(
+        model,
+        tags=labels.parse(request.args.get('tags')),
+        facilities=labels.parse(request.args.get('facilities')),
+        match=request.args.get('match', 'all')
+    )
+
+def _open_at():
+    """openAt=（ISO时间或 HH:MM）/ openNow=true → 时间，未筛选时返回 None；格式错误抛出 ValueError"""
+    open_at = request.args.get('openAt')
+    if open_at:
+        return opening_index.parse_time(open_at)
+    if request.args.get('openNow', '').lower() in ('true', '1'):
+        return datetime.now()
+    return None
+
+def _open_filter(model):
+    """营业中筛选条件，未筛选时返回 None"""
+    when = _open_at()
+    return opening_index.criterion(model, when) if when else None
+
 @business_bp.route('', methods=['GET', 'OPTIONS'])
 def get_business_areas():
     """获取商圈列表"""
@@ -31,22 +81,41 @@ def get_business_areas():
         per_page = int(request.args.get('pageSize', 20))
         sort_by = request.args.get('sortBy', 'hot_value')  # 排序字段
         sort_order = request.args.get('sortOrder', 'desc')  # 排序顺序
+        since = request.args.get('since')  # 增量同步游标
+        fmt = response_format()
+        if fmt is None:
+            return error_response('不支持的响应格式', 406)
+        
+        # 类型/级别筛选
+        filters = []
+        if area_type:
+            filters.append(BusinessArea.type == area_type)
+        if level:
+            filters.append(BusinessArea.level == level)
+        label_filter = _label_filter(BusinessArea)
+        if label_filter is not None:
+            filters.append(label_filter)
+        try:
+            open_filter = _open_filter(BusinessArea)
+        except ValueError:
+            return error_response('openAt 参数格式错误', 400)
+        if open_filter is not None:
+            filters.append(open_filter)
+        
+        if since:
+            return _delta_response(
+                lambda: delta_sync.area_changes(since, city_id, filters), fmt,
+                '获取商圈增量成功', area_card_fragment
+            )
+        cursor = delta_sync.initial_cursor()
         
         # 构建查询
-        query = BusinessArea.query
+        query = BusinessArea.query.filter(*filters)
         
         # 城市筛选
         if city_id:
             query = query.filter_by(city_id=city_id)
         
-        # 类型筛选
-        if area_type:
-            query = query.filter_by(type=area_type)
-        
-        # 级别筛选
-        if level:
-            query = query.filter_by(level=level)
-        
         # 排序
         if sort_by == 'hot_value':
             order_column = BusinessArea.hot_value
@@ -69,14 +138,21 @@ def get_business_areas():
             error_out=False
         )
         
-        business_areas = [area.to_dict() for area in pagination.items]
+        # JSON 直接拼接预编码片段，列式格式需要按字段取值
+        if fmt == 'json':
+            business_areas = [area_card_fragment(area) for area in pagination.items]
+        else:
+            business_areas = [area.to_dict() for area in pagination.items]
         
         return paginated_response(
             items=business_areas,
             total=pagination.total,
             page=page,
             per_page=per_page,
-            message='获取商圈列表成功'
+            message='获取商圈列表成功',
+            compress=True,
+            fmt=fmt,
+            cursor=cursor
         )
         
     except Exception as e:
@@ -86,24 +162,15 @@ def get_business_areas():
 def get_business_area_by_id(area_id):
     """根据ID获取商圈详情"""
     try:
-        area = BusinessArea.query.get(area_id)
+        # 商圈与店铺统计汇总一次读取
+        area, store_stats = get_area_with_stats(area_id)
         
         if not area:
             return error_response('商圈不存在', 404)
         
         # 获取商圈详细信息，包括店铺统计
         area_dict = area.to_dict()
-        area_dict['store_statistics'] = {
-            'total_stores': area.stores.count(),
-            'by_category': dict(
-                db.session.query(Store.category, func.count(Store.id))
-                .filter_by(business_area_id=area_id)
-                .group_by(Store.category)
-                .all()
-            ),
-            'avg_rating': db.session.query(func.avg(Store.rating)).filter_by(business_area_id=area_id).scalar() or 0,
-            'recommended_count': area.stores.filter_by(is_recommended=True).count()
-        }
+        area_dict['store_statistics'] = store_stats.to_summary_dict()
         
         return success_response(area_dict, '获取商圈详情成功')
         
@@ -112,16 +179,43 @@ def get_business_area_by_id(area_id):
 
 @business_bp.route('/search', methods=['GET', 'OPTIONS'])
 def search_business_areas():
-    """搜索商圈"""
+    """搜索商圈（支持中文、拼音及首字母，可按距离加权）"""
     try:
         keyword = request.args.get('keyword', '').strip()
         city_id = request.args.get('cityId', '')
         area_type = request.args.get('type', '')
+        longitude = request.args.get('longitude', type=float)
+        latitude = request.args.get('latitude', type=float)
         
         if not keyword:
             return error_response('搜索关键词不能为空', 400)
         
-        # 构建查询
+        if search_index.is_enabled():
+            results = search_index.search(
+                'area', keyword, city_id=city_id, category=area_type,
+                longitude=longitude, latitude=latitude, limit=20,
+                weights=current_app.config.get('SEARCH_RANK_WEIGHTS')
+            )
+            areas_by_id = {
+                area.id: area
+                for area in BusinessArea.query.filter(BusinessArea.id.in_([r[0] for r in results])).all()
+            }
+            
+            area_list = []
+            for area_id, score, distance in results:
+                area = areas_by_id.get(area_id)
+                if not area:
+                    continue
+                if distance is None:
+                    area_list.append(area_card_fragment(area))
+                else:
+                    area_dict = area.to_dict()
+                    area_dict['distance'] = round(distance * 1000)
+                    area_list.append(area_dict)
+            
+            return success_response(area_list, '搜索商圈成功')
+        
+        # 索引不可用时回退到LIKE查询
         query = BusinessArea.query.filter(BusinessArea.name.contains(keyword))
         
         if city_id:
@@ -134,7 +228,7 @@ def search_business_areas():
         areas = query.order_by(desc(BusinessArea.hot_value)).limit(20).all()
         
         return success_response(
-            [area.to_dict() for area in areas],
+            [area_card_fragment(area) for area in areas],
             '搜索商圈成功'
         )
         
@@ -147,24 +241,31 @@ def get_hot_ranking():
     try:
         city_id = request.args.get('cityId', '')
         limit = int(request.args.get('limit', 10))
+        page = int(request.args.get('page', 1))
         
-        # 构建查询
-        query = BusinessArea.query
-        
-        if city_id:
-            query = query.filter_by(city_id=city_id)
+        # 从内存排行榜读取一页，只按主键加载该页商圈
+        _, items = hot_ranking.get_ranking(city_id or None, (page - 1) * limit, limit)
+        areas_by_id = {
+            area.id: area
+            for area in BusinessArea.query.filter(BusinessArea.id.in_([item['id'] for item in items])).all()
+        }
         
-        # 按热度值排序
-        areas = query.order_by(desc(BusinessArea.hot_value)).limit(limit).all()
+        # 最近一周热度增长率（来自指标历史）
+        growth = metric_history.growth_rates(
+            [item['id'] for item in items],
+            {item['cityId'] for item in items},
+            days=int(request.args.get('days', 7))
+        )
         
-        # 计算增长率（这里使用模拟数据）
         ranking_data = []
-        for i, area in enumerate(areas):
+        for item in items:
+            area = areas_by_id.get(item['id'])
+            if area is None:
+                continue
             area_dict = area.to_dict()
-            # 模拟增长率计算
-            import random
-            area_dict['growthRate'] = round(random.uniform(-5, 20), 1)
-            area_dict['rank'] = i + 1
+            area_dict['growthRate'] = growth.get(item['id'])
+            area_dict['rank'] = item['rank']
+            area_dict['rankDelta'] = item['rankDelta']
             ranking_data.append(area_dict)
         
         return success_response(ranking_data, '获取商圈热度排行成功')
@@ -172,44 +273,88 @@ def get_hot_ranking():
     except Exception as e:
         return error_response(f'获取商圈热度排行失败: {str(e)}', 500)
 
+@business_bp.route('/candidates', methods=['GET', 'OPTIONS'])
+def get_area_candidates():
+    """获取商圈发现（店铺密度聚类）得到的候选商圈及对照结果，status 可筛选 new/matched/merge/unsupported"""
+    try:
+        city_id = request.args.get('cityId', '')
+        if not city_id:
+            return error_response('需要提供 cityId', 400)
+        status = request.args.get('status', '')
+        
+        query = AreaCandidate.query.filter_by(city_id=city_id)
+        if status:
+            query = query.filter(AreaCandidate.status.in_(labels.parse(status)))
+        candidates = query.order_by(desc(AreaCandidate.store_count)).all()
+        
+        return success_response([candidate.to_dict() for candidate in candidates], '获取候选商圈成功', compress=True)
+        
+    except Exception as e:
+        return error_response(f'获取候选商圈失败: {str(e)}', 500)
+
 @business_bp.route('/<area_id>/stats', methods=['GET', 'OPTIONS'])
 def get_business_area_stats(area_id):
     """获取商圈统计数据"""
     try:
-        area = BusinessArea.query.get(area_id)
+        area, store_stats = get_area_with_stats(area_id)
         
         if not area:
             return error_response('商圈不存在', 404)
         
         # 获取统计数据
-        stats = {
-            'basic_info': area.to_dict(),
-            'store_count': area.stores.count(),
-            'category_distribution': dict(
-                db.session.query(Store.category, func.count(Store.id))
-                .filter_by(business_area_id=area_id)
-                .group_by(Store.category)
-                .all()
-            ),
-            'rating_distribution': {
-                'avg_rating': db.session.query(func.avg(Store.rating)).filter_by(business_area_id=area_id).scalar() or 0,
-                'high_rating_count': area.stores.filter(Store.rating >= 4.0).count(),
-                'medium_rating_count': area.stores.filter(Store.rating >= 3.0, Store.rating < 4.0).count(),
-                'low_rating_count': area.stores.filter(Store.rating < 3.0).count()
-            },
-            'price_distribution': {
-                'avg_price': db.session.query(func.avg(Store.avg_price)).filter_by(business_area_id=area_id).scalar() or 0,
-                'high_price_count': area.stores.filter(Store.avg_price >= 100).count(),
-                'medium_price_count': area.stores.filter(Store.avg_price >= 50, Store.avg_price < 100).count(),
-                'low_price_count': area.stores.filter(Store.avg_price < 50).count()
-            }
-        }
+        stats = {'basic_info': area.to_dict()}
+        stats.update(store_stats.to_dict())
         
         return success_response(stats, '获取商圈统计数据成功')
         
     except Exception as e:
         return error_response(f'获取商圈统计数据失败: {str(e)}', 500)
 
+@business_bp.route('/<area_id>/boundary', methods=['GET', 'OPTIONS'])
+def get_area_boundary(area_id):
+    """获取商圈边界多边形 [[经度, 纬度], ...] 及来源（aoi/hull/manual）"""
+    try:
+        area = db.session.get(BusinessArea, area_id)
+        if not area:
+            return error_response('商圈不存在', 404)
+        
+        return success_response({
+            'area_id': area.id,
+            'boundary': area.get_boundary(),
+            'source': area.boundary_source,
+            'area': area.area
+        }, '获取商圈边界成功')
+        
+    except Exception as e:
+        return error_response(f'获取商圈边界失败: {str(e)}', 500)
+
+@business_bp.route('/<area_id>/boundary', methods=['PUT'])
+def update_area_boundary(area_id):
+    """
+    设置商圈边界：boundary 为 [[经度, 纬度], ...] 或 GeoJSON Polygon/MultiPolygon，为空时清除；
+    source 为 manual（默认）或 aoi。设置后按边界重新归属所在城市的店铺
+    """
+    try:
+        data = request.get_json() or {}
+        boundary = data.get('boundary')
+        source = data.get('source', 'manual')
+        if source not in ('aoi', 'manual'):
+            return error_response('source 只能为 aoi 或 manual', 400)
+        try:
+            if isinstance(boundary, dict):
+                boundary = area_boundaries.ring_from_geojson(boundary)
+            result = write_queue.run(area_boundaries.update_boundary, area_id, boundary, source)
+        except LookupError as e:
+            return error_response(str(e), 404)
+        except ValueError as e:
+            return error_response(str(e), 400)
+        write_queue.run(post_crawl.run, exclusive=True)
+        
+        return success_response(result, '设置商圈边界成功')
+        
+    except Exception as e:
+        return error_response(f'设置商圈边界失败: {str(e)}', 500)
+
 @business_bp.route('/<area_id>/stores', methods=['GET', 'OPTIONS'])
 def get_stores_by_area(area_id):
     """获取商圈内店铺列表"""
@@ -224,12 +369,30 @@ def get_stores_by_area(area_id):
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('pageSize', 20))
         sort_by = request.args.get('sortBy', 'rating')
+        since = request.args.get('since')  # 增量同步游标
+        fmt = response_format()
+        if fmt is None:
+            return error_response('不支持的响应格式', 406)
+        
+        filters = [Store.category == category] if category else []
+        label_filter = _label_filter(Store)
+        if label_filter is not None:
+            filters.append(label_filter)
+        try:
+            open_filter = _open_filter(Store)
+        except ValueError:
+            return error_response('openAt 参数格式错误', 400)
+        if open_filter is not None:
+            filters.append(open_filter)
+        
+        if since:
+            return _delta_response(
+                lambda: delta_sync.store_changes(since, area_id, filters), fmt, '获取店铺增量成功'
+            )
+        cursor = delta_sync.initial_cursor()
         
         # 构建查询
-        query = area.stores
-        
-        if category:
-            query = query.filter_by(category=category)
+        query = area.stores.filter(*filters)
         
         # 排序
         if sort_by == 'rating':
@@ -253,12 +416,68 @@ def get_stores_by_area(area_id):
             total=pagination.total,
             page=page,
             per_page=per_page,
-            message='获取商圈店铺列表成功'
+            message='获取商圈店铺列表成功',
+            compress=True,
+            fmt=fmt,
+            cursor=cursor
         )
         
     except Exception as e:
         return error_response(f'获取商圈店铺列表失败: {str(e)}', 500)
 
+def _range_arg(low_name, high_name):
+    """区间参数 → (最小值, 最大值)，未提供的一端为 None"""
+    low, high = request.args.get(low_name), request.args.get(high_name)
+    return (float(low) if low else None, float(high) if high else None)
+
+@business_bp.route('/stores/search', methods=['GET', 'OPTIONS'])
+def search_stores():
+    """店铺分面搜索（商圈 areaId 或城市 cityId 范围内），返回当前页店铺和各维度的分面计数"""
+    try:
+        area_id = request.args.get('areaId', '')
+        city_id = request.args.get('cityId', '')
+        if not area_id and not city_id:
+            return error_response('需要提供 areaId 或 cityId', 400)
+        fmt = response_format()
+        if fmt is None:
+            return error_response('不支持的响应格式', 406)
+        
+        try:
+            page = max(int(request.args.get('page', 1)), 1)
+            per_page = min(max(int(request.args.get('pageSize', 20)), 1), 100)
+            recommended = request.args.get('recommended')
+            filters = {
+                'category': labels.parse(request.args.get('category')),
+                'sub_category': labels.parse(request.args.get('subCategory')),
+                'price': _range_arg('minPrice', 'maxPrice'),
+                'rating': _range_arg('minRating', 'maxRating'),
+                'recommended': recommended.lower() in ('true', '1') if recommended else None,
+                'tags': labels.parse(request.args.get('tags')),
+                'open_now': request.args.get('openNow', '').lower() in ('true', '1'),
+                'open_at': opening_index.parse_time(request.args['openAt']) if request.args.get('openAt') else None
+            }
+        except ValueError:
+            return error_response('筛选参数格式错误', 400)
+        
+        stores, total, facets = store_search.search(
+            area_id=area_id or None, city_id=city_id or None, filters=filters,
+            sort_by=request.args.get('sortBy', 'rating'), page=page, per_page=per_page
+        )
+        
+        return paginated_response(
+            items=[store.to_dict() for store in stores],
+            total=total,
+            page=page,
+            per_page=per_page,
+            message='店铺搜索成功',
+            compress=True,
+            fmt=fmt,
+            extra={'facets': facets}
+        )
+        
+    except Exception as e:
+        return error_response(f'店铺搜索失败: {str(e)}', 500)
+
 @business_bp.route('/compare', methods=['POST', 'OPTIONS'])
 def compare_business_areas():
     """商圈对比"""
@@ -322,6 +541,9 @@ def get_nearby_business_areas():
         longitude = float(request.args.get('longitude', 0))
         latitude = float(request.args.get('latitude', 0))
         radius = int(request.args.get('radius', 5000))  # 默认5公里
+        fmt = response_format()
+        if fmt is None:
+            return error_response('不支持的响应格式', 406)
         
         if not longitude or not latitude:
             return error_response('经纬度坐标不能为空', 400)
@@ -342,7 +564,7 @@ def get_nearby_business_areas():
         # 按距离排序
         nearby_areas.sort(key=lambda x: x['distance'])
         
-        return success_response(nearby_areas[:20], '获取附近商圈成功')  # 限制返回20个
+        return success_response(compact_rows(nearby_areas[:20], fmt), '获取附近商圈成功', fmt=fmt)  # 限制返回20个
         
     except ValueError:
         return error_response('坐标格式不正确', 400)
@@ -399,6 +621,7 @@ def search_and_save_business_areas():
         
         # 如果数据库中没有数据，保存新搜索的数据
         saved_areas = []
+        records = []
         if search_areas:
             for area_data in search_areas:
                 try:
@@ -422,9 +645,8 @@ def search_and_save_business_areas():
                         'tags': area_data.get('tags', [])
                     }
                     
-                    # 创建商圈记录
-                    business_area = BusinessArea(**business_area_data)
-                    db.session.add(business_area)
+                    # 待写入的商圈记录
+                    records.append(business_area_data)
                     
                     # 添加距离信息
                     area_dict = business_area_data.copy()
@@ -438,12 +660,13 @@ def search_and_save_business_areas():
                     logger.error(f"保存商圈数据失败: {str(e)}")
                     continue
             
-            # 提交数据库事务
+            # 经单写线程写入并提交，批次后处理作为独占任务执行
             try:
-                db.session.commit()
+                saved_ids = {area['id'] for area in write_queue.run(crawl_writes.write_business_areas, records)}
+                saved_areas = [area for area in saved_areas if area['id'] in saved_ids]
                 logger.info(f"成功保存 {len(saved_areas)} 个商圈到数据库")
+                write_queue.run(post_crawl.run, exclusive=True)
             except Exception as e:
-                db.session.rollback()
                 logger.error(f"数据库提交失败: {str(e)}")
                 return error_response('保存商圈数据失败', 500)
         
@@ -479,133 +702,67 @@ def determine_area_type(category):
 
 @business_bp.route('/<area_id>/crawl-details', methods=['POST', 'OPTIONS'])
 def crawl_area_details(area_id):
-    """爬取商圈详细数据（大众点评等）"""
-    from datetime import datetime, timedelta
-    from app.crawler.data_sources.dianping_crawler import DianpingCrawler
-    
+    """
+    获取商圈详细数据（大众点评等）：立即返回当前数据，
+    数据过期或不完整时提交后台刷新，客户端通过 crawl-status 获取刷新结果
+    """
     try:
         # 验证商圈是否存在
-        area = BusinessArea.query.get(area_id)
+        area, store_stats = get_area_with_stats(area_id)
         if not area:
             return error_response('商圈不存在', 404)
         
-        # 检查是否有近2天内的数据
-        two_days_ago = datetime.utcnow() - timedelta(days=2)
-        recent_update = area.updated_at and area.updated_at > two_days_ago
+        stale = not area_refresh.is_fresh(area, store_stats)
+        job = None
+        if stale:
+            job, created = area_refresh.request_refresh(area_id)
+            if created:
+                logger.info(f"商圈 {area.name} 数据已过期，已提交后台刷新")
+        else:
+            job = area_refresh.get_job(area_id)
         
-        # 检查是否有详细的评价和店铺数据
-        has_detailed_data = (
-            area.stores.count() > 0 and 
-            area.rating > 0 and 
-            area.review_count > 0
+        return success_response(
+            _area_details(area, store_stats, job),
+            '商圈数据已过期，正在后台更新' if stale else '从缓存获取商圈详细数据成功'
         )
         
-        if recent_update and has_detailed_data:
-            logger.info(f"商圈 {area.name} 数据较新，直接返回缓存数据")
-            return success_response({
-                'area': area.to_dict(),
-                'cached': True,
-                'data_source': 'database',
-                'last_updated': area.updated_at.isoformat() if area.updated_at else None
-            }, '从缓存获取商圈详细数据成功')
-        
-        # 如果数据过期或不完整，启动爬虫获取最新数据
-        logger.info(f"开始爬取商圈 {area.name} 的详细数据")
-        
-        # 初始化大众点评爬虫
-        crawler = DianpingCrawler()
-        
-        # 爬取商圈详细信息
-        area_details = crawler.search_area_by_name(area.name, area.city.name if area.city else '北京')
-        
-        if area_details:
-            # 更新商圈基本信息
-            area.rating = area_details.get('rating', area.rating)
-            area.review_count = area_details.get('review_count', 0)
-            area.hot_value = area_details.get('hot_value', area.hot_value)
-            area.description = area_details.get('description', area.description)
-            area.updated_at = datetime.utcnow()
-            
-            # 获取商圈评价
-            reviews = crawler.get_area_reviews(area_id)
-            if reviews:
-                # 这里可以将评价存储到单独的评价表中
-                logger.info(f"获取到 {len(reviews)} 条商圈评价")
-            
-            # 爬取商圈内的店铺数据
-            stores_data = crawler.get_stores(
-                area_id, 
-                area.name,
-                area.latitude,
-                area.longitude
-            )
-            
-            if stores_data:
-                # 清除旧的店铺数据（可选）
-                existing_stores = Store.query.filter_by(business_area_id=area_id).all()
-                for store in existing_stores:
-                    db.session.delete(store)
-                
-                # 添加新的店铺数据
-                for store_data in stores_data:
-                    try:
-                        store = Store(**store_data)
-                        db.session.add(store)
-                        logger.info(f"添加店铺: {store_data.get('name', 'Unknown')}")
-                    except Exception as e:
-                        logger.error(f"添加店铺失败: {str(e)}")
-                        continue
-                
-                # 更新商圈统计信息
-                area.store_count = len(stores_data)
-                
-                # 计算平均评分和消费水平
-                if stores_data:
-                    avg_rating = sum(s.get('rating', 0) for s in stores_data) / len(stores_data)
-                    avg_price = sum(s.get('avg_price', 0) for s in stores_data) / len(stores_data)
-                    area.rating = round(avg_rating, 1) if avg_rating > 0 else area.rating
-                    area.avg_consumption = round(avg_price, 2) if avg_price > 0 else area.avg_consumption
-            
-            # 提交数据库更改
-            try:
-                db.session.commit()
-                logger.info(f"成功更新商圈 {area.name} 的详细数据")
-                
-                # 返回更新后的数据
-                updated_area = area.to_dict()
-                
-                # 添加额外的统计信息
-                updated_area.update({
-                    'store_statistics': {
-                        'total_stores': area.stores.count(),
-                        'by_category': dict(
-                            db.session.query(Store.category, func.count(Store.id))
-                            .filter_by(business_area_id=area_id)
-                            .group_by(Store.category)
-                            .all()
-                        ),
-                        'avg_rating': db.session.query(func.avg(Store.rating)).filter_by(business_area_id=area_id).scalar() or 0,
-                        'recommended_count': area.stores.filter_by(is_recommended=True).count()
-                    },
-                    'reviews_sample': reviews[:5] if reviews else [],  # 返回前5条评价作为样本
-                    'cached': False,
-                    'data_source': 'dianping_crawler',
-                    'crawl_time': datetime.utcnow().isoformat()
-                })
-                
-                return success_response(updated_area, f'成功爬取并更新商圈 {area.name} 的详细数据')
-                
-            except Exception as e:
-                db.session.rollback()
-                logger.error(f"保存商圈数据失败: {str(e)}")
-                return error_response('保存商圈数据失败', 500)
-        else:
-            logger.warning(f"未能获取商圈 {area.name} 的详细数据")
-            return error_response('未能获取商圈详细数据，请稍后重试', 500)
+    except Exception as e:
+        logger.error(f"获取商圈详情失败: {str(e)}")
+        return error_response(f'获取商圈详情失败: {str(e)}', 500)
+
+@business_bp.route('/<area_id>/crawl-status', methods=['GET', 'OPTIONS'])
+def get_crawl_status(area_id):
+    """查询商圈后台刷新状态；?wait=秒 时等待刷新完成（长轮询，最多30秒）"""
+    try:
+        job = area_refresh.get_job(area_id)
+        wait = min(float(request.args.get('wait', 0)), 30)
+        if job is not None and wait > 0:
+            job.done.wait(wait)
+        
+        area, store_stats = get_area_with_stats(area_id)
+        if not area:
+            return error_response('商圈不存在', 404)
+        return success_response(_area_details(area, store_stats, job), '获取商圈刷新状态成功')
         
+    except ValueError:
+        return error_response('wait参数格式不正确', 400)
     except Exception as e:
-        logger.error(f"爬取商圈详情失败: {str(e)}")
-        return error_response(f'爬取商圈详情失败: {str(e)}', 500)
+        return error_response(f'获取商圈刷新状态失败: {str(e)}', 500)
+
+def _area_details(area, store_stats, job=None):
+    """商圈详细数据及后台刷新状态"""
+    fresh = area_refresh.is_fresh(area, store_stats)
+    result = job.result if job is not None and job.status == 'done' else None
+    return {
+        'area': area.to_dict(),
+        'store_statistics': store_stats.to_summary_dict(),
+        'reviews_sample': result['reviews_sample'] if result else [],
+        'cached': True,
+        'stale': not fresh,
+        'data_source': 'dianping_crawler' if result else 'database',
+        'last_updated': area.updated_at.isoformat() if area.updated_at else None,
+        'refresh': job.to_dict() if job is not None else None
+    }
 
 
 @business_bp.route('/areas/<int:area_id>/stores', methods=['GET', 'OPTIONS'])
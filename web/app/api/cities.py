@@ -9,6 +9,8 @@ from sqlalchemy import or_
 from app.extensions import db
 from app.models.city import City
 from app.utils.response import success_response, error_response, paginated_response
+from app.utils.fragments import city_fragment, area_card_fragment
+from app.services import search_index, reference_data
 
 # 创建城市蓝图
 cities_bp = Blueprint('cities', __name__)
@@ -43,14 +45,15 @@ def get_cities():
             error_out=False
         )
         
-        cities = [city.to_dict() for city in pagination.items]
+        cities = [city_fragment(city) for city in pagination.items]
         
         return paginated_response(
             items=cities,
             total=pagination.total,
             page=page,
             per_page=per_page,
-            message='获取城市列表成功'
+            message='获取城市列表成功',
+            compress=True
         )
         
     except Exception as e:
@@ -60,10 +63,10 @@ def get_cities():
 def get_hot_cities():
     """获取热门城市"""
     try:
-        cities = City.query.filter_by(is_hot=True, level='city').order_by(City.name).all()
+        snapshot = reference_data.get_snapshot()
         
         return success_response(
-            [city.to_dict() for city in cities],
+            [snapshot.fragments[city_id] for city_id in snapshot.hot_cities],
             '获取热门城市成功'
         )
         
@@ -74,12 +77,12 @@ def get_hot_cities():
 def get_city_by_id(city_id):
     """根据ID获取城市信息"""
     try:
-        city = City.query.get(city_id)
+        fragment = reference_data.get_snapshot().fragments.get(city_id)
         
-        if not city:
+        if fragment is None:
             return error_response('城市不存在', 404)
         
-        return success_response(city.to_dict(), '获取城市信息成功')
+        return success_response(fragment, '获取城市信息成功')
         
     except Exception as e:
         return error_response(f'获取城市信息失败: {str(e)}', 500)
@@ -93,18 +96,36 @@ def search_cities():
         if not keyword:
             return error_response('搜索关键词不能为空', 400)
         
-        # 搜索城市（支持名称、拼音搜索）
-        cities = City.query.filter(
-            City.level == 'city',
-            or_(
-                City.name.contains(keyword),
-                City.pinyin.contains(keyword.lower()),
-                City.pinyin_abbr.contains(keyword.upper())
+        # 优先走内存前缀树（名称、拼音、首字母缩写前缀）
+        snapshot = reference_data.get_snapshot()
+        city_ids = snapshot.autocomplete(keyword, 'city', 20)
+        if city_ids:
+            return success_response(
+                [snapshot.fragments[city_id] for city_id in city_ids],
+                '搜索城市成功'
             )
-        ).limit(20).all()
+        
+        if search_index.is_enabled():
+            # 前缀未命中时通过搜索索引检索（名称中间的片段）
+            results = search_index.search('city', keyword, category='city', limit=20)
+            cities_by_id = {
+                city.id: city
+                for city in City.query.filter(City.id.in_([r[0] for r in results])).all()
+            }
+            cities = [cities_by_id[r[0]] for r in results if r[0] in cities_by_id]
+        else:
+            # 搜索城市（支持名称、拼音搜索）
+            cities = City.query.filter(
+                City.level == 'city',
+                or_(
+                    City.name.contains(keyword),
+                    City.pinyin.contains(keyword.lower()),
+                    City.pinyin_abbr.contains(keyword.upper())
+                )
+            ).limit(20).all()
         
         return success_response(
-            [city.to_dict() for city in cities],
+            [city_fragment(city) for city in cities],
             '搜索城市成功'
         )
         
@@ -121,26 +142,12 @@ def get_city_by_location():
         if not longitude or not latitude:
             return error_response('经纬度坐标不能为空', 400)
         
-        # 这里简化处理，实际应用中需要使用地理空间查询
-        # 找到距离最近的城市（简单的距离计算）
-        cities = City.query.filter_by(level='city').all()
-        
-        if not cities:
-            return error_response('未找到相关城市', 404)
-        
-        # 计算距离并找到最近的城市
-        min_distance = float('inf')
-        nearest_city = None
-        
-        for city in cities:
-            # 简单的欧几里得距离计算
-            distance = ((city.longitude - longitude) ** 2 + (city.latitude - latitude) ** 2) ** 0.5
-            if distance < min_distance:
-                min_distance = distance
-                nearest_city = city
+        # 在内存KD树中查找球面距离最近的城市
+        snapshot = reference_data.get_snapshot()
+        city_id, _ = snapshot.nearest(longitude, latitude, 'city')
         
-        if nearest_city:
-            return success_response(nearest_city.to_dict(), '获取定位城市成功')
+        if city_id:
+            return success_response(snapshot.fragments[city_id], '获取定位城市成功')
         else:
             return error_response('未找到附近的城市', 404)
         
@@ -153,10 +160,10 @@ def get_city_by_location():
 def get_provinces():
     """获取省份列表"""
     try:
-        provinces = City.query.filter_by(level='province').order_by(City.name).all()
+        snapshot = reference_data.get_snapshot()
         
         return success_response(
-            [province.to_dict() for province in provinces],
+            [snapshot.fragments[province_id] for province_id in snapshot.provinces],
             '获取省份列表成功'
         )
         
@@ -167,10 +174,10 @@ def get_provinces():
 def get_cities_by_province(province_id):
     """根据省份ID获取城市列表"""
     try:
-        cities = City.query.filter_by(parent_id=province_id, level='city').order_by(City.name).all()
+        snapshot = reference_data.get_snapshot()
         
         return success_response(
-            [city.to_dict() for city in cities],
+            [snapshot.fragments[city_id] for city_id in snapshot.children_of(province_id, 'city')],
             '获取省份城市列表成功'
         )
         
@@ -181,10 +188,10 @@ def get_cities_by_province(province_id):
 def get_districts_by_city(city_id):
     """根据城市ID获取区县列表"""
     try:
-        districts = City.query.filter_by(parent_id=city_id, level='district').order_by(City.name).all()
+        snapshot = reference_data.get_snapshot()
         
         return success_response(
-            [district.to_dict() for district in districts],
+            [snapshot.fragments[district_id] for district_id in snapshot.children_of(city_id, 'district')],
             '获取城市区县列表成功'
         )
         
@@ -248,14 +255,15 @@ def get_city_business_areas(city_id):
             error_out=False
         )
         
-        business_areas = [area.to_dict() for area in pagination.items]
+        business_areas = [area_card_fragment(area) for area in pagination.items]
         
         return paginated_response(
             items=business_areas,
             total=pagination.total,
             page=page,
             per_page=per_page,
-            message='获取城市商圈概览成功'
+            message='获取城市商圈概览成功',
+            compress=True
         )
         
     except Exception as e:
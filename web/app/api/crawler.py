@@ -9,6 +9,7 @@ from app.extensions import db
 from app.models.city import City
 from app.utils.response import success_response, error_response
 from app.data_sources.data_manager import DataSourceManager
+from app.services import region_stats, post_crawl, write_queue
 import logging
 
 logger = logging.getLogger(__name__)
@@ -174,6 +175,9 @@ def crawl_area_stores():
             update_existing=update_existing
         )
         
+        # 批次后处理（城市汇总、指标历史等），经单写线程独占执行
+        write_queue.run(post_crawl.run, exclusive=True)
+        
         result = {
             'area_id': area_id,
             'area_name': area.name,
@@ -224,26 +228,25 @@ def schedule_crawl_task():
 def check_data_quality():
     """检查数据质量"""
     try:
-        from app.models.business_area import BusinessArea
-        from app.models.store import Store
-        from sqlalchemy import func
+        from app.models.statistics import RegionStats
+        from app.services import reference_data
         
-        # 统计数据质量指标
-        total_areas = BusinessArea.query.count()
-        areas_with_coords = BusinessArea.query.filter(
-            BusinessArea.longitude.isnot(None),
-            BusinessArea.latitude.isnot(None)
-        ).count()
+        # 统计数据质量指标（合计城市汇总）
+        totals = region_stats.get_totals()
+        total_areas = totals.area_count
+        areas_with_coords = totals.areas_with_coords
         
-        total_stores = Store.query.count()
-        stores_with_rating = Store.query.filter(Store.rating > 0).count()
-        stores_with_phone = Store.query.filter(Store.phone.isnot(None)).count()
+        total_stores = totals.store_count
+        stores_with_rating = totals.stores_with_rating
+        stores_with_phone = totals.stores_with_phone
         
         # 按城市统计
-        city_stats = db.session.query(
-            City.name,
-            func.count(BusinessArea.id).label('area_count')
-        ).outerjoin(BusinessArea).group_by(City.id).all()
+        area_counts = dict(db.session.query(RegionStats.region_id, RegionStats.area_count).filter_by(level='city'))
+        snapshot = reference_data.get_snapshot()
+        city_stats = [
+            (snapshot.records[city_id]['name'], area_counts.get(city_id, 0))
+            for city_id in sorted(snapshot.records)
+        ]
         
         quality_report = {
             'areas': {
@@ -241,8 +241,12 @@ def check_data_quality():
         
         # 统计店铺数据
         from app.models.store import Store
-        total_stores = Store.query.count()
-        stores_with_rating = Store.query.filter(Store.rating > 0).count()
+        from app.utils import sharding
+        counts = [counts for _, counts in sharding.fan_out(
+            lambda: (Store.query.count(), Store.query.filter(Store.rating > 0).count())
+        )]
+        total_stores = sum(total for total, _ in counts)
+        stores_with_rating = sum(rated for _, rated in counts)
         
         click.echo("数据质量报告:")
         click.echo(f"商圈总数: {total_areas}")
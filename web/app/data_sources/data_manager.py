@@ -9,10 +9,8 @@ from typing import Dict, List, Optional, Any, Callable
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
-from app.extensions import db
-from app.models.business_area import BusinessArea
-from app.models.store import Store
 from app.models.city import City
+from app.services import crawl_writes, post_crawl, write_queue
 from .clients.baidu_client import BaiduMapClient
 from .clients.amap_client import AmapClient
 from .clients.dianping_client import DianpingClient
@@ -125,6 +123,9 @@ class DataSourceManager:
                 )
                 total_stores += stores_count
             
+            # 批次后处理（城市汇总、指标历史等）
+            write_queue.run(post_crawl.run, exclusive=True)
+            
             # 更新统计信息
             self.stats['total_areas_fetched'] += len(saved_areas)
             self.stats['total_stores_fetched'] += total_stores
@@ -278,44 +279,14 @@ class DataSourceManager:
     
     def _save_business_areas(self, areas: List[Dict[str, Any]], 
                             update_existing: bool = False) -> List[Dict[str, Any]]:
-        """保存商圈数据到数据库"""
+        """保存商圈数据到数据库（经单写线程提交）"""
         saved_areas = []
         
         try:
-            for area_data in areas:
-                try:
-                    # 检查是否已存在
-                    existing_area = BusinessArea.query.get(area_data['id'])
-                    
-                    if existing_area and not update_existing:
-                        logger.debug(f"商圈 {area_data['name']} 已存在，跳过")
-                        saved_areas.append(area_data)
-                        continue
-                    
-                    if existing_area and update_existing:
-                        # 更新现有记录
-                        for key, value in area_data.items():
-                            if hasattr(existing_area, key) and key != 'id':
-                                setattr(existing_area, key, value)
-                        existing_area.updated_at = datetime.utcnow()
-                        logger.info(f"更新商圈: {area_data['name']}")
-                    else:
-                        # 创建新记录
-                        area = BusinessArea(**area_data)
-                        db.session.add(area)
-                        logger.info(f"新增商圈: {area_data['name']}")
-                    
-                    saved_areas.append(area_data)
-                    
-                except Exception as e:
-                    logger.error(f"保存商圈 {area_data.get('name', 'Unknown')} 失败: {str(e)}")
-                    continue
-            
-            db.session.commit()
+            saved_areas = write_queue.run(crawl_writes.write_business_areas, areas, update_existing)
             logger.info(f"成功保存 {len(saved_areas)} 个商圈")
             
         except Exception as e:
-            db.session.rollback()
             logger.error(f"保存商圈数据失败: {str(e)}")
             raise
         
@@ -323,41 +294,14 @@ class DataSourceManager:
     
     def _save_stores(self, stores: List[Dict[str, Any]], 
                     update_existing: bool = False) -> List[Dict[str, Any]]:
-        """保存店铺数据到数据库"""
+        """保存店铺数据到数据库（经单写线程提交）"""
         saved_stores = []
         
         try:
-            for store_data in stores:
-                try:
-                    # 检查是否已存在
-                    existing_store = Store.query.get(store_data['id'])
-                    
-                    if existing_store and not update_existing:
-                        saved_stores.append(store_data)
-                        continue
-                    
-                    if existing_store and update_existing:
-                        # 更新现有记录
-                        for key, value in store_data.items():
-                            if hasattr(existing_store, key) and key != 'id':
-                                setattr(existing_store, key, value)
-                        existing_store.updated_at = datetime.utcnow()
-                    else:
-                        # 创建新记录
-                        store = Store(**store_data)
-                        db.session.add(store)
-                    
-                    saved_stores.append(store_data)
-                    
-                except Exception as e:
-                    logger.error(f"保存店铺 {store_data.get('name', 'Unknown')} 失败: {str(e)}")
-                    continue
-            
-            db.session.commit()
+            saved_stores = write_queue.run(crawl_writes.write_stores, stores, update_existing)
             logger.info(f"成功保存 {len(saved_stores)} 个店铺")
             
         except Exception as e:
-            db.session.rollback()
             logger.error(f"保存店铺数据失败: {str(e)}")
             raise
         
@@ -366,10 +310,7 @@ class DataSourceManager:
     def _update_area_store_count(self, area_id: str, store_count: int):
         """更新商圈的店铺数量"""
         try:
-            area = BusinessArea.query.get(area_id)
-            if area:
-                area.store_count = store_count
-                db.session.commit()
+            write_queue.run(crawl_writes.write_area_store_count, area_id, store_count)
         except Exception as e:
             logger.error(f"更新商圈店铺数量失败: {str(e)}")
     
@@ -8,8 +8,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 
-# 数据库
-db = SQLAlchemy()
+from app.utils.db_routing import RoutingSession
+
+# 数据库（配置只读副本时按请求读写分离）
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # 数据库迁移
 migrate = Migrate()
@@ -11,6 +11,14 @@ from .store import Store
 from .user import User
 from .review import AreaReview, StoreReview
 from .system import SystemConfig, CrawlRecord, UserFavorite, SearchHistory
+from .statistics import AreaStoreStats, RegionStats
+from .history import AreaMetricSnapshot, AreaMetricSeries
+from .tiles import HeatmapTile
+from .sync import Tombstone
+from .outbox import OutboxEvent, OutboxOffset
+from .dashboard import DashboardSnapshot
+from .labels import Label, AreaLabel, StoreLabel
+from .discovery import AreaCandidate
 
 # 导出所有模型
 __all__ = [
@@ -23,5 +31,18 @@ __all__ = [
     'SystemConfig',
     'CrawlRecord',
     'UserFavorite',
-    'SearchHistory'
+    'SearchHistory',
+    'AreaStoreStats',
+    'RegionStats',
+    'AreaMetricSnapshot',
+    'AreaMetricSeries',
+    'HeatmapTile',
+    'Tombstone',
+    'OutboxEvent',
+    'OutboxOffset',
+    'DashboardSnapshot',
+    'Label',
+    'AreaLabel',
+    'StoreLabel',
+    'AreaCandidate'
 ]
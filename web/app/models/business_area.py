@@ -25,6 +25,8 @@ class BusinessArea(db.Model):
     longitude = db.Column(db.Float, nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     area = db.Column(db.Float, nullable=True)  # 面积（平方公里）
+    boundary = db.Column(db.Text, nullable=True)  # 边界多边形JSON [[经度, 纬度], ...]
+    boundary_source = db.Column(db.Enum('aoi', 'hull', 'manual', name='boundary_source_enum'), nullable=True)
     
     # 商圈数据
     hot_value = db.Column(db.Integer, default=0, index=True)  # 热度值
@@ -38,6 +40,7 @@ class BusinessArea(db.Model):
     address = db.Column(db.Text, nullable=True)
     description = db.Column(db.Text, nullable=True)
     opening_hours = db.Column(db.String(100), nullable=True)
+    opening_bitmap = db.Column(db.LargeBinary(84), nullable=True)  # 一周营业时段位图（由 opening_hours 生成）
     
     # JSON字段（SQLite兼容）
     facilities = db.Column(db.Text, nullable=True)  # 配套设施JSON
@@ -47,7 +50,7 @@ class BusinessArea(db.Model):
     
     # 时间戳
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # 关系
     stores = db.relationship('Store', backref='business_area', lazy='dynamic', cascade='all, delete-orphan')
@@ -137,6 +140,24 @@ class BusinessArea(db.Model):
         else:
             self.tags = None
     
+    def get_boundary(self):
+        """获取边界多边形"""
+        if self.boundary:
+            try:
+                return json.loads(self.boundary)
+            except (json.JSONDecodeError, TypeError):
+                return []
+        return []
+    
+    def set_boundary(self, ring, source=None):
+        """设置边界多边形及来源（aoi/hull/manual），ring 为空时清除"""
+        if ring:
+            self.boundary = json.dumps(ring)
+            self.boundary_source = source
+        else:
+            self.boundary = None
+            self.boundary_source = None
+    
     def to_dict(self):
         """转换为字典"""
         return {
@@ -149,6 +170,7 @@ class BusinessArea(db.Model):
             'longitude': self.longitude,
             'latitude': self.latitude,
             'area': self.area,
+            'boundary_source': self.boundary_source,
             'hot_value': self.hot_value,
             'hotValue': self.hot_value,  # 前端兼容
             'avg_consumption': self.avg_consumption,
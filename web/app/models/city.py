@@ -39,6 +39,14 @@ class City(db.Model):
     children = db.relationship('City', backref=db.backref('parent', remote_side=[id]))
     business_areas = db.relationship('BusinessArea', backref='city', lazy='dynamic')
     
+    @classmethod
+    def loadable(cls):
+        """枚举字段取值合法的城市（库中可能有模型未定义的层级，如 street，加载整行会出错）"""
+        return cls.query.filter(*[
+            column.in_(column.type.enums) | column.is_(None)
+            for column in cls.__table__.columns if isinstance(column.type, db.Enum)
+        ])
+    
     def to_dict(self):
         """转换为字典"""
         return {
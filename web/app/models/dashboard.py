@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+仪表盘快照数据模型
+"""
+
+from datetime import datetime
+from app.extensions import db
+
+class DashboardSnapshot(db.Model):
+    """城市仪表盘快照（预渲染的完整响应体及其预压缩版本，爬取后在后台重新生成）"""
+    __tablename__ = 'dashboard_snapshots'
+
+    city_id = db.Column(db.String(20), primary_key=True)
+
+    # 内容变化时递增，ETag 由城市、版本和内容摘要组成
+    version = db.Column(db.Integer, nullable=False, default=1)
+    etag = db.Column(db.String(80), nullable=False)
+    content_hash = db.Column(db.String(40), nullable=False)
+
+    # 响应体：原始JSON、gzip、brotli（未安装brotli时为空）；长度使MySQL选用MEDIUMBLOB
+    body = db.Column(db.LargeBinary(length=2 ** 24 - 1), nullable=False)
+    body_gzip = db.Column(db.LargeBinary(length=2 ** 24 - 1), nullable=False)
+    body_br = db.Column(db.LargeBinary(length=2 ** 24 - 1), nullable=True)
+
+    # 最近一次生成时间（内容未变化时只更新该时间）
+    generated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DashboardSnapshot {self.city_id} v{self.version}>'
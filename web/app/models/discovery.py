@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈发现数据模型
+"""
+
+import json
+from datetime import datetime
+from app.extensions import db
+
+class AreaCandidate(db.Model):
+    """店铺密度聚类得到的候选商圈及其与现有商圈的对照结果（每次发现时按城市整体替换）"""
+    __tablename__ = 'area_candidates'
+
+    STATUSES = ('new', 'matched', 'merge', 'unsupported')
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    city_id = db.Column(db.String(20), nullable=False, index=True)
+    # new：没有对应的商圈；matched：对应一个现有商圈；merge：覆盖多个现有商圈；
+    # unsupported：现有商圈不在任何聚类中（坐标、店铺数为该商圈的值）
+    status = db.Column(db.Enum(*STATUSES, name='candidate_status_enum'), nullable=False, index=True)
+
+    # 聚类几何：质心、半径（90%的店铺在半径内，米）、凸包 [[经度, 纬度], ...]
+    longitude = db.Column(db.Float, nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    radius = db.Column(db.Float, default=0.0, nullable=False)
+    hull = db.Column(db.Text, nullable=True)
+
+    store_count = db.Column(db.Integer, default=0, nullable=False)
+    density = db.Column(db.Float, default=0.0, nullable=False)  # 每平方公里店铺数
+    category_mix = db.Column(db.Text, nullable=True)  # {分类: 店铺数} JSON
+
+    # 对照：主要对应的商圈，以及店铺占比达到阈值或中心在半径内的商圈
+    matched_area_id = db.Column(db.String(50), nullable=True, index=True)
+    area_ids = db.Column(db.Text, nullable=True)  # JSON
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def _load(value, default):
+        if value:
+            try:
+                return json.loads(value)
+            except (json.JSONDecodeError, TypeError):
+                return default
+        return default
+
+    def get_hull(self):
+        return self._load(self.hull, [])
+
+    def get_category_mix(self):
+        return self._load(self.category_mix, {})
+
+    def get_area_ids(self):
+        return self._load(self.area_ids, [])
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'city_id': self.city_id,
+            'status': self.status,
+            'longitude': self.longitude,
+            'latitude': self.latitude,
+            'radius': self.radius,
+            'hull': self.get_hull(),
+            'store_count': self.store_count,
+            'density': self.density,
+            'category_mix': self.get_category_mix(),
+            'matched_area_id': self.matched_area_id,
+            'area_ids': self.get_area_ids(),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<AreaCandidate {self.city_id} {self.status} {self.store_count}>'
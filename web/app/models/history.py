@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈指标历史数据模型
+"""
+
+from datetime import datetime
+from app.extensions import db
+import json
+
+class AreaMetricSnapshot(db.Model):
+    """商圈指标快照（每次爬取追加一行，按城市+月份分区）"""
+    __tablename__ = 'area_metric_snapshots'
+
+    id = db.Column(db.Integer, primary_key=True)
+    city_id = db.Column(db.String(20), nullable=False)
+    period = db.Column(db.String(7), nullable=False)  # 分区月份 YYYY-MM
+    business_area_id = db.Column(db.String(50), nullable=False, index=True)
+    captured_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # 指标
+    hot_value = db.Column(db.Integer, nullable=True)
+    rating = db.Column(db.Float, nullable=True)
+    store_count = db.Column(db.Integer, nullable=True)
+    avg_consumption = db.Column(db.Float, nullable=True)
+    customer_flow = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_area_metric_snapshots_partition', 'city_id', 'period'),
+    )
+
+    def __repr__(self):
+        return f'<AreaMetricSnapshot {self.business_area_id} {self.captured_at}>'
+
+
+class AreaMetricSeries(db.Model):
+    """按天/周降采样的商圈指标（每个城市每个时间桶一行，指标按列存储为数组）"""
+    __tablename__ = 'area_metric_series'
+
+    id = db.Column(db.Integer, primary_key=True)
+    city_id = db.Column(db.String(20), nullable=False)
+    resolution = db.Column(db.Enum('day', 'week', name='series_resolution_enum'), nullable=False)
+    bucket = db.Column(db.Date, nullable=False)  # 日期或所在周的周一
+
+    # 列式数据（JSON数组，与 area_ids 按位置对应）
+    area_ids = db.Column(db.Text, nullable=False)
+    metrics = db.Column(db.Text, nullable=False)  # {指标名: [值, ...]}
+
+    # 时间戳
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('city_id', 'resolution', 'bucket', name='uq_area_metric_series_bucket'),
+    )
+
+    def get_area_ids(self):
+        """获取商圈ID列表"""
+        if self.area_ids:
+            try:
+                return json.loads(self.area_ids)
+            except (json.JSONDecodeError, TypeError):
+                return []
+        return []
+
+    def get_metrics(self):
+        """获取指标列"""
+        if self.metrics:
+            try:
+                return json.loads(self.metrics)
+            except (json.JSONDecodeError, TypeError):
+                return {}
+        return {}
+
+    def set_data(self, area_ids, metrics):
+        """设置商圈ID列表和指标列"""
+        self.area_ids = json.dumps(area_ids)
+        self.metrics = json.dumps(metrics)
+
+    def __repr__(self):
+        return f'<AreaMetricSeries {self.city_id} {self.resolution} {self.bucket}>'
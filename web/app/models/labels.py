@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+标签/设施数据模型
+
+商圈和店铺的 tags、facilities JSON 字段规范化为词典表 + 关联表，
+关联表主键以 label_id 开头，即按标签查商圈/店铺的倒排索引。
+"""
+
+from app.extensions import db
+
+class Label(db.Model):
+    """标签/设施词典"""
+    __tablename__ = 'labels'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.Enum('tag', 'facility', name='label_kind_enum'), nullable=False)
+    name = db.Column(db.String(50), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'name', name='uq_labels_kind_name'),
+    )
+
+    def __repr__(self):
+        return f'<Label {self.kind} {self.name}>'
+
+
+class AreaLabel(db.Model):
+    """商圈 - 标签/设施关联"""
+    __tablename__ = 'area_labels'
+
+    label_id = db.Column(db.Integer, db.ForeignKey('labels.id'), primary_key=True)
+    business_area_id = db.Column(db.String(50), db.ForeignKey('business_areas.id'), primary_key=True, index=True)
+
+    def __repr__(self):
+        return f'<AreaLabel {self.business_area_id} {self.label_id}>'
+
+
+class StoreLabel(db.Model):
+    """店铺 - 标签/设施关联"""
+    __tablename__ = 'store_labels'
+
+    label_id = db.Column(db.Integer, db.ForeignKey('labels.id'), primary_key=True)
+    store_id = db.Column(db.String(50), db.ForeignKey('stores.id'), primary_key=True, index=True)
+
+    def __repr__(self):
+        return f'<StoreLabel {self.store_id} {self.label_id}>'
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+变更事件发件箱数据模型
+"""
+
+from datetime import datetime
+from app.extensions import db
+import json
+
+class OutboxEvent(db.Model):
+    """商圈/店铺变更事件（与数据变更在同一事务内写入，ID即消费位置）"""
+    __tablename__ = 'outbox_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.Enum('area', 'store', name='outbox_entity_enum'), nullable=False)
+    entity_id = db.Column(db.String(50), nullable=False)
+    op = db.Column(db.Enum('insert', 'update', 'delete', name='outbox_op_enum'), nullable=False)
+
+    # 归属，便于处理器按城市/商圈聚合
+    city_id = db.Column(db.String(20), nullable=True)
+    business_area_id = db.Column(db.String(50), nullable=True)
+
+    # 变更内容JSON：{'before': {字段: 旧值}, 'after': {字段: 新值}}
+    payload = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # 消费位置依赖ID单调递增，SQLite需要 AUTOINCREMENT 以免清理后复用ID
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    def get_payload(self):
+        """获取变更内容"""
+        if self.payload:
+            try:
+                return json.loads(self.payload)
+            except (json.JSONDecodeError, TypeError):
+                return {}
+        return {}
+
+    def changed_fields(self):
+        """本次变更涉及的字段（更新事件为实际修改的字段）"""
+        payload = self.get_payload()
+        if self.op == 'update':
+            return set(payload.get('before') or {})
+        return set(payload.get('after') or payload.get('before') or {})
+
+    def __repr__(self):
+        return f'<OutboxEvent {self.id} {self.op} {self.entity} {self.entity_id}>'
+
+
+class OutboxOffset(db.Model):
+    """事件处理器的消费位置"""
+    __tablename__ = 'outbox_offsets'
+
+    handler = db.Column(db.String(100), primary_key=True)
+    last_event_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<OutboxOffset {self.handler} {self.last_event_id}>'
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统计汇总数据模型
+"""
+
+from datetime import datetime
+from app.extensions import db
+import json
+
+class AreaStoreStats(db.Model):
+    """商圈店铺统计汇总"""
+    __tablename__ = 'area_store_stats'
+
+    business_area_id = db.Column(db.String(50), db.ForeignKey('business_areas.id'), primary_key=True)
+
+    # 店铺数量
+    store_count = db.Column(db.Integer, default=0, nullable=False)
+    recommended_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # 分类分布
+    restaurant_count = db.Column(db.Integer, default=0, nullable=False)
+    retail_count = db.Column(db.Integer, default=0, nullable=False)
+    entertainment_count = db.Column(db.Integer, default=0, nullable=False)
+    service_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # 评分分布（高: >=4.0，中: 3.0-4.0，低: <3.0）
+    rating_sum = db.Column(db.Float, default=0.0, nullable=False)
+    rated_count = db.Column(db.Integer, default=0, nullable=False)
+    high_rating_count = db.Column(db.Integer, default=0, nullable=False)
+    medium_rating_count = db.Column(db.Integer, default=0, nullable=False)
+    low_rating_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # 价格分布（高: >=100，中: 50-100，低: <50）
+    price_sum = db.Column(db.Float, default=0.0, nullable=False)
+    priced_count = db.Column(db.Integer, default=0, nullable=False)
+    high_price_count = db.Column(db.Integer, default=0, nullable=False)
+    medium_price_count = db.Column(db.Integer, default=0, nullable=False)
+    low_price_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # 时间戳
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    CATEGORIES = ('restaurant', 'retail', 'entertainment', 'service')
+
+    @property
+    def avg_rating(self):
+        return self.rating_sum / self.rated_count if self.rated_count else 0
+
+    @property
+    def avg_price(self):
+        return self.price_sum / self.priced_count if self.priced_count else 0
+
+    def category_distribution(self):
+        """分类分布（只包含有店铺的分类）"""
+        distribution = {}
+        for category in self.CATEGORIES:
+            count = getattr(self, f'{category}_count') or 0
+            if count:
+                distribution[category] = count
+        return distribution
+
+    def to_summary_dict(self):
+        """商圈详情中的店铺统计"""
+        return {
+            'total_stores': self.store_count,
+            'by_category': self.category_distribution(),
+            'avg_rating': self.avg_rating,
+            'recommended_count': self.recommended_count
+        }
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'store_count': self.store_count,
+            'category_distribution': self.category_distribution(),
+            'rating_distribution': {
+                'avg_rating': self.avg_rating,
+                'high_rating_count': self.high_rating_count,
+                'medium_rating_count': self.medium_rating_count,
+                'low_rating_count': self.low_rating_count
+            },
+            'price_distribution': {
+                'avg_price': self.avg_price,
+                'high_price_count': self.high_price_count,
+                'medium_price_count': self.medium_price_count,
+                'low_price_count': self.low_price_count
+            }
+        }
+
+    @classmethod
+    def empty(cls, business_area_id):
+        """没有店铺的商圈对应的空统计"""
+        stats = cls(business_area_id=business_area_id)
+        for column in cls.__table__.columns:
+            if column.name not in ('business_area_id', 'updated_at'):
+                setattr(stats, column.name, column.default.arg)
+        return stats
+
+    def __repr__(self):
+        return f'<AreaStoreStats {self.business_area_id}>'
+
+
+class RegionStats(db.Model):
+    """城市/区县商圈与店铺汇总（按爬取批次刷新）"""
+    __tablename__ = 'region_stats'
+
+    region_id = db.Column(db.String(20), primary_key=True)  # 城市或区县ID
+    level = db.Column(db.Enum('city', 'district', name='region_level_enum'), nullable=False, index=True)
+    parent_id = db.Column(db.String(20), nullable=True, index=True)  # 区县所属城市
+
+    # 商圈汇总
+    area_count = db.Column(db.Integer, default=0, nullable=False)
+    active_area_count = db.Column(db.Integer, default=0, nullable=False)  # 热度值 > 5000
+    areas_with_coords = db.Column(db.Integer, default=0, nullable=False)
+    area_store_count = db.Column(db.Integer, default=0, nullable=False)  # 商圈 store_count 之和
+    hot_value_sum = db.Column(db.Integer, default=0, nullable=False)
+    rated_area_count = db.Column(db.Integer, default=0, nullable=False)  # 评分 > 0 的商圈
+    area_rating_sum = db.Column(db.Float, default=0.0, nullable=False)
+    type_distribution = db.Column(db.Text, nullable=True)  # 商圈类型分布JSON
+    level_distribution = db.Column(db.Text, nullable=True)  # 商圈等级分布JSON
+
+    # 店铺汇总
+    store_count = db.Column(db.Integer, default=0, nullable=False)
+    high_rating_count = db.Column(db.Integer, default=0, nullable=False)
+    medium_rating_count = db.Column(db.Integer, default=0, nullable=False)
+    low_rating_count = db.Column(db.Integer, default=0, nullable=False)
+    high_price_count = db.Column(db.Integer, default=0, nullable=False)
+    medium_price_count = db.Column(db.Integer, default=0, nullable=False)
+    low_price_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # 数据完整度
+    stores_with_rating = db.Column(db.Integer, default=0, nullable=False)  # 评分 > 0
+    stores_with_phone = db.Column(db.Integer, default=0, nullable=False)
+
+    # 时间戳
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_type_distribution(self):
+        """获取商圈类型分布"""
+        if self.type_distribution:
+            try:
+                return json.loads(self.type_distribution)
+            except (json.JSONDecodeError, TypeError):
+                return {}
+        return {}
+
+    def set_type_distribution(self, distribution):
+        """设置商圈类型分布"""
+        self.type_distribution = json.dumps(distribution) if distribution is not None else None
+
+    def get_level_distribution(self):
+        """获取商圈等级分布"""
+        if self.level_distribution:
+            try:
+                return json.loads(self.level_distribution)
+            except (json.JSONDecodeError, TypeError):
+                return {}
+        return {}
+
+    def set_level_distribution(self, distribution):
+        """设置商圈等级分布"""
+        self.level_distribution = json.dumps(distribution) if distribution is not None else None
+
+    @property
+    def avg_area_rating(self):
+        return self.area_rating_sum / self.rated_area_count if self.rated_area_count else 0
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'region_id': self.region_id,
+            'level': self.level,
+            'parent_id': self.parent_id,
+            'area_count': self.area_count,
+            'active_area_count': self.active_area_count,
+            'area_store_count': self.area_store_count,
+            'hot_value_sum': self.hot_value_sum,
+            'avg_area_rating': round(self.avg_area_rating, 2),
+            'type_distribution': self.get_type_distribution(),
+            'level_distribution': self.get_level_distribution(),
+            'store_count': self.store_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<RegionStats {self.level} {self.region_id}>'
@@ -15,6 +15,8 @@ class Store(db.Model):
     id = db.Column(db.String(50), primary_key=True)  # 店铺唯一标识
     name = db.Column(db.String(100), nullable=False, index=True)  # 店铺名称
     business_area_id = db.Column(db.String(50), db.ForeignKey('business_areas.id'), nullable=False, index=True)
+    # 爬取到该店铺的商圈：按边界归属到其他商圈时记录，否则为空（即 business_area_id）
+    crawl_area_id = db.Column(db.String(50), nullable=True, index=True)
     
     # 店铺分类
     category = db.Column(db.Enum('restaurant', 'retail', 'entertainment', 'service', name='store_category_enum'), nullable=False, index=True)
@@ -33,6 +35,7 @@ class Store(db.Model):
     phone = db.Column(db.String(20), nullable=True)  # 联系电话
     address = db.Column(db.String(255), nullable=True)  # 详细地址
     opening_hours = db.Column(db.String(100), nullable=True)  # 营业时间
+    opening_bitmap = db.Column(db.LargeBinary(84), nullable=True)  # 一周营业时段位图（由 opening_hours 生成）
     description = db.Column(db.Text, nullable=True)  # 店铺描述
     
     # JSON字段（SQLite兼容）
@@ -45,7 +48,7 @@ class Store(db.Model):
     
     # 时间戳
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # 关系
     reviews = db.relationship('StoreReview', backref='store', lazy='dynamic', cascade='all, delete-orphan')
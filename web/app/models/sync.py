@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量同步数据模型
+"""
+
+from datetime import datetime
+from app.extensions import db
+
+class Tombstone(db.Model):
+    """删除记录（商圈/店铺删除时在同一事务内写入，供增量同步返回已删除的ID）"""
+    __tablename__ = 'tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.Enum('area', 'store', name='tombstone_entity_enum'), nullable=False)
+    entity_id = db.Column(db.String(50), nullable=False)
+
+    # 删除前的归属，用于按城市/商圈过滤
+    city_id = db.Column(db.String(20), nullable=True)
+    business_area_id = db.Column(db.String(50), nullable=True)
+
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_tombstones_entity_deleted_at', 'entity', 'deleted_at'),
+        db.Index('ix_tombstones_entity_id', 'entity', 'entity_id'),
+    )
+
+    def __repr__(self):
+        return f'<Tombstone {self.entity} {self.entity_id}>'
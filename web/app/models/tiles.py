@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热力图瓦片数据模型
+"""
+
+from datetime import datetime
+from app.extensions import db
+import json
+
+class HeatmapTile(db.Model):
+    """热力图瓦片（Web墨卡托 z/x/y，每个瓦片内再划分为 N×N 的网格单元）"""
+    __tablename__ = 'heatmap_tiles'
+
+    layer = db.Column(db.Enum('area', 'store', name='heatmap_layer_enum'), primary_key=True)
+    z = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    x = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    y = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    # 瓦片合计
+    count = db.Column(db.Integer, default=0)
+    hot_sum = db.Column(db.BigInteger, default=0)
+    hot_max = db.Column(db.Integer, default=0)
+    dominant_type = db.Column(db.String(20), nullable=True)
+
+    # 网格单元JSON：[[bx, by, 数量, 热度和, 热度最大值, 经度和, 纬度和, {类型: 数量}], ...]
+    bins = db.Column(db.Text, nullable=False)
+
+    # 时间戳
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_bins(self):
+        """获取网格单元列表"""
+        if self.bins:
+            try:
+                return json.loads(self.bins)
+            except (json.JSONDecodeError, TypeError):
+                return []
+        return []
+
+    def set_bins(self, bins):
+        """设置网格单元列表"""
+        self.bins = json.dumps(bins, separators=(',', ':'))
+
+    def __repr__(self):
+        return f'<HeatmapTile {self.layer} {self.z}/{self.x}/{self.y}>'
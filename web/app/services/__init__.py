@@ -0,0 +1 @@
+# 服务模块（派生数据与索引）
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈边界与店铺归属
+
+商圈可以有边界多边形（BusinessArea.boundary），来源为服务商AOI、商圈发现聚类的凸包或手动导入。
+有边界的城市按店铺坐标所在的边界确定店铺归属，替代“哪次爬取的半径搜到了它”：
+- 城市的边界按 BOUNDARY_GRID_DEGREES 划分网格建立索引（格子 -> 外接矩形覆盖该格子的边界），
+  店铺坐标按格子查找候选边界，外接矩形过滤后按边界分组做向量化的射线法判断（numpy为可选依赖）
+- 落在多个边界内的店铺归属面积最小的边界，不在任何边界内的店铺归属爬取到它的商圈
+- 店铺归属到其他商圈时在 crawl_area_id 记录爬取商圈，差量同步按爬取商圈判断消失的店铺
+- 同一商圈内按边界归属的同一POI（名称、坐标相同，来自不同商圈的爬取结果）只保留一行
+店铺同步时按边界归属新的爬取结果；修改边界后运行 assign() 按城市重新归属已有店铺，
+批量语句不经过ORM事件，这里同 store_sync 一样显式维护店铺汇总、标签、评价、变更事件和删除记录。
+批次后处理中按店铺汇总更新商圈的 store_count。
+"""
+
+import json
+import logging
+import math
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import bindparam, func, select
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.discovery import AreaCandidate
+from app.models.review import StoreReview
+from app.models.statistics import AreaStoreStats
+from app.models.store import Store
+from app.services import delta_sync, labels, outbox, post_crawl, store_stats
+from app.utils import sharding
+from app.utils.fragments import LRUCache
+
+# numpy为可选依赖，按边界归属店铺需要安装
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+areas_table = BusinessArea.__table__
+stores_table = Store.__table__
+
+SOURCES = ('aoi', 'hull', 'manual')
+
+METERS_PER_DEGREE = 111320.0
+
+# 判断同一POI时坐标保留的小数位（约1米）
+POI_DECIMALS = 5
+
+# 格子编号的偏移和跨度（格子边长不小于 0.0002 度）
+_CELL_OFFSET = 1 << 20
+_CELL_SPAN = 1 << 21
+
+# 每次定位的最大点数、每次读取/写入的最大店铺数
+_CHUNK_POINTS = 1_000_000
+_CHUNK_ROWS = 1000
+
+_indexes = LRUCache(maxsize=256)  # 城市ID -> (边界版本, 索引)
+
+
+# ===== 边界几何 =====
+
+def normalize_ring(coordinates):
+    """[[经度, 纬度], ...] → 去掉闭合点的浮点坐标环，少于3个不同的点或坐标无效时抛出 ValueError"""
+    try:
+        ring = [[float(point[0]), float(point[1])] for point in coordinates]
+    except (TypeError, ValueError, IndexError) as e:
+        raise ValueError('边界坐标格式错误') from e
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring = ring[:-1]
+    if any(not (-180 <= lng <= 180 and -90 <= lat <= 90) for lng, lat in ring):
+        raise ValueError('边界坐标超出范围')
+    if len({tuple(point) for point in ring}) < 3:
+        raise ValueError('边界至少需要3个不同的点')
+    return ring
+
+
+def ring_from_geojson(geometry):
+    """GeoJSON Polygon/MultiPolygon → 外环（忽略内环，多个多边形取面积最大的）"""
+    kind = (geometry or {}).get('type')
+    coordinates = (geometry.get('coordinates') or []) if kind else []
+    if kind == 'Polygon' and coordinates:
+        return normalize_ring(coordinates[0])
+    if kind == 'MultiPolygon' and coordinates:
+        rings = [normalize_ring(polygon[0]) for polygon in coordinates if polygon]
+        if rings:
+            return max(rings, key=ring_area_km2)
+    raise ValueError(f'不支持的边界几何类型: {kind}')
+
+
+def ring_area_km2(ring):
+    """坐标环的面积（平方公里，按中心纬度投影为平面）"""
+    lat0 = sum(lat for _, lat in ring) / len(ring)
+    scale_x = METERS_PER_DEGREE * math.cos(math.radians(lat0))
+    twice = 0.0
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        twice += x1 * y2 - x2 * y1
+    return abs(twice) / 2 * scale_x * METERS_PER_DEGREE / 1e6
+
+
+def set_boundary(area, ring, source):
+    """设置商圈边界（ring 为空时清除）并按边界更新面积，不提交"""
+    ring = normalize_ring(ring) if ring else None
+    if ring and source not in SOURCES:
+        raise ValueError(f'无效的边界来源: {source}')
+    area.set_boundary(ring, source)
+    if ring:
+        area.area = round(ring_area_km2(ring), 4)
+
+
+# ===== 网格索引与点在多边形内判断 =====
+
+def _cell_keys(ix, iy):
+    return (ix + _CELL_OFFSET) * _CELL_SPAN + (iy + _CELL_OFFSET)
+
+
+def _contains(ring, x, y):
+    """射线法：点 (x, y) 数组是否在坐标环内（逐条边向量化）"""
+    inside = np.zeros(len(x), dtype=bool)
+    xj, yj = ring[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for xi, yi in ring:
+            crosses = ((yi > y) != (yj > y)) & (x < (xj - xi) * (y - yi) / (yj - yi) + xi)
+            inside ^= crosses
+            xj, yj = xi, yi
+    return inside
+
+
+class _Index:
+    """城市边界的网格索引"""
+
+    def __init__(self, area_ids, rings, cell):
+        self.area_ids = area_ids
+        self.cell = cell
+        self.rings = [np.asarray(ring, dtype=float) for ring in rings]
+        self.bounds = np.array([[ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max()]
+                                for ring in self.rings])
+        self.sizes = np.array([ring_area_km2(ring) for ring in rings])
+
+        low = np.floor(self.bounds[:, :2] / cell).astype(np.int64)
+        high = np.floor(self.bounds[:, 2:] / cell).astype(np.int64)
+        keys, polygons = [], []
+        for position in range(len(rings)):
+            ix, iy = np.meshgrid(np.arange(low[position, 0], high[position, 0] + 1),
+                                 np.arange(low[position, 1], high[position, 1] + 1))
+            keys.append(_cell_keys(ix.ravel(), iy.ravel()))
+            polygons.append(np.full(ix.size, position, dtype=np.int64))
+        keys, polygons = np.concatenate(keys), np.concatenate(polygons)
+        order = np.argsort(keys, kind='stable')
+        self.keys, self.polygons = keys[order], polygons[order]
+
+    def locate(self, lng, lat):
+        """坐标数组 → 所在边界的序号（不在任何边界内为 -1）"""
+        result = np.full(len(lng), -1, dtype=np.int64)
+        for begin in range(0, len(lng), _CHUNK_POINTS):
+            end = begin + _CHUNK_POINTS
+            result[begin:end] = self._locate(lng[begin:end], lat[begin:end])
+        return result
+
+    def _locate(self, lng, lat):
+        result = np.full(len(lng), -1, dtype=np.int64)
+        keys = _cell_keys(np.floor(lng / self.cell).astype(np.int64), np.floor(lat / self.cell).astype(np.int64))
+        lo = np.searchsorted(self.keys, keys, side='left')
+        counts = np.searchsorted(self.keys, keys, side='right') - lo
+        total = int(counts.sum())
+        if not total:
+            return result
+
+        # 候选 (点, 边界) 对，先按外接矩形过滤
+        point = np.repeat(np.arange(len(lng)), counts)
+        entry = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        polygon = self.polygons[entry]
+        bounds = self.bounds[polygon]
+        px, py = lng[point], lat[point]
+        box = (px >= bounds[:, 0]) & (py >= bounds[:, 1]) & (px <= bounds[:, 2]) & (py <= bounds[:, 3])
+        point, polygon = point[box], polygon[box]
+        if not len(point):
+            return result
+
+        # 按边界分组判断
+        order = np.argsort(polygon, kind='stable')
+        point, polygon = point[order], polygon[order]
+        starts = np.flatnonzero(np.r_[True, polygon[1:] != polygon[:-1]])
+        ends = np.r_[starts[1:], len(polygon)]
+        inside = np.zeros(len(point), dtype=bool)
+        for start, end in zip(starts, ends):
+            members = point[start:end]
+            inside[start:end] = _contains(self.rings[polygon[start]], lng[members], lat[members])
+        point, polygon = point[inside], polygon[inside]
+        if not len(point):
+            return result
+
+        # 落在多个边界内时取面积最小的
+        order = np.lexsort((self.sizes[polygon], point))
+        point, polygon = point[order], polygon[order]
+        first = np.r_[True, point[1:] != point[:-1]]
+        result[point[first]] = polygon[first]
+        return result
+
+
+def locator(city_id):
+    """城市边界的索引（按边界商圈数和最新更新时间缓存），没有边界或未安装 numpy 时返回 None"""
+    if not HAS_NUMPY or not city_id:
+        return None
+    bounded = (areas_table.c.city_id == city_id, areas_table.c.boundary.isnot(None))
+    version = tuple(db.session.execute(
+        select(func.count(), func.max(areas_table.c.updated_at)).where(*bounded)
+    ).one())
+    if not version[0]:
+        return None
+    cached = _indexes.get(city_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    area_ids, rings = [], []
+    for area_id, boundary in db.session.execute(select(areas_table.c.id, areas_table.c.boundary).where(*bounded)):
+        try:
+            ring = normalize_ring(json.loads(boundary))
+        except (json.JSONDecodeError, TypeError, ValueError):
+            logger.warning(f"商圈 {area_id} 的边界无效，已忽略")
+            continue
+        area_ids.append(area_id)
+        rings.append(ring)
+    index = _Index(area_ids, rings, float(current_app.config.get('BOUNDARY_GRID_DEGREES', 0.01))) if rings else None
+    _indexes.set(city_id, (version, index))
+    return index
+
+
+def locate_rows(city_id, rows):
+    """店铺行（含 longitude、latitude）所在边界的商圈ID列表，不在边界内为 None；城市没有边界时返回 None"""
+    index = locator(city_id)
+    if index is None:
+        return None
+    rows = list(rows)
+    lng = np.fromiter((row.get('longitude') or 0.0 for row in rows), dtype=float, count=len(rows))
+    lat = np.fromiter((row.get('latitude') or 0.0 for row in rows), dtype=float, count=len(rows))
+    return [index.area_ids[position] if position >= 0 else None for position in index.locate(lng, lat)]
+
+
+def poi_key(row):
+    """同一POI的判断依据：名称和坐标"""
+    return (row.get('name'), round(row.get('longitude') or 0.0, POI_DECIMALS),
+            round(row.get('latitude') or 0.0, POI_DECIMALS))
+
+
+def duplicates(connection, rows):
+    """rows 中在其所属商圈已有同一POI（其他ID）的店铺ID"""
+    rows = list(rows)
+    if not rows:
+        return set()
+    existing = set()
+    statement = select(stores_table.c.id, stores_table.c.name, stores_table.c.longitude,
+                       stores_table.c.latitude, stores_table.c.business_area_id).where(
+        stores_table.c.business_area_id.in_(list({row['business_area_id'] for row in rows})),
+        stores_table.c.name.in_(list({row.get('name') for row in rows})),
+        stores_table.c.id.notin_([row['id'] for row in rows])
+    )
+    for row in connection.execute(statement).mappings():
+        existing.add((row['business_area_id'], *poi_key(row)))
+    return {row['id'] for row in rows if (row['business_area_id'], *poi_key(row)) in existing}
+
+
+# ===== 按城市重新归属 =====
+
+def _plan(city_id, index, rows):
+    """已有店铺 → ({店铺ID: (归属商圈, 爬取商圈)}, 重复的店铺ID)"""
+    if index is not None and rows:
+        lng = np.fromiter((row.longitude or 0.0 for row in rows), dtype=float, count=len(rows))
+        lat = np.fromiter((row.latitude or 0.0 for row in rows), dtype=float, count=len(rows))
+        located = index.locate(lng, lat).tolist()
+    else:
+        located = [-1] * len(rows)
+
+    moves, groups = {}, {}
+    for row, position in zip(rows, located):
+        origin = row.crawl_area_id or row.business_area_id
+        owner = index.area_ids[position] if position >= 0 else origin
+        crawl_area_id = origin if origin != owner else None
+        if owner != row.business_area_id or crawl_area_id != row.crawl_area_id:
+            moves[row.id] = (owner, crawl_area_id)
+        if position >= 0:
+            key = (owner, *poi_key(row._mapping))
+            groups.setdefault(key, []).append((origin != owner, row.id))
+
+    # 同一商圈内的同一POI保留爬取商圈即归属商圈的一行（其次ID最小的）
+    duplicated = set()
+    for members in groups.values():
+        if len(members) > 1:
+            members.sort()
+            duplicated.update(store_id for _, store_id in members[1:])
+    for store_id in duplicated:
+        moves.pop(store_id, None)
+    return moves, duplicated
+
+
+def _full_rows(store_connection, store_ids):
+    rows = {}
+    store_ids = list(store_ids)
+    for begin in range(0, len(store_ids), _CHUNK_ROWS):
+        chunk = store_ids[begin:begin + _CHUNK_ROWS]
+        rows.update((row['id'], dict(row)) for row in store_connection.execute(
+            select(stores_table).where(stores_table.c.id.in_(chunk))
+        ).mappings())
+    return rows
+
+
+def assign_city(city_id):
+    """按边界重新归属城市的店铺并去除重复的POI（不提交），返回 {'moved', 'deduplicated'}"""
+    if not HAS_NUMPY:
+        raise RuntimeError('按边界归属店铺需要安装 numpy')
+    area_ids = [row[0] for row in db.session.query(BusinessArea.id).filter(BusinessArea.city_id == city_id)]
+    if not area_ids:
+        return {'moved': 0, 'deduplicated': 0}
+
+    connection = db.session.connection()
+    with sharding.use_city(city_id):
+        store_connection = db.session.connection(bind_arguments={'mapper': Store.__mapper__})
+    rows = store_connection.execute(
+        select(stores_table.c.id, stores_table.c.name, stores_table.c.longitude, stores_table.c.latitude,
+               stores_table.c.business_area_id, stores_table.c.crawl_area_id)
+        .where(stores_table.c.business_area_id.in_(area_ids))
+    ).all()
+    moves, duplicated = _plan(city_id, locator(city_id), rows)
+    if not moves and not duplicated:
+        return {'moved': 0, 'deduplicated': 0}
+
+    now = datetime.utcnow()
+    full = _full_rows(store_connection, list(moves) + list(duplicated))
+    updated = [
+        (full[store_id], {'id': store_id, 'business_area_id': owner, 'crawl_area_id': crawl_area_id,
+                          'updated_at': now})
+        for store_id, (owner, crawl_area_id) in moves.items()
+    ]
+    deleted = [full[store_id] for store_id in duplicated]
+
+    if updated:
+        store_connection.execute(
+            stores_table.update()
+            .where(stores_table.c.id == bindparam('_id'))
+            .values(business_area_id=bindparam('_business_area_id'), crawl_area_id=bindparam('_crawl_area_id'),
+                    updated_at=bindparam('_updated_at')),
+            [{f'_{key}': value for key, value in new.items()} for _, new in updated]
+        )
+    gone = [row['id'] for row in deleted]
+    for begin in range(0, len(gone), _CHUNK_ROWS):
+        chunk = gone[begin:begin + _CHUNK_ROWS]
+        store_connection.execute(StoreReview.__table__.delete().where(StoreReview.__table__.c.store_id.in_(chunk)))
+        labels.clear(store_connection, Store, chunk)
+        store_connection.execute(stores_table.delete().where(stores_table.c.id.in_(chunk)))
+
+    # 店铺汇总：移出的商圈减、移入的商圈加，重复行从所在商圈减
+    deltas = {}
+    moved = [(old, new) for old, new in updated if old['business_area_id'] != new['business_area_id']]
+    for old, new in moved:
+        store_stats.accumulate(deltas.setdefault(old['business_area_id'], {}), old, sign=-1)
+        store_stats.accumulate(deltas.setdefault(new['business_area_id'], {}), {**old, **new})
+    for row in deleted:
+        store_stats.accumulate(deltas.setdefault(row['business_area_id'], {}), row, sign=-1)
+    for business_area_id, delta in deltas.items():
+        store_stats.apply_delta(connection, business_area_id, delta)
+
+    # 移出的商圈写入删除记录（清除店铺在移入商圈的旧删除记录）
+    outbox.record_bulk(connection, Store, 'store', updated=updated, deleted=deleted)
+    delta_sync.record_bulk(connection, 'store', [new['id'] for _, new in moved],
+                           [old for old, _ in moved] + deleted)
+    post_crawl.mark_cities([city_id])
+
+    result = {'moved': len(moved), 'deduplicated': len(deleted)}
+    logger.info(f"城市 {city_id} 店铺按边界归属: {result}")
+    return result
+
+
+def assign(city_ids):
+    """按城市重新归属店铺并逐个城市提交，返回 {城市ID: 结果}"""
+    summary = {}
+    try:
+        for city_id in city_ids:
+            summary[city_id] = assign_city(city_id)
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return summary
+
+
+def update_boundary(area_id, ring, source='manual'):
+    """
+    设置商圈边界并重新归属所在城市的店铺（写任务，不提交），返回 {'area_id', 'area', 'moved', 'deduplicated'}；
+    商圈不存在时抛出 LookupError，边界无效时抛出 ValueError
+    """
+    area = db.session.get(BusinessArea, area_id)
+    if area is None:
+        raise LookupError('商圈不存在')
+    set_boundary(area, ring, source)
+    db.session.flush()
+    return {'area_id': area.id, 'area': area.area, **assign_city(area.city_id)}
+
+
+# ===== 边界来源 =====
+
+def import_geojson(data, source='manual', city_id=None):
+    """
+    导入 GeoJSON FeatureCollection 中的边界（不提交）：要素属性 id/area_id 为商圈ID，
+    或按 name（可限定城市）匹配唯一的商圈；返回 (导入的商圈ID列表, 未匹配或无效的要素说明列表)
+    """
+    imported, skipped = [], []
+    for number, feature in enumerate((data or {}).get('features') or [], 1):
+        properties = feature.get('properties') or {}
+        area_id = properties.get('id') or properties.get('area_id')
+        if area_id:
+            area = db.session.get(BusinessArea, str(area_id))
+        else:
+            query = BusinessArea.query.filter_by(name=properties.get('name'))
+            if city_id or properties.get('city_id'):
+                query = query.filter_by(city_id=city_id or properties.get('city_id'))
+            matches = query.limit(2).all()
+            area = matches[0] if len(matches) == 1 else None
+        if area is None:
+            skipped.append(f"要素 {number}: 未找到商圈 {area_id or properties.get('name')}")
+            continue
+        try:
+            set_boundary(area, ring_from_geojson(feature.get('geometry')), source)
+        except ValueError as e:
+            skipped.append(f"要素 {number}: {str(e)}")
+            continue
+        imported.append(area.id)
+    return imported, skipped
+
+
+def from_candidates(city_id, force=False):
+    """
+    用商圈发现中 matched 候选商圈的凸包作为边界（不提交），已有AOI或手动边界的商圈除非 force 不覆盖；
+    同一商圈对应多个候选时取店铺最多的，返回设置边界的商圈ID列表
+    """
+    hulls = {}
+    for candidate in AreaCandidate.query.filter_by(city_id=city_id, status='matched') \
+            .order_by(AreaCandidate.store_count.desc()):
+        hull = candidate.get_hull()
+        if candidate.matched_area_id and len(hull) >= 3:
+            hulls.setdefault(candidate.matched_area_id, hull)
+
+    updated = []
+    for area in BusinessArea.query.filter(BusinessArea.id.in_(list(hulls))):
+        if area.boundary and area.boundary_source != 'hull' and not force:
+            continue
+        try:
+            set_boundary(area, hulls[area.id], 'hull')
+        except ValueError:
+            continue
+        updated.append(area.id)
+    return updated
+
+
+# ===== 商圈店铺数 =====
+
+def refresh_store_counts(city_id):
+    """按店铺汇总更新城市内商圈的 store_count（不提交），返回更新的商圈数"""
+    rows = db.session.query(BusinessArea.id, BusinessArea.store_count, AreaStoreStats.store_count) \
+        .join(AreaStoreStats, AreaStoreStats.business_area_id == BusinessArea.id) \
+        .filter(BusinessArea.city_id == city_id).all()
+    now = datetime.utcnow()
+    changes = [
+        ({'id': area_id, 'city_id': city_id, 'store_count': current},
+         {'id': area_id, 'city_id': city_id, 'store_count': count, 'updated_at': now})
+        for area_id, current, count in rows if current != count
+    ]
+    if not changes:
+        return 0
+
+    connection = db.session.connection(bind_arguments={'mapper': BusinessArea.__mapper__})
+    connection.execute(
+        areas_table.update()
+        .where(areas_table.c.id == bindparam('_id'))
+        .values(store_count=bindparam('_store_count'), updated_at=bindparam('_updated_at')),
+        [{'_id': new['id'], '_store_count': new['store_count'], '_updated_at': now} for _, new in changes]
+    )
+    outbox.record_bulk(connection, BusinessArea, 'area', updated=changes)
+    return len(changes)
+
+
+@post_crawl.stage(order=3)
+def _store_count_stage(city_ids):
+    """在商圈评分之前，把商圈店铺数更新为按店铺汇总的精确值"""
+    try:
+        total = sum(refresh_store_counts(city_id) for city_id in set(city_ids) if city_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info(f"商圈店铺数更新完成，共更新 {total} 个商圈")
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈发现
+
+把城市的店铺坐标按密度聚类（DBSCAN），得到不依赖关键词搜索的候选商圈，并与现有商圈对照。
+聚类在 numpy 数组上按网格加速，单机一百万个点约十秒：
+- 坐标投影为以城市为中心的平面米坐标，按边长 eps/√2 划分网格，同一格子内任意两点距离不超过 eps
+- 点数不少于 min_samples 的格子内都是核心点；其余格子的点只与周围21个格子的点计算距离
+- 核心点所在的格子为图的节点：稀疏格子按点对精确连边；两个密集格子之间按子网格代表点
+  （每格最多 DISCOVERY_SUBGRID² 个）筛选，代表点距离在 eps 与 eps + 2 × 子格对角线之间的格子对
+  再按点对精确判断，结果与逐点 DBSCAN 一致
+- 连通分量用向量化的标签传播计算，非核心点归入 eps 内核心点的聚类，其余为噪声
+对照现有商圈（只考虑中心在聚类2倍半径内的商圈）：某个商圈的店铺占比达到 DISCOVERY_MATCH_SHARE
+为 matched，覆盖多个商圈（店铺占比不低于 DISCOVERY_OVERLAP_SHARE 或中心在半径内）为 merge，
+只覆盖一个商圈也为 matched，否则为 new；
+不在任何聚类中的现有商圈记为 unsupported（多为单体建筑的关键词结果）。
+"""
+
+import json
+import logging
+import math
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.discovery import AreaCandidate
+from app.models.store import Store
+from app.utils import sharding
+
+# numpy为可选依赖，商圈发现需要安装
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE = 111320.0
+
+# 周围格子的偏移（5×5 去掉四角，四角的格子与中心格子的最近距离不小于 eps）
+_OFFSETS = [(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3) if abs(dx) < 2 or abs(dy) < 2]
+
+# 点对展开时每块的最大点对数
+_CHUNK_PAIRS = 4_000_000
+
+
+def _settings():
+    config = current_app.config
+    return {
+        'eps': float(config.get('DISCOVERY_EPS_METERS', 150)),
+        'min_samples': int(config.get('DISCOVERY_MIN_SAMPLES', 10)),
+        'min_stores': int(config.get('DISCOVERY_MIN_STORES', 30)),
+        'subgrid': int(config.get('DISCOVERY_SUBGRID', 8)),
+        'match_share': float(config.get('DISCOVERY_MATCH_SHARE', 0.5)),
+        'overlap_share': float(config.get('DISCOVERY_OVERLAP_SHARE', 0.2)),
+    }
+
+
+# ===== 网格 DBSCAN =====
+
+class _Grid:
+    """按格子排序的点及格子索引"""
+
+    def __init__(self, x, y, cell):
+        cx = np.floor((x - x.min()) / cell).astype(np.int64) + 2
+        cy = np.floor((y - y.min()) / cell).astype(np.int64) + 2
+        self.width = int(cy.max()) + 3
+        keys = cx * self.width + cy
+        self.order = np.argsort(keys, kind='stable')
+        self.x, self.y = x[self.order], y[self.order]
+        self.cells, self.starts, self.counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+        self.cell_of = np.repeat(np.arange(len(self.cells)), self.counts)
+        # 每个格子周围格子的序号，不存在为 -1
+        self.neighbors = np.full((len(self.cells), len(_OFFSETS)), -1, dtype=np.int64)
+        for k, (dx, dy) in enumerate(_OFFSETS):
+            wanted = self.cells + dx * self.width + dy
+            index = np.minimum(np.searchsorted(self.cells, wanted), len(self.cells) - 1)
+            self.neighbors[:, k] = np.where(self.cells[index] == wanted, index, -1)
+
+    def pairs(self, sources, eps):
+        """sources（排序后的点序号）与周围格子中距离不超过 eps 的点对 (i, j)，分块产出"""
+        eps2 = eps * eps
+        for k in range(len(_OFFSETS)):
+            target = self.neighbors[self.cell_of[sources], k]
+            valid = target >= 0
+            points, target = sources[valid], target[valid]
+            sizes = self.counts[target]
+            bounds = np.searchsorted(np.cumsum(sizes), np.arange(_CHUNK_PAIRS, sizes.sum() + _CHUNK_PAIRS, _CHUNK_PAIRS),
+                                     side='right')
+            begin = 0
+            for end in bounds:
+                end = max(end, begin + 1)
+                if begin >= len(points):
+                    break
+                chunk_sizes = sizes[begin:end]
+                total = int(chunk_sizes.sum())
+                first = np.cumsum(chunk_sizes) - chunk_sizes
+                i = np.repeat(points[begin:end], chunk_sizes)
+                j = np.repeat(self.starts[target[begin:end]] - first, chunk_sizes) + np.arange(total)
+                close = (self.x[i] - self.x[j]) ** 2 + (self.y[i] - self.y[j]) ** 2 <= eps2
+                yield i[close], j[close]
+                begin = end
+
+
+def _components(n, u, v):
+    """n 个节点、边 (u, v) 的连通分量标签（分量内最小节点序号）"""
+    labels = np.arange(n)
+    if len(u) == 0:
+        return labels
+    while True:
+        lu, lv = labels[u], labels[v]
+        low = np.minimum(lu, lv)
+        updated = labels.copy()
+        np.minimum.at(updated, lu, low)
+        np.minimum.at(updated, lv, low)
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def _representatives(grid, points, cell, subgrid):
+    """每个格子内每个子格保留一个点，返回 (代表点序号, 按格子的起始位置, 数量)"""
+    size = cell / subgrid
+    cells = grid.cell_of[points]
+    sx = np.minimum(np.floor((grid.x[points] - grid.x.min()) / size) % subgrid, subgrid - 1).astype(np.int64)
+    sy = np.minimum(np.floor((grid.y[points] - grid.y.min()) / size) % subgrid, subgrid - 1).astype(np.int64)
+    keys = cells * subgrid * subgrid + sx * subgrid + sy
+    _, first = np.unique(keys, return_index=True)
+    reps = points[first]
+    rep_cells = grid.cell_of[reps]
+    starts = np.searchsorted(rep_cells, np.arange(len(grid.cells)))
+    counts = np.searchsorted(rep_cells, np.arange(len(grid.cells)), side='right') - starts
+    return reps, starts, counts
+
+
+def _dense_edges(grid, dense, eps, cell, subgrid):
+    """
+    相邻密集格子之间的边（密集格子内都是核心点，有一对点距离不超过 eps 即相连）：
+    代表点距离不超过 eps 的直接相连；超过 eps + 2 × 子格对角线的一定不相连；
+    介于两者之间的格子对按全部点对精确判断
+    """
+    points = np.flatnonzero(dense[grid.cell_of])
+    if len(points) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    reps, starts, counts = _representatives(grid, points, cell, subgrid)
+    limit = (eps + 2 * math.sqrt(2) * cell / subgrid) ** 2
+    dense_cells = np.flatnonzero(dense)
+    edges_u, edges_v, uncertain_u, uncertain_v = [], [], [], []
+    for k in range(len(_OFFSETS)):
+        other = grid.neighbors[dense_cells, k]
+        keep = (other > dense_cells) & dense[np.maximum(other, 0)]
+        a, b = dense_cells[keep], other[keep]
+        if len(a) == 0:
+            continue
+        sizes = counts[a] * counts[b]
+        pair = np.repeat(np.arange(len(a)), sizes)
+        offset = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        i = reps[starts[a[pair]] + offset // counts[b[pair]]]
+        j = reps[starts[b[pair]] + offset % counts[b[pair]]]
+        distance = (grid.x[i] - grid.x[j]) ** 2 + (grid.y[i] - grid.y[j]) ** 2
+        linked = np.zeros(len(a), dtype=bool)
+        maybe = np.zeros(len(a), dtype=bool)
+        linked[pair[distance <= eps * eps]] = True
+        maybe[pair[distance <= limit]] = True
+        edges_u.append(a[linked])
+        edges_v.append(b[linked])
+        uncertain_u.append(a[maybe & ~linked])
+        uncertain_v.append(b[maybe & ~linked])
+
+    # 待定的格子对：从其中一侧格子的点出发精确计算 eps 内的点对
+    cell_count = len(grid.cells)
+    uncertain = np.concatenate(uncertain_u) * cell_count + np.concatenate(uncertain_v) if uncertain_u else []
+    if len(uncertain):
+        sources = np.flatnonzero(np.isin(grid.cell_of, uncertain // cell_count))
+        for i, j in grid.pairs(sources, eps):
+            keys = grid.cell_of[i] * cell_count + grid.cell_of[j]
+            hit = np.unique(keys[np.isin(keys, uncertain)])
+            edges_u.append(hit // cell_count)
+            edges_v.append(hit % cell_count)
+    if not edges_u:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(edges_u), np.concatenate(edges_v)
+
+
+def cluster(x, y, eps, min_samples, subgrid=8):
+    """平面坐标（米）的 DBSCAN 聚类标签，噪声为 -1；min_samples 含点本身"""
+    n = len(x)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    cell = eps / math.sqrt(2)
+    grid = _Grid(np.asarray(x, dtype=float), np.asarray(y, dtype=float), cell)
+    cell_count = len(grid.cells)
+    dense = grid.counts >= min_samples
+
+    # 稀疏格子的点：精确统计 eps 内的点数（周围格子点数合计不足的直接跳过）
+    core = dense[grid.cell_of].copy()
+    upper = np.where(grid.neighbors >= 0, grid.counts[np.maximum(grid.neighbors, 0)], 0).sum(axis=1)
+    sparse = np.flatnonzero(~dense[grid.cell_of])
+    candidates = sparse[upper[grid.cell_of[sparse]] >= min_samples]
+    if len(candidates):
+        found = np.zeros(n, dtype=np.int64)
+        for i, _ in grid.pairs(candidates, eps):
+            found += np.bincount(i, minlength=n)
+        core[candidates] = found[candidates] >= min_samples
+
+    # 核心格子之间的边；非核心点记录 eps 内任一核心点所在的格子
+    edges_u, edges_v = [], []
+    border_cell = np.full(n, -1, dtype=np.int64)
+    for i, j in grid.pairs(sparse, eps):
+        linked = core[j]
+        i, j = i[linked], j[linked]
+        both = core[i]
+        edges_u.append(grid.cell_of[i[both]])
+        edges_v.append(grid.cell_of[j[both]])
+        border_cell[i[~both]] = grid.cell_of[j[~both]]
+    u, v = _dense_edges(grid, dense, eps, cell, subgrid)
+    edges_u.append(u)
+    edges_v.append(v)
+    # 同一对格子的点对只保留一条边
+    edges = np.unique(np.concatenate(edges_u) * cell_count + np.concatenate(edges_v))
+    u, v = edges // cell_count, edges % cell_count
+
+    core_cell = np.zeros(cell_count, dtype=bool)
+    core_cell[grid.cell_of[core]] = True
+    cell_labels = _components(cell_count, u, v)
+
+    # 格子内有核心点时格子内所有点都在其 eps 内
+    owner = np.where(core_cell[grid.cell_of], grid.cell_of, border_cell)
+    sorted_labels = np.where(owner >= 0, cell_labels[np.maximum(owner, 0)], -1)
+    _, compact = np.unique(sorted_labels, return_inverse=True)
+    compact = compact - (1 if (sorted_labels < 0).any() else 0)
+
+    labels = np.empty(n, dtype=np.int64)
+    labels[grid.order] = compact
+    return labels
+
+
+# ===== 候选商圈 =====
+
+def _convex_hull(points):
+    """单调链凸包，points 为 [(x, y)]"""
+    points = sorted(set(points))
+    if len(points) <= 2:
+        return points
+
+    def half(sequence):
+        chain = []
+        for point in sequence:
+            while len(chain) >= 2 and (
+                (chain[-1][0] - chain[-2][0]) * (point[1] - chain[-2][1])
+                - (chain[-1][1] - chain[-2][1]) * (point[0] - chain[-2][0])
+            ) <= 0:
+                chain.pop()
+            chain.append(point)
+        return chain
+
+    lower, upper = half(points), half(reversed(points))
+    return lower[:-1] + upper[:-1]
+
+
+def _load_points(city_id, area_ids):
+    """城市店铺的 (经度, 纬度, 分类, 所属商圈) 列"""
+    statement = select(Store.longitude, Store.latitude, Store.category, Store.business_area_id) \
+        .where(Store.business_area_id.in_(area_ids))
+    with sharding.use_city(city_id):
+        rows = db.session.execute(statement, bind_arguments={'mapper': Store.__mapper__}).all()
+    rows = [row for row in rows if row[0] and row[1]]
+    lng = np.fromiter((row[0] for row in rows), dtype=float, count=len(rows))
+    lat = np.fromiter((row[1] for row in rows), dtype=float, count=len(rows))
+    return lng, lat, [row[2] for row in rows], [row[3] for row in rows]
+
+
+def _codes(values):
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+def discover_city(city_id, settings=None):
+    """聚类城市店铺并与现有商圈对照，返回候选商圈字典列表（未保存）"""
+    if not HAS_NUMPY:
+        raise RuntimeError('商圈发现需要安装 numpy')
+    settings = {**_settings(), **(settings or {})}
+    areas = db.session.query(BusinessArea.id, BusinessArea.longitude, BusinessArea.latitude) \
+        .filter(BusinessArea.city_id == city_id).all()
+    if not areas:
+        return []
+
+    lng, lat, categories, owners = _load_points(city_id, [area.id for area in areas])
+    lng0 = float(lng.mean()) if len(lng) else areas[0].longitude
+    lat0 = float(lat.mean()) if len(lat) else areas[0].latitude
+    scale_x = METERS_PER_DEGREE * math.cos(math.radians(lat0))
+    x, y = (lng - lng0) * scale_x, (lat - lat0) * METERS_PER_DEGREE
+
+    labels = cluster(x, y, settings['eps'], settings['min_samples'], settings['subgrid'])
+    category_codes, category_names = _codes(categories)
+    owner_codes, owner_ids = _codes(owners)
+    area_position = {area_id: i for i, area_id in enumerate(owner_ids)}
+    area_index = {area.id: i for i, area in enumerate(areas)}
+    area_x = np.array([(area.longitude - lng0) * scale_x for area in areas])
+    area_y = np.array([(area.latitude - lat0) * METERS_PER_DEGREE for area in areas])
+
+    clustered = labels >= 0
+    cluster_count = int(labels.max()) + 1 if clustered.any() else 0
+    sizes = np.bincount(labels[clustered], minlength=cluster_count)
+    keep = np.flatnonzero(sizes >= settings['min_stores'])
+
+    candidates, supported = [], set()
+    if len(keep):
+        member = clustered & np.isin(labels, keep)
+        index = np.flatnonzero(member)
+        group = labels[index]
+        # 保留的聚类重新编号为 0..K-1，按聚类的分类、商圈计数只为保留的聚类分配
+        kept = np.full(cluster_count, -1, dtype=np.int64)
+        kept[keep] = np.arange(len(keep))
+        cx = np.bincount(group, weights=x[index], minlength=cluster_count) / np.maximum(sizes, 1)
+        cy = np.bincount(group, weights=y[index], minlength=cluster_count) / np.maximum(sizes, 1)
+        distance = np.hypot(x[index] - cx[group], y[index] - cy[group])
+        # 半径：每个聚类内距离排序后的90%分位
+        order = np.lexsort((distance, group))
+        group_starts = np.searchsorted(group[order], keep)
+        radius = distance[order][group_starts + (0.9 * (sizes[keep] - 1)).astype(np.int64)]
+        categories_by_cluster = np.bincount(kept[group] * len(category_names) + category_codes[index],
+                                            minlength=len(keep) * len(category_names)) \
+            .reshape(len(keep), len(category_names))
+        owners_by_cluster = np.bincount(kept[group] * len(owner_ids) + owner_codes[index],
+                                        minlength=len(keep) * len(owner_ids)) \
+            .reshape(len(keep), len(owner_ids))
+        # 凸包在每格的代表点上计算（子网格去重）
+        cell = settings['eps'] / math.sqrt(2) / settings['subgrid']
+        cells = np.stack([group, np.floor(x[index] / cell), np.floor(y[index] / cell)], axis=1)
+        _, first = np.unique(cells, axis=0, return_index=True)
+        outline = {}
+        for point in index[first]:
+            outline.setdefault(int(labels[point]), []).append((float(lng[point]), float(lat[point])))
+
+        for position, label in enumerate(keep):
+            count = int(sizes[label])
+            r = max(float(radius[position]), settings['eps'])
+            shares = owners_by_cluster[position] / count
+            dominant = int(shares.argmax())
+            distance_to = np.hypot(area_x - cx[label], area_y - cy[label])
+            # 店铺归属的商圈中心需在聚类附近（2倍半径内），远处商圈爬取到的店铺不算覆盖该商圈
+            near = distance_to <= 2 * r
+            inside = {areas[i].id for i in np.flatnonzero(distance_to <= r)}
+            overlapping = inside | {owner_ids[i] for i in np.flatnonzero(shares >= settings['overlap_share'])
+                                    if near[area_index[owner_ids[i]]]}
+            if shares[dominant] >= settings['match_share'] and near[area_index[owner_ids[dominant]]]:
+                status, matched = 'matched', owner_ids[dominant]
+            elif len(overlapping) >= 2:
+                status, matched = 'merge', max(overlapping, key=lambda area_id: shares[area_position[area_id]]
+                                               if area_id in area_position else 0)
+            elif overlapping:
+                status, matched = 'matched', next(iter(overlapping))
+            else:
+                status, matched = 'new', None
+            supported |= overlapping | ({matched} if matched else set())
+            candidates.append({
+                'status': status,
+                'longitude': lng0 + float(cx[label]) / scale_x,
+                'latitude': lat0 + float(cy[label]) / METERS_PER_DEGREE,
+                'radius': round(r, 1),
+                'hull': [[round(a, 6), round(b, 6)] for a, b in _convex_hull(outline.get(int(label), []))],
+                'store_count': count,
+                'density': round(count / (math.pi * r * r / 1e6), 1),
+                'category_mix': {category_names[i]: int(n) for i, n in enumerate(categories_by_cluster[position]) if n},
+                'matched_area_id': matched,
+                'area_ids': sorted(overlapping),
+            })
+
+    # 不在任何聚类中的现有商圈
+    store_counts = np.bincount(owner_codes, minlength=len(owner_ids)) if len(owner_ids) else []
+    for area in areas:
+        if area.id not in supported:
+            position = area_position.get(area.id)
+            candidates.append({
+                'status': 'unsupported', 'longitude': area.longitude, 'latitude': area.latitude, 'radius': 0.0,
+                'hull': [], 'store_count': int(store_counts[position]) if position is not None else 0,
+                'density': 0.0, 'category_mix': {}, 'matched_area_id': area.id, 'area_ids': [area.id],
+            })
+    return candidates
+
+
+def save_city(city_id, candidates):
+    """按城市整体替换候选商圈（不提交）"""
+    AreaCandidate.query.filter_by(city_id=city_id).delete(synchronize_session=False)
+    now = datetime.utcnow()
+    db.session.add_all([
+        AreaCandidate(
+            city_id=city_id, created_at=now,
+            **{key: json.dumps(value, ensure_ascii=False) if key in ('hull', 'category_mix', 'area_ids') else value
+               for key, value in candidate.items()}
+        )
+        for candidate in candidates
+    ])
+
+
+def discover(city_ids, settings=None):
+    """发现并保存一批城市的候选商圈，返回 {城市ID: {状态: 数量}}"""
+    summary = {}
+    try:
+        for city_id in city_ids:
+            candidates = discover_city(city_id, settings)
+            save_city(city_id, candidates)
+            db.session.commit()
+            counts = {}
+            for candidate in candidates:
+                counts[candidate['status']] = counts.get(candidate['status'], 0) + 1
+            summary[city_id] = counts
+            logger.info(f"城市 {city_id} 商圈发现完成: {counts}")
+    except Exception:
+        db.session.rollback()
+        raise
+    return summary
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈详细数据后台刷新（stale-while-revalidate）
+
+crawl-details 接口发现数据过期时不在请求内爬取，而是立即返回当前数据并提交后台刷新：
+- 同一商圈同时只有一个刷新任务（single-flight），并发请求合并到同一个任务
+- 刷新结束（失败，或完成后数据仍不完整）后 AREA_REFRESH_RETRY_SECONDS 秒内不重新提交，避免每个请求都触发爬取
+- 任务状态保存在进程内，客户端轮询状态接口（可长轮询等待完成），
+  完成的任务保留 AREA_REFRESH_STATUS_TTL 秒
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.services import post_crawl, store_sync, write_queue
+from app.services.store_stats import get_area_with_stats
+
+logger = logging.getLogger(__name__)
+
+_jobs = {}
+_lock = threading.Lock()
+_executor = None
+
+
+class RefreshJob:
+    """一个商圈的刷新任务"""
+
+    def __init__(self, area_id):
+        self.id = uuid.uuid4().hex[:12]
+        self.area_id = area_id
+        self.status = 'queued'  # queued / running / done / failed
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.result = None
+        self.done = threading.Event()
+        self._finished_monotonic = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'jobId': self.id,
+            'areaId': self.area_id,
+            'status': self.status,
+            'createdAt': self.created_at.isoformat(),
+            'startedAt': self.started_at.isoformat() if self.started_at else None,
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None,
+            'error': self.error
+        }
+
+
+# ===== 数据新鲜度 =====
+
+def is_fresh(area, store_stats):
+    """商圈详细数据是否仍然新鲜（在有效期内更新过，且有店铺和评价数据）"""
+    max_age = timedelta(hours=current_app.config.get('AREA_DETAILS_MAX_AGE_HOURS', 48))
+    recent_update = area.updated_at and area.updated_at > datetime.utcnow() - max_age
+    has_detailed_data = (
+        store_stats.store_count > 0 and
+        (area.rating or 0) > 0 and
+        (area.review_count or 0) > 0
+    )
+    return bool(recent_update and has_detailed_data)
+
+
+# ===== 爬取 =====
+
+def _apply_refresh(area_id, area_details, stores_data):
+    """写入爬取结果（写任务，不提交），返回店铺同步结果"""
+    area = db.session.get(BusinessArea, area_id)
+    if area is None:
+        raise LookupError('商圈不存在')
+
+    # 更新商圈基本信息
+    area.rating = area_details.get('rating', area.rating)
+    area.review_count = area_details.get('review_count', 0)
+    area.hot_value = area_details.get('hot_value', area.hot_value)
+    area.description = area_details.get('description', area.description)
+    area.updated_at = datetime.utcnow()
+
+    # 按店铺ID差量同步（保留的店铺及其评价不受影响）
+    sync_result = None
+    if stores_data:
+        sync_result = store_sync.sync_area_stores(area_id, stores_data)
+
+        # 更新商圈统计信息（store_count 在批次后处理中按店铺汇总更新）
+        avg_rating = sum(s.get('rating', 0) for s in stores_data) / len(stores_data)
+        avg_price = sum(s.get('avg_price', 0) for s in stores_data) / len(stores_data)
+        area.rating = round(avg_rating, 1) if avg_rating > 0 else area.rating
+        area.avg_consumption = round(avg_price, 2) if avg_price > 0 else area.avg_consumption
+    return sync_result
+
+
+def refresh_area(area_id):
+    """
+    爬取商圈详细数据并同步店铺，返回 {'reviews_sample', 'store_count', 'store_changes'}；
+    商圈不存在或未获取到数据时抛出 LookupError
+    """
+    from app.crawler.data_sources.dianping_crawler import DianpingCrawler
+
+    area, _ = get_area_with_stats(area_id)
+    if not area:
+        raise LookupError('商圈不存在')
+    area_name = area.name
+
+    logger.info(f"开始爬取商圈 {area_name} 的详细数据")
+    crawler = DianpingCrawler()
+    area_details = crawler.search_area_by_name(area_name, area.city.name if area.city else '北京')
+    if not area_details:
+        raise LookupError('未能获取商圈详细数据')
+
+    reviews = crawler.get_area_reviews(area_id)
+    if reviews:
+        logger.info(f"获取到 {len(reviews)} 条商圈评价")
+
+    # 爬取商圈内的店铺数据，经单写线程写入
+    stores_data = crawler.get_stores(area_id, area_name, area.latitude, area.longitude)
+    sync_result = write_queue.run(_apply_refresh, area_id, area_details, stores_data)
+    logger.info(f"成功更新商圈 {area_name} 的详细数据")
+    write_queue.run(post_crawl.run, exclusive=True)
+
+    return {
+        'reviews_sample': reviews[:5] if reviews else [],
+        'store_count': len(stores_data or []),
+        'store_changes': sync_result
+    }
+
+
+# ===== 后台任务 =====
+
+def _run(app, job):
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    result, error = None, None
+    with app.app_context():
+        try:
+            result = refresh_area(job.area_id)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"刷新商圈 {job.area_id} 详细数据失败: {str(e)}")
+            error = str(e)
+    # 结束时间先于状态写入，并发的 request_refresh 看到 failed 时一定有结束时间
+    with _lock:
+        job.finished_at = datetime.utcnow()
+        job._finished_monotonic = time.monotonic()
+        job.result, job.error = result, error
+        job.status = 'failed' if error is not None else 'done'
+    job.done.set()
+
+
+def _expire(now):
+    ttl = current_app.config.get('AREA_REFRESH_STATUS_TTL', 600)
+    stale = [area_id for area_id, job in _jobs.items()
+             if job._finished_monotonic is not None and now - job._finished_monotonic > ttl]
+    for area_id in stale:
+        del _jobs[area_id]
+
+
+def request_refresh(area_id):
+    """
+    提交商圈刷新，返回 (任务, 是否新提交)；
+    已有排队/运行中的任务，或最近的任务结束后尚在重试间隔内时返回已有任务
+    （只在数据过期时调用，完成后仍过期的任务同样等待重试间隔）
+    """
+    global _executor
+
+    app = current_app._get_current_object()
+    retry = app.config.get('AREA_REFRESH_RETRY_SECONDS', 60)
+    now = time.monotonic()
+    with _lock:
+        _expire(now)
+        job = _jobs.get(area_id)
+        if job is not None and (not job.finished or now - job._finished_monotonic < retry):
+            return job, False
+
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('AREA_REFRESH_WORKERS', 2),
+                thread_name_prefix='area-refresh'
+            )
+        job = _jobs[area_id] = RefreshJob(area_id)
+    _executor.submit(_run, app, job)
+    return job, True
+
+
+def get_job(area_id):
+    """商圈最近的刷新任务（没有或已过期时返回 None）"""
+    with _lock:
+        _expire(time.monotonic())
+        return _jobs.get(area_id)
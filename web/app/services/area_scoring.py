@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈评分
+
+作为爬取批次后处理的第一个阶段（见 post_crawl），按城市由实际采集的店铺数据重新计算商圈的
+hot_value、rating、avg_consumption，替代爬取时按名称关键词估算的值：
+- 输入：area_store_stats 汇总（店铺数、推荐数、分类数量、评分/价格合计）、各商圈评价总数、
+  指标历史中店铺数的近期增长率
+- 热度：各特征在城市内归一化到 0-1，按 AREA_SCORING_WEIGHTS 加权平均后换算为 0-100
+- 评分：店铺评分的贝叶斯平均（以城市平均评分为先验），店铺少的商圈不会因个别高分排到前面
+- 人均消费：店铺人均价格的平均值
+整个城市的特征按列向量化计算（numpy为可选依赖），只对结果有变化的商圈批量更新，
+并显式写入变更事件、搜索索引热度和排行榜变更（批量语句不经过ORM事件）。没有店铺的商圈保持原值。
+"""
+
+import logging
+import math
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import bindparam, func
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.statistics import AreaStoreStats
+from app.models.store import Store
+from app.services import hot_ranking, metric_history, outbox, post_crawl, search_index
+from app.utils import sharding
+
+# numpy为可选依赖，未安装时使用纯Python实现
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+areas_table = BusinessArea.__table__
+
+FEATURES = ('stores', 'reviews', 'rating', 'recommended', 'diversity', 'growth')
+
+_CATEGORY_COLUMNS = tuple(f'{category}_count' for category in AreaStoreStats.CATEGORIES)
+_STATS_COLUMNS = ('store_count', 'recommended_count', 'rating_sum', 'rated_count',
+                  'price_sum', 'priced_count', *_CATEGORY_COLUMNS)
+
+# 店铺数增长率（%）截断到 ±GROWTH_RANGE 后映射到 0-1
+GROWTH_RANGE = 50
+
+
+# ===== 输入 =====
+
+def _inputs(city_id):
+    """城市内有店铺的商圈：(商圈行列表, {输入列: 值列表})"""
+    areas = {row['id']: dict(row) for row in db.session.execute(
+        areas_table.select().where(areas_table.c.city_id == city_id)
+    ).mappings()}
+    if not areas:
+        return [], {}
+    stats = AreaStoreStats.query.filter(
+        AreaStoreStats.business_area_id.in_(list(areas)), AreaStoreStats.store_count > 0
+    ).all()
+    area_ids = [row.business_area_id for row in stats]
+    if not area_ids:
+        return [], {}
+
+    # 评价总数不在汇总表中，按商圈ID在城市所在的分片中统计
+    with sharding.use_city(city_id):
+        reviews = dict(
+            db.session.query(Store.business_area_id, func.coalesce(func.sum(Store.review_count), 0))
+            .filter(Store.business_area_id.in_(area_ids))
+            .group_by(Store.business_area_id)
+        )
+    days = current_app.config.get('AREA_SCORING_GROWTH_DAYS', 7)
+    growth = metric_history.growth_rates(area_ids, [city_id], days=days, metric='store_count')
+
+    columns = {column: [getattr(row, column) or 0 for row in stats] for column in _STATS_COLUMNS}
+    columns['reviews'] = [reviews.get(area_id, 0) for area_id in area_ids]
+    columns['growth'] = [growth.get(area_id) for area_id in area_ids]
+    return [areas[area_id] for area_id in area_ids], columns
+
+
+# ===== 计算 =====
+
+def _weights():
+    configured = current_app.config.get('AREA_SCORING_WEIGHTS') or {}
+    return {name: float(configured.get(name, 0)) for name in FEATURES}
+
+
+def _compute_numpy(columns, weights, prior):
+    col = {name: np.array(values, dtype=float) for name, values in columns.items()}
+    rated = col['rated_count'].sum()
+    mean = col['rating_sum'].sum() / rated if rated else 0.0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rating = np.where(col['rated_count'] > 0,
+                          (col['rating_sum'] + prior * mean) / (col['rated_count'] + prior), np.nan)
+        price = np.where(col['priced_count'] > 0, col['price_sum'] / col['priced_count'], np.nan)
+        counts = np.stack([col[column] for column in _CATEGORY_COLUMNS], axis=1)
+        shares = counts / counts.sum(axis=1, keepdims=True)
+        entropy = -np.nansum(np.where(shares > 0, shares * np.log(shares), 0.0), axis=1)
+
+    stores = np.log1p(col['store_count'])
+    reviews = np.log1p(col['reviews'])
+    features = {
+        'stores': stores / stores.max(),
+        'reviews': reviews / reviews.max() if reviews.max() > 0 else reviews,
+        'rating': np.nan_to_num(rating) / 5,
+        'recommended': col['recommended_count'] / col['store_count'],
+        'diversity': entropy / math.log(len(_CATEGORY_COLUMNS)),
+        'growth': (np.clip(np.nan_to_num(col['growth']), -GROWTH_RANGE, GROWTH_RANGE) + GROWTH_RANGE)
+                  / (2 * GROWTH_RANGE),
+    }
+    total = sum(weights.values()) or 1.0
+    score = sum(weight * features[name] for name, weight in weights.items()) / total
+    hot = np.rint(np.clip(score, 0, 1) * 100)
+
+    def to_list(values):
+        return [None if math.isnan(value) else float(value) for value in values]
+
+    return [int(value) for value in hot], to_list(rating), to_list(price)
+
+
+def _compute_python(columns, weights, prior):
+    rated = sum(columns['rated_count'])
+    mean = sum(columns['rating_sum']) / rated if rated else 0.0
+    max_stores = max(math.log1p(value) for value in columns['store_count'])
+    max_reviews = max(math.log1p(value) for value in columns['reviews'])
+    total = sum(weights.values()) or 1.0
+
+    hot, rating, price = [], [], []
+    for i, store_count in enumerate(columns['store_count']):
+        rated_count = columns['rated_count'][i]
+        area_rating = (columns['rating_sum'][i] + prior * mean) / (rated_count + prior) if rated_count else None
+        priced_count = columns['priced_count'][i]
+        counts = [columns[column][i] for column in _CATEGORY_COLUMNS]
+        categorized = sum(counts)
+        entropy = -sum(count / categorized * math.log(count / categorized) for count in counts if count)
+        growth = min(max(columns['growth'][i] or 0, -GROWTH_RANGE), GROWTH_RANGE)
+        features = {
+            'stores': math.log1p(store_count) / max_stores,
+            'reviews': math.log1p(columns['reviews'][i]) / max_reviews if max_reviews else 0.0,
+            'rating': (area_rating or 0.0) / 5,
+            'recommended': columns['recommended_count'][i] / store_count,
+            'diversity': entropy / math.log(len(_CATEGORY_COLUMNS)),
+            'growth': (growth + GROWTH_RANGE) / (2 * GROWTH_RANGE),
+        }
+        score = sum(weight * features[name] for name, weight in weights.items()) / total
+        hot.append(int(round(min(max(score, 0.0), 1.0) * 100)))
+        rating.append(area_rating)
+        price.append(columns['price_sum'][i] / priced_count if priced_count else None)
+    return hot, rating, price
+
+
+def compute(columns, weights=None, prior=None):
+    """输入列 → (热度列表, 评分列表, 人均消费列表)，无法计算的评分/人均消费为 None"""
+    weights = weights or _weights()
+    prior = current_app.config.get('AREA_SCORING_RATING_PRIOR', 5) if prior is None else prior
+    if HAS_NUMPY:
+        return _compute_numpy(columns, weights, prior)
+    return _compute_python(columns, weights, prior)
+
+
+# ===== 写回 =====
+
+def score_city(city_id):
+    """重新计算城市内商圈的评分并批量更新（不提交），返回更新的商圈数"""
+    areas, columns = _inputs(city_id)
+    if not areas:
+        return 0
+
+    now = datetime.utcnow()
+    changes = []
+    for area, hot_value, rating, price in zip(areas, *compute(columns)):
+        new = {
+            'id': area['id'],
+            'city_id': area['city_id'],
+            'hot_value': hot_value,
+            'rating': round(rating, 1) if rating is not None else area['rating'],
+            'avg_consumption': round(price, 2) if price is not None else area['avg_consumption'],
+        }
+        if any(new[key] != area[key] for key in ('hot_value', 'rating', 'avg_consumption')):
+            changes.append((area, {**new, 'updated_at': now}))
+    if not changes:
+        return 0
+
+    statement = (
+        areas_table.update()
+        .where(areas_table.c.id == bindparam('_id'))
+        .values(hot_value=bindparam('_hot_value'), rating=bindparam('_rating'),
+                avg_consumption=bindparam('_avg_consumption'), updated_at=bindparam('_updated_at'))
+    )
+    connection = db.session.connection(bind_arguments={'mapper': BusinessArea.__mapper__})
+    connection.execute(statement, [{f'_{key}': value for key, value in new.items() if key != 'city_id'}
+                                   for _, new in changes])
+    outbox.record_bulk(connection, BusinessArea, 'area', updated=changes)
+    search_index.record_bulk(connection, [new for _, new in changes])
+    hot_ranking.record_bulk(db.session, [{**old, **new} for old, new in changes])
+    return len(changes)
+
+
+def score_cities(city_ids):
+    """重新计算一批城市并提交，返回更新的商圈数"""
+    try:
+        total = sum(score_city(city_id) for city_id in set(city_ids) if city_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return total
+
+
+@post_crawl.stage(order=5)
+def _score_stage(city_ids):
+    """在城市汇总、指标历史之前更新，后续阶段读取新的热度"""
+    if not current_app.config.get('AREA_SCORING_ENABLED', True):
+        return
+    total = score_cities(city_ids)
+    logger.info(f"商圈评分完成，共更新 {total} 个商圈")
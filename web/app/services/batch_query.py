@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析接口批量执行
+
+把多个分析子查询解析到对应的视图函数，在同一个请求内执行：
+- 子查询共享请求级查找缓存（城市汇总、指标趋势等只计算一次）
+- 分组到最多 BATCH_MAX_WORKERS 个线程并发执行，组内共享一个应用上下文和数据库会话，
+  沿用调用方的读写分离状态（强制主库、读己之写）
+子查询结果为各接口原本的JSON响应体，由调用方直接拼接。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.exceptions import HTTPException
+
+from app.utils import db_routing, request_cache
+from app.utils.response import error_response
+
+BATCH_ENDPOINT = 'analytics.batch_query'
+
+# 不支持的子查询：批量接口本身、二进制瓦片
+EXCLUDED_ENDPOINTS = (BATCH_ENDPOINT, 'analytics.get_heatmap_tile')
+
+
+def _prefix():
+    """分析接口的URL前缀（批量接口所在的蓝图）"""
+    rule = next(current_app.url_map.iter_rules(BATCH_ENDPOINT)).rule
+    return rule[:-len('/batch')]
+
+
+def plan(queries, common=None):
+    """
+    校验子查询并解析到视图函数，返回执行计划；无效时抛出 ValueError。
+    queries 为 [{"id", "path", "params", "body"}]，带 body 的子查询按POST执行，common 为公共参数。
+    """
+    prefix = _prefix()
+    adapter = current_app.url_map.bind('localhost')
+    plans, seen = [], set()
+    for query in queries:
+        if not isinstance(query, dict) or not isinstance(query.get('path'), str):
+            raise ValueError('子查询需要指定path')
+        path = f"{prefix}/{query['path'].strip('/')}"
+        query_id = str(query.get('id') or query['path'])
+        if query_id in seen:
+            raise ValueError(f'子查询ID重复: {query_id}')
+        seen.add(query_id)
+
+        body = query.get('body')
+        method = 'GET' if body is None else 'POST'
+        try:
+            endpoint, view_args = adapter.match(path, method)
+        except HTTPException:
+            raise ValueError(f"不支持的子查询: {method} {query['path']}")
+        if not endpoint.startswith('analytics.') or endpoint in EXCLUDED_ENDPOINTS:
+            raise ValueError(f"不支持的子查询: {query['path']}")
+
+        # 子查询结果直接嵌入合并响应，只输出JSON
+        params = {**(common or {}), **(query.get('params') or {})}
+        params.pop('format', None)
+        plans.append({
+            'id': query_id, 'path': path, 'method': method, 'params': params, 'body': body,
+            'endpoint': endpoint, 'view_args': view_args
+        })
+    return plans
+
+
+def _dispatch(app, item):
+    """在当前应用上下文中执行一个子查询，返回 (ID, 响应体JSON字节)"""
+    with app.test_request_context(item['path'], method=item['method'],
+                                  query_string=item['params'], json=item['body']):
+        response = app.make_response(app.view_functions[item['endpoint']](**item['view_args']))
+        if response.mimetype != 'application/json' or response.content_encoding:
+            response = error_response('子查询未返回JSON', 500)
+        return item['id'], response.get_data()
+
+
+def _run_group(app, items, cache, routing):
+    """工作线程：在一个应用上下文（同一个数据库会话）中依次执行一组子查询"""
+    with app.app_context():
+        request_cache.bind(cache)
+        db_routing.bind(routing)
+        return [_dispatch(app, item) for item in items]
+
+
+def execute(plans):
+    """执行计划，按计划顺序返回 [(ID, 响应体JSON字节)]"""
+    app = current_app._get_current_object()
+    cache = request_cache.current()
+    routing = db_routing.current()
+    workers = min(current_app.config.get('BATCH_MAX_WORKERS', 4), len(plans))
+    if workers <= 1:
+        return [_dispatch(app, item) for item in plans]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        groups = executor.map(lambda group: _run_group(app, group, cache, routing),
+                              [plans[index::workers] for index in range(workers)])
+        results = dict(result for group in groups for result in group)
+    return [(item['id'], results[item['id']]) for item in plans]
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+派生数据（索引、统计等）相关的CLI命令
+"""
+
+import click
+from flask.cli import with_appcontext
+
+
+@click.group()
+def search():
+    """搜索索引相关命令"""
+    pass
+
+
+@search.command()
+@with_appcontext
+def rebuild():
+    """全量重建搜索索引"""
+    from . import search_index
+
+    try:
+        if not search_index.is_enabled():
+            click.echo("⚠️  搜索索引不可用（需要SQLite FTS5）")
+            return
+
+        count = search_index.rebuild()
+        click.echo(f"✅ 搜索索引重建完成，共 {count} 条")
+
+    except Exception as e:
+        click.echo(f"❌ 重建搜索索引失败: {str(e)}")
+
+
+@click.group()
+def reference():
+    """城市参考数据相关命令"""
+    pass
+
+
+@reference.command('reload')
+@with_appcontext
+def reload_reference():
+    """重新加载城市参考数据并输出概况"""
+    from . import reference_data
+
+    try:
+        snapshot = reference_data.reload()
+        click.echo(f"✅ 城市参考数据加载完成，共 {len(snapshot.records)} 条，"
+                   f"省份 {len(snapshot.provinces)} 个，热门城市 {len(snapshot.hot_cities)} 个")
+
+    except Exception as e:
+        click.echo(f"❌ 加载城市参考数据失败: {str(e)}")
+
+
+@click.group()
+def stats():
+    """统计汇总相关命令"""
+    pass
+
+
+@stats.command('rebuild')
+@click.option('--area-id', default=None, help='只重建指定商圈')
+@with_appcontext
+def rebuild_stats(area_id):
+    """从店铺数据重建商圈店铺统计及城市/区县汇总"""
+    from . import store_stats, region_stats
+
+    try:
+        count = store_stats.rebuild(area_id)
+        click.echo(f"✅ 商圈店铺统计重建完成，共 {count} 个商圈")
+
+        if area_id:
+            from app.models.business_area import BusinessArea
+            area = BusinessArea.query.get(area_id)
+            count = region_stats.refresh_cities([area.city_id] if area else [])
+        else:
+            count = region_stats.rebuild()
+        click.echo(f"✅ 城市/区县汇总重建完成，共 {count} 个城市")
+
+    except Exception as e:
+        click.echo(f"❌ 重建商圈店铺统计失败: {str(e)}")
+
+
+@click.group()
+def history():
+    """指标历史相关命令"""
+    pass
+
+
+@history.command('record')
+@with_appcontext
+def record_history():
+    """立即为所有有商圈的城市记录一次指标快照"""
+    from app.extensions import db
+    from app.models.business_area import BusinessArea
+    from . import metric_history
+
+    try:
+        city_ids = [row[0] for row in db.session.query(BusinessArea.city_id).distinct()]
+        total = metric_history.record_cities(city_ids)
+        click.echo(f"✅ 指标快照记录完成，共 {len(city_ids)} 个城市 {total} 个商圈")
+
+    except Exception as e:
+        click.echo(f"❌ 记录指标快照失败: {str(e)}")
+
+
+@history.command('prune')
+@click.option('--keep-months', default=6, help='原始快照保留月数')
+@with_appcontext
+def prune_history(keep_months):
+    """清理过期的原始快照分区（按天/周降采样的序列保留）"""
+    from . import metric_history
+
+    try:
+        deleted = metric_history.prune(keep_months)
+        click.echo(f"✅ 已清理 {deleted} 条原始快照")
+
+    except Exception as e:
+        click.echo(f"❌ 清理指标快照失败: {str(e)}")
+
+
+@click.group()
+def heatmap():
+    """热力图瓦片相关命令"""
+    pass
+
+
+@heatmap.command('rebuild')
+@click.option('--layer', type=click.Choice(['area', 'store']), default=None, help='只重建指定图层')
+@with_appcontext
+def rebuild_heatmap(layer):
+    """全量重建热力图瓦片金字塔"""
+    from . import heatmap_tiles
+
+    try:
+        count = heatmap_tiles.rebuild([layer] if layer else None)
+        click.echo(f"✅ 热力图瓦片重建完成，共 {count} 个瓦片")
+
+    except Exception as e:
+        click.echo(f"❌ 重建热力图瓦片失败: {str(e)}")
+
+
+@click.group()
+def opening():
+    """营业时段位图相关命令"""
+    pass
+
+
+@opening.command('rebuild')
+@with_appcontext
+def rebuild_opening():
+    """由营业时间文本重新生成全部位图（分片库中的旧数据补齐、解析规则变化后使用）"""
+    from . import opening_index
+
+    try:
+        count = opening_index.rebuild()
+        click.echo(f"✅ 营业时段位图重建完成，共 {count} 行")
+
+    except Exception as e:
+        click.echo(f"❌ 重建营业时段位图失败: {str(e)}")
+
+
+@click.group()
+def outbox():
+    """变更事件发件箱相关命令"""
+    pass
+
+
+@outbox.command('consume')
+@click.option('--loop', is_flag=True, help='持续轮询（作为独立的消费者进程运行）')
+@click.option('--handler', 'names', multiple=True, help='只运行指定处理器，可重复')
+@with_appcontext
+def consume_outbox(loop, names):
+    """将变更事件分发给已注册的处理器"""
+    from . import outbox as outbox_service
+
+    try:
+        if loop:
+            click.echo(f"🔄 变更事件消费者已启动，处理器: {', '.join(outbox_service.handlers())}")
+            outbox_service.run_forever()
+            return
+
+        result = outbox_service.consume(list(names) or None)
+        for name, count in result.items():
+            if count is None:
+                click.echo(f"❌ {name}: 处理失败，位置未推进")
+            else:
+                click.echo(f"✅ {name}: 处理 {count} 条事件")
+        outbox_service.prune()
+
+    except Exception as e:
+        click.echo(f"❌ 处理变更事件失败: {str(e)}")
+
+
+@outbox.command('status')
+@with_appcontext
+def outbox_status():
+    """查看各处理器的消费位置和积压数量"""
+    from app.models.outbox import OutboxEvent
+    from . import outbox as outbox_service
+
+    for name in outbox_service.handlers():
+        offset = outbox_service.get_offset(name)
+        backlog = OutboxEvent.query.filter(OutboxEvent.id > offset).count()
+        click.echo(f"{name}: 位置 {offset}，积压 {backlog} 条")
+
+
+@click.group()
+def dashboard():
+    """仪表盘快照相关命令"""
+    pass
+
+
+@dashboard.command('snapshot')
+@click.option('--city', 'city_id', default=None, help='只生成指定城市的快照')
+@with_appcontext
+def snapshot_dashboard(city_id):
+    """重新生成城市仪表盘快照（可由定时任务调用）"""
+    from . import dashboard_snapshot
+
+    try:
+        if city_id:
+            row = dashboard_snapshot.regenerate(city_id)
+            if row is None:
+                click.echo(f"⚠️  城市 {city_id} 不存在")
+            else:
+                click.echo(f"✅ 城市 {city_id} 仪表盘快照版本 {row.version}")
+            return
+
+        count = dashboard_snapshot.regenerate_all()
+        click.echo(f"✅ 仪表盘快照生成完成，共 {count} 个城市")
+
+    except Exception as e:
+        click.echo(f"❌ 生成仪表盘快照失败: {str(e)}")
+
+
+@click.group()
+def shards():
+    """店铺数据分片相关命令"""
+    pass
+
+
+@shards.command('status')
+@with_appcontext
+def shards_status():
+    """查看各分片的店铺数量"""
+    from app.models.store import Store
+    from app.utils import sharding
+
+    if not sharding.is_enabled():
+        click.echo("⚠️  未配置分片（DATABASE_SHARD_URLS）")
+        return
+    for name, count in sharding.fan_out(lambda: Store.query.count()):
+        click.echo(f"{name}: {count} 个店铺")
+
+
+@shards.command('migrate')
+@with_appcontext
+def migrate_shards():
+    """将主库中已有的店铺和评价复制到所在分片（可重复执行）"""
+    from app.utils import sharding
+
+    try:
+        if not sharding.is_enabled():
+            click.echo("⚠️  未配置分片（DATABASE_SHARD_URLS）")
+            return
+
+        for name, count in sharding.migrate_from_primary().items():
+            click.echo(f"✅ {name}: 复制 {count} 个店铺")
+
+    except Exception as e:
+        click.echo(f"❌ 迁移店铺数据失败: {str(e)}")
+
+
+@click.group()
+def scoring():
+    """商圈评分相关命令"""
+    pass
+
+
+@scoring.command('run')
+@click.option('--city', 'city_id', default=None, help='只计算指定城市')
+@with_appcontext
+def run_scoring(city_id):
+    """由店铺数据重新计算商圈热度、评分、人均消费"""
+    from app.extensions import db
+    from app.models.business_area import BusinessArea
+    from . import area_scoring
+
+    try:
+        city_ids = [city_id] if city_id else [row[0] for row in db.session.query(BusinessArea.city_id).distinct()]
+        count = area_scoring.score_cities(city_ids)
+        click.echo(f"✅ 商圈评分完成，共更新 {count} 个商圈")
+
+    except Exception as e:
+        click.echo(f"❌ 商圈评分失败: {str(e)}")
+
+
+@click.group()
+def discovery():
+    """商圈发现相关命令"""
+    pass
+
+
+@discovery.command('run')
+@click.option('--city', 'city_id', default=None, help='只处理指定城市')
+@click.option('--eps', type=float, default=None, help='邻域半径（米），默认读取配置')
+@click.option('--min-samples', type=int, default=None, help='核心点邻域内的最少店铺数')
+@with_appcontext
+def run_discovery(city_id, eps, min_samples):
+    """按店铺密度聚类发现候选商圈，并与现有商圈对照"""
+    from app.extensions import db
+    from app.models.business_area import BusinessArea
+    from . import area_discovery
+
+    try:
+        city_ids = [city_id] if city_id else [row[0] for row in db.session.query(BusinessArea.city_id).distinct()]
+        settings = {key: value for key, value in (('eps', eps), ('min_samples', min_samples)) if value is not None}
+        summary = area_discovery.discover(city_ids, settings)
+        for city, counts in summary.items():
+            click.echo(f"{city}: " + ', '.join(f"{status} {count}" for status, count in sorted(counts.items())))
+        click.echo(f"✅ 商圈发现完成，共 {len(summary)} 个城市")
+
+    except Exception as e:
+        click.echo(f"❌ 商圈发现失败: {str(e)}")
+
+
+@click.group()
+def boundaries():
+    """商圈边界相关命令"""
+    pass
+
+
+@boundaries.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--source', type=click.Choice(['aoi', 'manual']), default='manual', help='边界来源')
+@click.option('--city', 'city_id', default=None, help='按名称匹配商圈时限定城市')
+@with_appcontext
+def import_boundaries(path, source, city_id):
+    """从 GeoJSON FeatureCollection 导入商圈边界（服务商AOI或手动绘制）"""
+    import json
+    from app.extensions import db
+    from . import area_boundaries
+
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        imported, skipped = area_boundaries.import_geojson(data, source, city_id)
+        db.session.commit()
+        for message in skipped:
+            click.echo(f"⚠️  {message}")
+        click.echo(f"✅ 导入 {len(imported)} 个商圈边界，运行 flask boundaries assign 重新归属店铺")
+
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f"❌ 导入商圈边界失败: {str(e)}")
+
+
+@boundaries.command('from-candidates')
+@click.option('--city', 'city_id', default=None, help='只处理指定城市')
+@click.option('--force', is_flag=True, help='覆盖已有的AOI或手动边界')
+@with_appcontext
+def boundaries_from_candidates(city_id, force):
+    """用商圈发现得到的聚类凸包作为对应商圈的边界"""
+    from app.extensions import db
+    from app.models.discovery import AreaCandidate
+    from . import area_boundaries
+
+    try:
+        city_ids = [city_id] if city_id else [row[0] for row in db.session.query(AreaCandidate.city_id).distinct()]
+        count = sum(len(area_boundaries.from_candidates(city, force)) for city in city_ids)
+        db.session.commit()
+        click.echo(f"✅ 设置 {count} 个商圈边界，运行 flask boundaries assign 重新归属店铺")
+
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f"❌ 设置商圈边界失败: {str(e)}")
+
+
+@boundaries.command('assign')
+@click.option('--city', 'city_id', default=None, help='只处理指定城市')
+@with_appcontext
+def assign_boundaries(city_id):
+    """按边界重新归属店铺并去除重复的POI，然后更新汇总和商圈店铺数"""
+    from app.extensions import db
+    from app.models.business_area import BusinessArea
+    from . import area_boundaries, post_crawl
+
+    try:
+        city_ids = [city_id] if city_id else [row[0] for row in db.session.query(BusinessArea.city_id).distinct()]
+        summary = area_boundaries.assign(city_ids)
+        for city, result in summary.items():
+            click.echo(f"{city}: 移动 {result['moved']}，去重 {result['deduplicated']}")
+        post_crawl.mark_cities(city_ids)
+        post_crawl.run()
+        click.echo(f"✅ 店铺归属完成，共 {len(summary)} 个城市")
+
+    except Exception as e:
+        click.echo(f"❌ 店铺归属失败: {str(e)}")
+
+
+def register_commands(app):
+    """注册派生数据命令"""
+    app.cli.add_command(search)
+    app.cli.add_command(reference)
+    app.cli.add_command(stats)
+    app.cli.add_command(history)
+    app.cli.add_command(heatmap)
+    app.cli.add_command(opening)
+    app.cli.add_command(outbox)
+    app.cli.add_command(dashboard)
+    app.cli.add_command(shards)
+    app.cli.add_command(scoring)
+    app.cli.add_command(discovery)
+    app.cli.add_command(boundaries)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取结果写入任务
+
+爬虫管理器（crawler.CrawlerManager）和数据源管理器（data_sources.DataSourceManager）共用的写任务，
+由调用方通过 write_queue.run() 交给单写线程执行，任务内不提交。
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.store import Store
+from app.utils import sharding
+
+logger = logging.getLogger(__name__)
+
+
+def write_business_areas(areas: List[Dict[str, Any]],
+                         update_existing: bool = False) -> List[Dict[str, Any]]:
+    """写入商圈数据，返回已保存（含已存在而跳过）的商圈"""
+    saved_areas = []
+
+    for area_data in areas:
+        try:
+            # 检查是否已存在
+            existing_area = BusinessArea.query.get(area_data['id'])
+
+            if existing_area and not update_existing:
+                logger.debug(f"商圈 {area_data['name']} 已存在，跳过")
+                saved_areas.append(area_data)
+                continue
+
+            if existing_area and update_existing:
+                # 更新现有记录
+                for key, value in area_data.items():
+                    if hasattr(existing_area, key) and key != 'id':
+                        setattr(existing_area, key, value)
+                existing_area.updated_at = datetime.utcnow()
+                logger.info(f"更新商圈: {area_data['name']}")
+            else:
+                # 创建新记录
+                area = BusinessArea(**area_data)
+                db.session.add(area)
+                logger.info(f"新增商圈: {area_data['name']}")
+
+            saved_areas.append(area_data)
+
+        except Exception as e:
+            logger.error(f"保存商圈 {area_data.get('name', 'Unknown')} 失败: {str(e)}")
+            continue
+
+    return saved_areas
+
+
+def write_stores(stores: List[Dict[str, Any]],
+                 update_existing: bool = False) -> List[Dict[str, Any]]:
+    """写入同一商圈的店铺数据，返回已保存（含已存在而跳过）的店铺"""
+    saved_stores = []
+
+    area_id = stores[0].get('business_area_id') if stores else None
+    with sharding.use_area(area_id):
+        for store_data in stores:
+            try:
+                # 检查是否已存在
+                existing_store = Store.query.get(store_data['id'])
+
+                if existing_store and not update_existing:
+                    saved_stores.append(store_data)
+                    continue
+
+                if existing_store and update_existing:
+                    # 更新现有记录
+                    for key, value in store_data.items():
+                        if hasattr(existing_store, key) and key != 'id':
+                            setattr(existing_store, key, value)
+                    existing_store.updated_at = datetime.utcnow()
+                else:
+                    # 创建新记录
+                    store = Store(**store_data)
+                    db.session.add(store)
+
+                saved_stores.append(store_data)
+
+            except Exception as e:
+                logger.error(f"保存店铺 {store_data.get('name', 'Unknown')} 失败: {str(e)}")
+                continue
+
+        # 在商圈所在的分片内写入
+        db.session.flush()
+
+    return saved_stores
+
+
+def write_area_store_count(area_id: str, store_count: int):
+    """写入商圈的店铺数量"""
+    area = BusinessArea.query.get(area_id)
+    if area:
+        area.store_count = store_count
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+城市仪表盘快照
+
+爬取批次结束后（或定时、或快照过期时）在后台线程中为城市渲染完整的仪表盘文档：
+城市概览、各图表数据、热度排行、热力图瓦片索引、雷达图基准（排行前几名商圈），
+编码为JSON并预压缩后存入 dashboard_snapshots。接口直接输出存储的响应体，
+首屏耗时与缓存状态无关；内容未变化时版本和 ETag 不变，客户端可用 If-None-Match 复用。
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.dashboard import DashboardSnapshot
+from app.services import batch_query, heatmap_tiles, hot_ranking, post_crawl, reference_data
+from app.utils import db_routing
+from app.utils.response import dumps, precompress
+
+logger = logging.getLogger(__name__)
+
+# 快照包含的图表（键与前端 getDashboard 的子查询ID一致）
+SECTIONS = [
+    {'id': 'hotRanking', 'path': 'hot-ranking'},
+    {'id': 'hourlyFlow', 'path': 'hourly-flow'},
+    {'id': 'category', 'path': 'category-distribution'},
+    {'id': 'sentiment', 'path': 'sentiment-analysis'},
+    {'id': 'trend', 'path': 'consumption-trend'},
+    {'id': 'heatmap', 'path': 'heatmap'},
+]
+
+# 雷达图基准：热度排行前几名商圈
+RADAR_AREAS = 3
+
+# 瓦片索引使用的缩放级别（与热力图接口默认值一致）
+TILE_INDEX_ZOOM = 10
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+# ===== 渲染 =====
+
+def render(city_id):
+    """渲染城市仪表盘文档，城市不存在时返回 None"""
+    city = reference_data.get_snapshot().records.get(city_id)
+    if city is None:
+        return None
+
+    _, top = hot_ranking.get_ranking(city_id, 0, RADAR_AREAS)
+    queries = [
+        {'id': 'overview', 'path': f'city/{city_id}'},
+        *SECTIONS,
+        {'id': 'radar', 'path': 'radar-comparison', 'body': {'areaIds': [item['id'] for item in top]}},
+    ]
+
+    sections = {}
+    for query_id, body in batch_query.execute(batch_query.plan(queries, {'cityId': city_id})):
+        envelope = json.loads(body)
+        sections[query_id] = envelope.get('data') if envelope.get('code') == 200 else None
+    # 增量游标按请求时间生成，快照中不保留（否则内容每次都会变化）
+    if sections.get('heatmap'):
+        sections['heatmap'].pop('cursor', None)
+
+    tiles = None
+    bbox = heatmap_tiles.extent(city_id)
+    if bbox is not None:
+        z, keys = heatmap_tiles.cover(bbox, TILE_INDEX_ZOOM)
+        tiles = {'zoom': z, 'bbox': list(bbox), 'tiles': [[x, y] for x, y in keys]}
+
+    return {'cityId': city_id, 'city': city, 'sections': sections, 'tiles': tiles}
+
+
+def _etag(city_id, version, content_hash):
+    return f'{city_id}-{version}-{content_hash[:12]}'
+
+
+def _regenerate(city_id):
+    document = render(city_id)
+    row = db.session.get(DashboardSnapshot, city_id)
+    if document is None:
+        if row is not None:
+            db.session.delete(row)
+            db.session.commit()
+        return None
+
+    content_hash = hashlib.sha1(dumps(document)).hexdigest()
+    now = datetime.utcnow()
+    if row is not None and row.content_hash == content_hash:
+        row.generated_at = now
+        db.session.commit()
+        return row
+
+    version = row.version + 1 if row is not None else 1
+    body = dumps({
+        'code': 200,
+        'message': '获取仪表盘快照成功',
+        'data': {**document, 'version': version, 'generatedAt': now},
+        'timestamp': int(now.timestamp())
+    })
+    encoded = precompress(body)
+    if row is None:
+        row = DashboardSnapshot(city_id=city_id)
+        db.session.add(row)
+    row.version = version
+    row.content_hash = content_hash
+    row.etag = _etag(city_id, version, content_hash)
+    row.body = body
+    row.body_gzip = encoded['gzip']
+    row.body_br = encoded.get('br')
+    row.generated_at = now
+    db.session.commit()
+    logger.info(f"城市 {city_id} 仪表盘快照已更新到版本 {version}")
+    return row
+
+
+def regenerate(city_id):
+    """重新生成并保存城市快照，返回快照（城市不存在时删除快照并返回 None）"""
+    # 渲染和读写快照都使用主库：快照内容必须是最新数据，版本号基于主库中的快照行
+    with db_routing.primary():
+        return _regenerate(city_id)
+
+
+def regenerate_all():
+    """为所有有商圈数据的城市重新生成快照，返回城市数"""
+    city_ids = [row[0] for row in db.session.query(BusinessArea.city_id).distinct() if row[0]]
+    for city_id in city_ids:
+        try:
+            regenerate(city_id)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"生成城市 {city_id} 仪表盘快照失败: {str(e)}")
+    return len(city_ids)
+
+
+# ===== 后台生成 =====
+
+def _run(app, city_id):
+    # 开始渲染前移出待处理集合，渲染期间的新变更会再次排队
+    with _lock:
+        _pending.discard(city_id)
+    with app.app_context():
+        try:
+            regenerate(city_id)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"生成城市 {city_id} 仪表盘快照失败: {str(e)}")
+
+
+def schedule(city_ids):
+    """在后台线程中重新生成城市快照（同一城市排队中时不重复提交）"""
+    global _executor
+
+    app = current_app._get_current_object()
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('DASHBOARD_SNAPSHOT_WORKERS', 1),
+                thread_name_prefix='dashboard-snapshot'
+            )
+        queued = [city_id for city_id in city_ids if city_id not in _pending]
+        _pending.update(queued)
+    for city_id in queued:
+        _executor.submit(_run, app, city_id)
+    return queued
+
+
+@post_crawl.stage(order=60)
+def _schedule_stage(city_ids):
+    """在派生数据（汇总、排行、瓦片）更新之后生成快照"""
+    schedule(city_ids)
+
+
+# ===== 读取 =====
+
+_BODY_COLUMNS = {None: 'body', 'gzip': 'body_gzip', 'br': 'body_br'}
+
+
+def load(city_id, encoding=None):
+    """
+    读取快照 (ETag, 响应体, 实际编码)；没有快照时同步生成一次，城市不存在时返回 None。
+    快照超过 DASHBOARD_SNAPSHOT_MAX_AGE 秒时在后台重新生成，本次仍返回旧快照。
+    """
+    column = getattr(DashboardSnapshot, _BODY_COLUMNS[encoding])
+    row = (
+        db.session.query(DashboardSnapshot.etag, DashboardSnapshot.generated_at, column)
+        .filter(DashboardSnapshot.city_id == city_id)
+        .first()
+    )
+    if row is None:
+        if regenerate(city_id) is None:
+            return None
+        return load(city_id, encoding)
+
+    etag, generated_at, body = row
+    if body is None:
+        # 生成时未安装brotli
+        return load(city_id, 'gzip')
+
+    max_age = current_app.config.get('DASHBOARD_SNAPSHOT_MAX_AGE', 3600)
+    if max_age and generated_at < datetime.utcnow() - timedelta(seconds=max_age):
+        schedule([city_id])
+    return etag, body, encoding
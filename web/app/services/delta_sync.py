@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量同步
+
+列表和地图接口支持 ?since=<游标>，只返回游标之后新增/修改的行以及删除的行：
+- 新增/修改按 (updated_at, id) 键集分页，游标记录最后返回的位置
+- 删除在同一事务内写入 tombstones 表，重新插入同一ID时清除对应的删除记录
+- 带筛选条件时，修改后不再满足条件的行按删除返回，客户端据此移出列表
+- 只返回 updated_at 早于 (当前时间 - SYNC_SETTLE_SECONDS) 的变更，
+  避免时间戳较早但提交较晚的事务被游标跳过
+删除记录保留 SYNC_TOMBSTONE_RETENTION_DAYS 天，更早的游标需要重新获取全量数据。
+"""
+
+import base64
+import logging
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, case, event, or_, true
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.store import Store
+from app.models.sync import Tombstone
+from app.services import post_crawl
+from app.utils import sharding
+
+logger = logging.getLogger(__name__)
+
+tombstones_table = Tombstone.__table__
+
+
+class CursorExpired(Exception):
+    """游标早于删除记录保留期"""
+    pass
+
+
+# ===== 游标 =====
+
+def encode_cursor(timestamp, last_id=''):
+    """(时间, 最后一行ID) → 不透明游标字符串"""
+    raw = f"{timestamp.isoformat()}|{last_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """游标字符串 → (时间, 最后一行ID)，格式不正确时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        timestamp, last_id = raw.split('|', 1)
+        return datetime.fromisoformat(timestamp), last_id
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f'无效的同步游标: {cursor}') from e
+
+
+def horizon():
+    """可以安全返回的变更时间上限"""
+    return datetime.utcnow() - timedelta(seconds=current_app.config.get('SYNC_SETTLE_SECONDS', 5))
+
+
+def initial_cursor():
+    """全量列表响应附带的游标，之后用它获取增量"""
+    return encode_cursor(horizon())
+
+
+# ===== 变更查询 =====
+
+def changes(model, entity, since, scope=(), filters=(), tombstone_filters=()):
+    """
+    查询游标之后的变更，返回 (变更行, 删除的ID, 下一个游标, 是否还有更多)；
+    scope 为范围条件（城市、商圈），tombstone_filters 为删除记录的对应条件；
+    filters 为筛选条件，范围内修改后不满足筛选条件的行计入删除的ID。
+    """
+    timestamp, last_id = decode_cursor(since)
+    retention = current_app.config.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+    if timestamp < datetime.utcnow() - timedelta(days=retention):
+        raise CursorExpired(since)
+
+    limit = current_app.config.get('SYNC_MAX_CHANGES', 1000)
+    upper = max(horizon(), timestamp)
+    matches = case((and_(true(), *filters), True), else_=False).label('matches')
+    rows = (
+        model.query
+        .add_columns(matches)
+        .filter(*scope)
+        .filter(or_(model.updated_at > timestamp,
+                    and_(model.updated_at == timestamp, model.id > last_id)))
+        .filter(model.updated_at <= upper)
+        .order_by(model.updated_at, model.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+        next_timestamp, next_id = rows[-1][0].updated_at, rows[-1][0].id
+    else:
+        next_timestamp, next_id = upper, ''
+
+    # 不再满足筛选条件的行（或一直不满足的行）对客户端等同于删除
+    removed = [row.id for row, matched in rows if not matched]
+    rows = [row for row, matched in rows if matched]
+    deleted = removed + [
+        row[0] for row in
+        db.session.query(Tombstone.entity_id)
+        .filter(Tombstone.entity == entity, *tombstone_filters)
+        .filter(Tombstone.deleted_at > timestamp, Tombstone.deleted_at <= next_timestamp)
+        .order_by(Tombstone.deleted_at)
+    ]
+    return rows, deleted, encode_cursor(next_timestamp, next_id), has_more
+
+
+def area_changes(since, city_id=None, filters=()):
+    """商圈增量（删除记录按城市过滤）"""
+    scope = []
+    tombstone_filters = []
+    if city_id:
+        scope.append(BusinessArea.city_id == city_id)
+        tombstone_filters.append(Tombstone.city_id == city_id)
+    return changes(BusinessArea, 'area', since, scope, filters, tombstone_filters)
+
+
+def store_changes(since, business_area_id, filters=()):
+    """商圈内店铺增量"""
+    with sharding.use_area(business_area_id):
+        return changes(Store, 'store', since, [Store.business_area_id == business_area_id], filters,
+                       [Tombstone.business_area_id == business_area_id])
+
+
+# ===== 写入删除记录 =====
+
+def _tombstone(connection, entity, entity_id, city_id=None, business_area_id=None):
+    connection = sharding.primary_connection(connection)
+    connection.execute(tombstones_table.insert().values(
+        entity=entity, entity_id=entity_id, city_id=city_id,
+        business_area_id=business_area_id, deleted_at=datetime.utcnow()
+    ))
+
+
+def _revive(connection, entity, entity_id):
+    connection = sharding.primary_connection(connection)
+    connection.execute(tombstones_table.delete().where(
+        tombstones_table.c.entity == entity, tombstones_table.c.entity_id == entity_id
+    ))
+
+
+def record_bulk(connection, entity, inserted_ids=(), deleted=()):
+    """
+    为不经过ORM事件的批量语句维护删除记录；
+    deleted 为 [{'id', 'city_id', 'business_area_id'}]
+    """
+    if inserted_ids:
+        connection.execute(tombstones_table.delete().where(
+            tombstones_table.c.entity == entity, tombstones_table.c.entity_id.in_(list(inserted_ids))
+        ))
+    if deleted:
+        now = datetime.utcnow()
+        connection.execute(tombstones_table.insert(), [
+            {'entity': entity, 'entity_id': row['id'], 'city_id': row.get('city_id'),
+             'business_area_id': row.get('business_area_id'), 'deleted_at': now}
+            for row in deleted
+        ])
+
+
+@event.listens_for(BusinessArea, 'after_delete')
+def _area_deleted(mapper, connection, target):
+    _tombstone(connection, 'area', target.id, city_id=target.city_id)
+
+
+@event.listens_for(Store, 'after_delete')
+def _store_deleted(mapper, connection, target):
+    _tombstone(connection, 'store', target.id, business_area_id=target.business_area_id)
+
+
+@event.listens_for(BusinessArea, 'after_insert')
+def _area_inserted(mapper, connection, target):
+    _revive(connection, 'area', target.id)
+
+
+@event.listens_for(Store, 'after_insert')
+def _store_inserted(mapper, connection, target):
+    _revive(connection, 'store', target.id)
+
+
+def prune():
+    """删除超过保留期的删除记录，返回删除行数"""
+    retention = current_app.config.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+    cutoff = datetime.utcnow() - timedelta(days=retention)
+    deleted = Tombstone.query.filter(Tombstone.deleted_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+@post_crawl.stage(order=50)
+def _prune_stage(city_ids):
+    deleted = prune()
+    if deleted:
+        logger.info(f"已清理 {deleted} 条过期删除记录")
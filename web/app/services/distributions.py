@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+店铺指标分布（分位数、直方图）
+
+每个商圈缓存 avg_price、rating、review_count 的已排序数组（不含空值），区县、城市的数组由
+所含商圈的数组多路归并得到并按范围缓存：
+- 分位数按位置直接读取（线性插值，同 numpy 默认方法）
+- 直方图各分箱边界二分查找，计数为位置之差，与店铺数量成对数关系
+商圈店铺数量或最新更新时间变化时只重新读取该商圈，范围数组在所含商圈的版本变化后重新归并。
+商圈没有区县字段，区县范围与城市汇总一样按坐标归属到最近的区县。
+"""
+
+import heapq
+import logging
+from bisect import bisect_left, bisect_right
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.store import Store
+from app.services import reference_data, region_stats
+from app.utils import sharding
+from app.utils.fragments import LRUCache
+
+logger = logging.getLogger(__name__)
+
+FIELDS = {
+    'avg_price': Store.avg_price,
+    'rating': Store.rating,
+    'review_count': Store.review_count,
+}
+
+LEVELS = ('area', 'district', 'city')
+
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+_areas = LRUCache(maxsize=20000)  # 商圈ID -> (版本, {字段: 已排序数组})
+_scopes = LRUCache(maxsize=256)  # (级别, 范围ID) -> (各商圈版本, {字段: 已排序数组})
+
+
+# ===== 排序数组 =====
+
+def _versions(area_ids):
+    """商圈ID -> (店铺数, 最新更新时间)"""
+    found = {
+        area_id: (count, updated_at.timestamp() if updated_at else 0)
+        for area_id, count, updated_at in db.session.query(
+            Store.business_area_id, func.count(Store.id), func.max(Store.updated_at)
+        )
+        .filter(Store.business_area_id.in_(area_ids))
+        .group_by(Store.business_area_id)
+    }
+    return {area_id: found.get(area_id, (0, 0)) for area_id in area_ids}
+
+
+def _load(area_ids):
+    """读取商圈店铺的字段值，按商圈分组并排序"""
+    arrays = {area_id: {field: [] for field in FIELDS} for area_id in area_ids}
+    for area_id, *values in db.session.query(Store.business_area_id, *FIELDS.values()) \
+            .filter(Store.business_area_id.in_(area_ids)):
+        for field, value in zip(FIELDS, values):
+            if value is not None:
+                arrays[area_id][field].append(value)
+    for area_arrays in arrays.values():
+        for values in area_arrays.values():
+            values.sort()
+    return arrays
+
+
+def _area_arrays(area_ids):
+    """商圈的排序数组（只重新读取版本变化的商圈），返回 (版本, 数组)"""
+    _areas.maxsize = current_app.config.get('DISTRIBUTION_CACHE_AREAS', _areas.maxsize)
+    versions = _versions(area_ids)
+    arrays, stale = {}, []
+    for area_id, version in versions.items():
+        cached = _areas.get(area_id)
+        if cached is not None and cached[0] == version:
+            arrays[area_id] = cached[1]
+        else:
+            stale.append(area_id)
+    if stale:
+        for area_id, area_arrays in _load(stale).items():
+            _areas.set(area_id, (versions[area_id], area_arrays))
+            arrays[area_id] = area_arrays
+    return versions, arrays
+
+
+def _scope(level, scope_id):
+    """范围 → (商圈ID列表, 分片上下文)，范围不存在时返回 None"""
+    if level == 'area':
+        if db.session.get(BusinessArea, scope_id) is None:
+            return None
+        return [scope_id], sharding.use_area(scope_id)
+
+    record = reference_data.get_snapshot().records.get(scope_id)
+    if record is None or record['level'] != level:
+        return None
+    city_id = scope_id if level == 'city' else record['parent_id']
+    areas = db.session.query(BusinessArea.id, BusinessArea.longitude, BusinessArea.latitude) \
+        .filter(BusinessArea.city_id == city_id).all()
+    if level == 'district':
+        locate = region_stats.district_locator(city_id)
+        areas = [area for area in areas if locate(area.longitude, area.latitude) == scope_id]
+    return [area.id for area in areas], sharding.use_city(city_id)
+
+
+def sorted_values(level, scope_id):
+    """范围内各字段的已排序数组 {字段: [值]}，范围不存在时返回 None"""
+    scope = _scope(level, scope_id)
+    if scope is None:
+        return None
+    area_ids, shard = scope
+    if not area_ids:
+        return {field: [] for field in FIELDS}
+    with shard:
+        versions, arrays = _area_arrays(area_ids)
+    if level == 'area':
+        return arrays[scope_id]
+
+    key = (level, scope_id)
+    signature = tuple(sorted(versions.items()))
+    cached = _scopes.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    merged = {field: list(heapq.merge(*(arrays[area_id][field] for area_id in area_ids))) for field in FIELDS}
+    _scopes.set(key, (signature, merged))
+    return merged
+
+
+# ===== 统计 =====
+
+def quantile(values, q):
+    """已排序数组的 q 分位数（0-1，线性插值），空数组返回 None"""
+    if not values:
+        return None
+    position = q * (len(values) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def histogram(values, edges):
+    """
+    按分箱边界计数，分箱为 [edges[i], edges[i+1])，最后一个分箱包含上界；
+    返回 (分箱列表, 小于下界的数量, 大于上界的数量)
+    """
+    positions = [bisect_left(values, edge) for edge in edges[:-1]] + [bisect_right(values, edges[-1])]
+    bins = [
+        {'low': edges[i], 'high': edges[i + 1], 'count': positions[i + 1] - positions[i]}
+        for i in range(len(edges) - 1)
+    ]
+    return bins, positions[0], len(values) - positions[-1]
+
+
+def _edges(values, bins):
+    """bins 为分箱边界列表，或分箱数（在最小值和最大值之间等宽划分）"""
+    if isinstance(bins, int):
+        if not values:
+            return []
+        low, high = values[0], values[-1]
+        width = (high - low) / bins or 1
+        return [low + width * i for i in range(bins)] + [high if high > low else low + width]
+    return list(bins)
+
+
+def parse_quantiles(value):
+    """逗号分隔的分位数参数（0-1 或 0-100 的百分位）→ 列表，格式错误抛出 ValueError"""
+    if not value:
+        return list(DEFAULT_QUANTILES)
+    quantiles = []
+    for item in value.split(','):
+        q = float(item)
+        q = q / 100 if q > 1 else q
+        if not 0 <= q <= 1:
+            raise ValueError(f'分位数超出范围: {item}')
+        quantiles.append(q)
+    return quantiles
+
+
+def parse_bins(value, max_bins=100):
+    """分箱参数：分箱数（如 10）或递增的边界（如 0,50,100,200），未提供时返回 None"""
+    if not value:
+        return None
+    if ',' not in value:
+        bins = int(value)
+        if not 1 <= bins <= max_bins:
+            raise ValueError(f'分箱数需在1-{max_bins}之间')
+        return bins
+    edges = [float(item) for item in value.split(',')]
+    if len(edges) - 1 > max_bins or any(low >= high for low, high in zip(edges, edges[1:])):
+        raise ValueError('分箱边界需递增，且分箱数不超过上限')
+    return edges
+
+
+def describe(level, scope_id, fields=None, quantiles=DEFAULT_QUANTILES, bins=None):
+    """
+    范围内各字段的分布 {字段: {'count', 'min', 'max', 'quantiles', 'histogram'}}，范围不存在时返回 None
+    quantiles 为 0-1 的列表，bins 为分箱数或边界列表（None 时不返回直方图）
+    """
+    arrays = sorted_values(level, scope_id)
+    if arrays is None:
+        return None
+    result = {}
+    for field in fields or FIELDS:
+        values = arrays[field]
+        stats = {
+            'count': len(values),
+            'min': values[0] if values else None,
+            'max': values[-1] if values else None,
+            'quantiles': {f'p{q * 100:g}': _round(quantile(values, q)) for q in quantiles},
+        }
+        if bins is not None:
+            buckets, below, above = histogram(values, _edges(values, bins))
+            for bucket in buckets:
+                bucket['low'], bucket['high'] = _round(bucket['low']), _round(bucket['high'])
+            stats['histogram'] = {'bins': buckets, 'below': below, 'above': above}
+        result[field] = stats
+    return result
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
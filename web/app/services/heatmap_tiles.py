@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热力图瓦片金字塔
+
+商圈和店铺按 Web墨卡托瓦片 (z/x/y) 预先聚合，每个瓦片再划分为 N×N 的网格单元，
+单元内记录数量、热度和、热度最大值、坐标和（用于计算质心）以及各类型数量（主导类型）：
+- 最大缩放级别的瓦片从原始坐标聚合，更低级别由 2×2 个子瓦片合并得到
+- 作为变更事件处理器（见 outbox），只重建新旧坐标所在的最大级别瓦片及其祖先
+- 查询按 bbox + 缩放级别取覆盖的瓦片，瓦片数有上限，响应大小由屏幕决定而不是数据量
+店铺图层以评价数作为热度权重，类型为店铺分类。
+"""
+
+import json
+import logging
+import math
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, tuple_
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.store import Store
+from app.models.tiles import HeatmapTile
+from app.services import outbox
+from app.utils import sharding
+
+logger = logging.getLogger(__name__)
+
+# 图层：(模型, 热度权重列, 类型列)
+LAYERS = {
+    'area': (BusinessArea, 'hot_value', 'type'),
+    'store': (Store, 'review_count', 'category'),
+}
+
+# Web墨卡托的纬度范围
+MAX_LATITUDE = 85.05112878
+
+# 增量重建时按该级差将相邻瓦片归为一组，每组只查询一次原始坐标
+GROUP_SHIFT = 6
+
+# 批量 IN 查询的分块大小
+CHUNK_SIZE = 500
+
+tiles_table = HeatmapTile.__table__
+
+def _settings():
+    config = current_app.config
+    return (config.get('HEATMAP_MIN_ZOOM', 3), config.get('HEATMAP_MAX_ZOOM', 16),
+            config.get('HEATMAP_TILE_BINS', 16))
+
+
+# ===== 坐标换算 =====
+
+def world_position(longitude, latitude):
+    """经纬度 → 墨卡托平面上的归一化坐标 (0~1, 0~1)"""
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    sin = math.sin(math.radians(latitude))
+    return (longitude + 180.0) / 360.0, 0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+
+
+def project(longitude, latitude, z, bins=1):
+    """经纬度 → 缩放级别 z 下的全局网格坐标；bins=1 时即瓦片坐标 (x, y)"""
+    size = (1 << z) * bins
+    fx, fy = world_position(longitude, latitude)
+    return (min(size - 1, max(0, int(fx * size))),
+            min(size - 1, max(0, int(fy * size))))
+
+
+def unproject(gx, gy, z, bins=1):
+    """全局网格坐标（可为小数）→ 经纬度"""
+    size = (1 << z) * bins
+    longitude = gx / size * 360.0 - 180.0
+    latitude = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * gy / size))))
+    return longitude, latitude
+
+
+def tile_bounds(z, x, y):
+    """瓦片的经纬度范围 (minLng, minLat, maxLng, maxLat)"""
+    min_lng, max_lat = unproject(x, y, z)
+    max_lng, min_lat = unproject(x + 1, y + 1, z)
+    return min_lng, min_lat, max_lng, max_lat
+
+
+# ===== 网格聚合 =====
+
+def _new_cell():
+    # [数量, 热度和, 热度最大值, 经度和, 纬度和, {类型: 数量}]
+    return [0, 0, 0, 0.0, 0.0, {}]
+
+
+def _merge_cell(target, cell):
+    target[0] += cell[0]
+    target[1] += cell[1]
+    target[2] = max(target[2], cell[2])
+    target[3] += cell[3]
+    target[4] += cell[4]
+    for kind, count in cell[5].items():
+        target[5][kind] = target[5].get(kind, 0) + count
+
+
+def _bin_points(points, z, bins):
+    """原始坐标 → {(x, y): {(bx, by): 单元}}"""
+    tiles = {}
+    for longitude, latitude, weight, kind in points:
+        if longitude is None or latitude is None:
+            continue
+        gx, gy = project(longitude, latitude, z, bins)
+        cells = tiles.setdefault((gx // bins, gy // bins), {})
+        cell = cells.get((gx % bins, gy % bins))
+        if cell is None:
+            cell = cells[(gx % bins, gy % bins)] = _new_cell()
+        weight = weight or 0
+        cell[0] += 1
+        cell[1] += weight
+        cell[2] = max(cell[2], weight)
+        cell[3] += longitude
+        cell[4] += latitude
+        cell[5][kind] = cell[5].get(kind, 0) + 1
+    return tiles
+
+
+def _parent_tiles(tiles, bins):
+    """子瓦片合并为上一级瓦片（子瓦片中 2×2 个单元合并为父瓦片的一个单元）"""
+    parents = {}
+    for (x, y), cells in tiles.items():
+        parent = parents.setdefault((x >> 1, y >> 1), {})
+        for (bx, by), cell in cells.items():
+            key = (((x & 1) * bins + bx) >> 1, ((y & 1) * bins + by) >> 1)
+            target = parent.get(key)
+            if target is None:
+                target = parent[key] = _new_cell()
+            _merge_cell(target, cell)
+    return parents
+
+
+def _dominant(kinds):
+    return max(kinds.items(), key=lambda item: (item[1], item[0] or ''))[0] if kinds else None
+
+
+def _tile_row(layer, z, x, y, cells, now):
+    total = _new_cell()
+    for cell in cells.values():
+        _merge_cell(total, cell)
+    return {
+        'layer': layer, 'z': z, 'x': x, 'y': y,
+        'count': total[0],
+        'hot_sum': total[1],
+        'hot_max': total[2],
+        'dominant_type': _dominant(total[5]),
+        'bins': json.dumps(
+            [[bx, by, *cell] for (bx, by), cell in sorted(cells.items())],
+            separators=(',', ':')
+        ),
+        'updated_at': now
+    }
+
+
+def _row_cells(bins):
+    return {(b[0], b[1]): [b[2], b[3], b[4], b[5], b[6], b[7]] for b in bins}
+
+
+# ===== 读写瓦片 =====
+
+def _chunks(keys):
+    keys = list(keys)
+    for start in range(0, len(keys), CHUNK_SIZE):
+        yield keys[start:start + CHUNK_SIZE]
+
+
+def _load(layer, z, keys):
+    """读取指定瓦片，返回 {(x, y): 单元字典}"""
+    tiles = {}
+    for chunk in _chunks(keys):
+        rows = db.session.execute(
+            tiles_table.select().where(
+                tiles_table.c.layer == layer, tiles_table.c.z == z,
+                tuple_(tiles_table.c.x, tiles_table.c.y).in_(chunk)
+            )
+        )
+        for row in rows:
+            tiles[(row.x, row.y)] = _row_cells(json.loads(row.bins))
+    return tiles
+
+
+def _write(layer, z, tiles, now, replace=True, keep_empty=False):
+    """
+    写入一层瓦片；keep_empty 为 True 时空瓦片也写入一行（数量为0），
+    增量同步据此告知客户端瓦片已清空，否则空瓦片只删除不写入
+    """
+    if replace:
+        for chunk in _chunks(tiles):
+            db.session.execute(
+                tiles_table.delete().where(
+                    tiles_table.c.layer == layer, tiles_table.c.z == z,
+                    tuple_(tiles_table.c.x, tiles_table.c.y).in_(chunk)
+                )
+            )
+    rows = [_tile_row(layer, z, x, y, cells, now) for (x, y), cells in tiles.items() if cells or keep_empty]
+    for chunk in _chunks(rows):
+        db.session.execute(tiles_table.insert(), chunk)
+
+
+def _points(layer, bounds=None, batch=None):
+    """图层的点（经度、纬度、权重、类型），店铺图层依次读取各分片"""
+    model, weight, kind = LAYERS[layer]
+
+    def build():
+        query = db.session.query(model.longitude, model.latitude, getattr(model, weight), getattr(model, kind))
+        if bounds:
+            min_lng, min_lat, max_lng, max_lat = bounds
+            query = query.filter(model.longitude.between(min_lng, max_lng),
+                                 model.latitude.between(min_lat, max_lat))
+        return query.yield_per(batch) if batch else query
+
+    return sharding.scan(build) if model is Store else build()
+
+
+def refresh_tiles(layer, keys):
+    """重建最大级别的指定瓦片及其所有祖先瓦片（不提交），返回写入的瓦片数"""
+    min_zoom, max_zoom, bins = _settings()
+    now = datetime.utcnow()
+
+    groups = {}
+    for x, y in keys:
+        groups.setdefault((x >> GROUP_SHIFT, y >> GROUP_SHIFT), []).append((x, y))
+
+    tiles = {}
+    for group in groups.values():
+        xs = [x for x, _ in group]
+        ys = [y for _, y in group]
+        min_lng, _, _, max_lat = tile_bounds(max_zoom, min(xs), min(ys))
+        _, min_lat, max_lng, _ = tile_bounds(max_zoom, max(xs), max(ys))
+        # 边界放宽一点，落在哪个瓦片以投影结果为准
+        margin = 1e-7
+        binned = _bin_points(_points(layer, (min_lng - margin, min_lat - margin,
+                                              max_lng + margin, max_lat + margin)), max_zoom, bins)
+        for key in group:
+            tiles[key] = binned.get(key, {})
+    _write(layer, max_zoom, tiles, now, keep_empty=True)
+    written = len(tiles)
+
+    for z in range(max_zoom - 1, min_zoom - 1, -1):
+        parent_keys = {(x >> 1, y >> 1) for x, y in tiles}
+        child_keys = {(px * 2 + dx, py * 2 + dy) for px, py in parent_keys for dx in (0, 1) for dy in (0, 1)}
+        children = {key: tiles[key] for key in child_keys if key in tiles}
+        children.update(_load(layer, z + 1, child_keys - set(children)))
+        tiles = _parent_tiles(children, bins)
+        for key in parent_keys:
+            tiles.setdefault(key, {})
+        _write(layer, z, tiles, now, keep_empty=True)
+        written += len(tiles)
+    return written
+
+
+def rebuild(layers=None):
+    """全量重建瓦片金字塔并提交，返回瓦片数"""
+    min_zoom, max_zoom, bins = _settings()
+    now = datetime.utcnow()
+    layers = list(layers or LAYERS)
+
+    total = 0
+    try:
+        for layer in layers:
+            tiles = _bin_points(_points(layer, batch=5000), max_zoom, bins)
+            db.session.execute(tiles_table.delete().where(tiles_table.c.layer == layer))
+            for z in range(max_zoom, min_zoom - 1, -1):
+                if z < max_zoom:
+                    tiles = _parent_tiles(tiles, bins)
+                _write(layer, z, tiles, now, replace=False)
+                total += len(tiles)
+        # 全部图层重建后，之前的变更事件无需再处理
+        if set(layers) == set(LAYERS):
+            outbox.mark_consumed('heatmap_tiles')
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"热力图瓦片重建完成，共 {total} 个瓦片")
+    return total
+
+
+# ===== 消费变更事件 =====
+
+@outbox.handler('heatmap_tiles', entities=LAYERS)
+def _apply_events(events):
+    """按变更事件中的新旧坐标找出受影响的最大级别瓦片并重建"""
+    _, max_zoom, _ = _settings()
+    touched = {}
+    for item in events:
+        payload = item.get_payload()
+        before, after = payload.get('before') or {}, payload.get('after') or {}
+        current = after or before
+        coords = [(current.get('longitude'), current.get('latitude'))]
+        if 'longitude' in before or 'latitude' in before:
+            coords.append((before.get('longitude', current.get('longitude')),
+                           before.get('latitude', current.get('latitude'))))
+        for longitude, latitude in coords:
+            if longitude is not None and latitude is not None:
+                touched.setdefault(item.entity, set()).add(project(longitude, latitude, max_zoom))
+
+    written = sum(refresh_tiles(layer, keys) for layer, keys in touched.items())
+    logger.info(f"热力图瓦片增量重建完成，共 {written} 个瓦片")
+
+
+# ===== 查询 =====
+
+def _bin_dicts(cells, bbox=None):
+    result = []
+    for count, hot_sum, hot_max, lng_sum, lat_sum, kinds in cells:
+        longitude, latitude = lng_sum / count, lat_sum / count
+        if bbox and not (bbox[0] <= longitude <= bbox[2] and bbox[1] <= latitude <= bbox[3]):
+            continue
+        result.append({
+            'longitude': round(longitude, 6),
+            'latitude': round(latitude, 6),
+            'count': count,
+            'hotValue': hot_sum,
+            'value': hot_sum,
+            'hotMax': hot_max,
+            'type': _dominant(kinds)
+        })
+    return result
+
+
+def cover(bbox, zoom):
+    """
+    选择覆盖 bbox 的瓦片数不超过上限的缩放级别（不超过请求的级别），
+    返回 (z, [(x, y)])
+    """
+    min_zoom, max_zoom, _ = _settings()
+    max_tiles = current_app.config.get('HEATMAP_MAX_TILES', 48)
+    min_lng, min_lat, max_lng, max_lat = bbox
+
+    z = max(min_zoom, min(zoom, max_zoom))
+    while True:
+        x0, y0 = project(min_lng, max_lat, z)
+        x1, y1 = project(max_lng, min_lat, z)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= max_tiles or z == min_zoom:
+            break
+        z -= 1
+    return z, [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def query_bbox(layer, bbox, zoom):
+    """读取 bbox 内的网格单元，返回 (实际缩放级别, [单元])"""
+    z, keys = cover(bbox, zoom)
+    bins = []
+    for cells in _load(layer, z, keys).values():
+        bins.extend(_bin_dicts(cells.values(), bbox))
+    return z, bins
+
+
+def changed_tiles(layer, bbox, zoom, since, until):
+    """
+    读取 bbox 覆盖范围内 (since, until] 之间重建过的瓦片，返回 (实际缩放级别, 是否需要整体替换, [瓦片])；
+    since 之后做过全量重建（所有瓦片的更新时间都晚于 since）时返回全部瓦片并要求整体替换。
+    """
+    z, keys = cover(bbox, zoom)
+    oldest = (
+        db.session.query(func.min(HeatmapTile.updated_at))
+        .filter(HeatmapTile.layer == layer)
+        .scalar()
+    )
+    reset = oldest is not None and oldest > since
+
+    tiles = []
+    for chunk in _chunks(keys):
+        query = HeatmapTile.query.filter(
+            HeatmapTile.layer == layer, HeatmapTile.z == z,
+            tuple_(HeatmapTile.x, HeatmapTile.y).in_(chunk)
+        )
+        if not reset:
+            query = query.filter(HeatmapTile.updated_at > since, HeatmapTile.updated_at <= until)
+        for tile in query:
+            tiles.append({
+                'x': tile.x,
+                'y': tile.y,
+                'bins': _bin_dicts(_row_cells(tile.get_bins()).values(), bbox)
+            })
+    return z, reset, tiles
+
+
+def get_tile(layer, z, x, y):
+    """
+    读取单个瓦片的网格单元；超过最大级别时取祖先瓦片中落在该瓦片内的单元，
+    低于最小级别时返回 None
+    """
+    min_zoom, max_zoom, _ = _settings()
+    if z < min_zoom or not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        return None
+
+    if z <= max_zoom:
+        tiles = _load(layer, z, [(x, y)])
+        return _bin_dicts(tiles.get((x, y), {}).values())
+
+    shift = z - max_zoom
+    ancestor = (x >> shift, y >> shift)
+    tiles = _load(layer, max_zoom, [ancestor])
+    min_lng, min_lat, max_lng, max_lat = tile_bounds(z, x, y)
+    return _bin_dicts(tiles.get(ancestor, {}).values(), (min_lng, min_lat, max_lng, max_lat))
+
+
+def tile_features(z, x, y, bins, extent):
+    """将瓦片内的网格单元转换为矢量瓦片点要素 [(px, py, 属性)]，坐标为瓦片内像素"""
+    size = 1 << z
+    features = []
+    for item in bins:
+        fx, fy = world_position(item['longitude'], item['latitude'])
+        px = min(extent - 1, max(0, int((fx * size - x) * extent)))
+        py = min(extent - 1, max(0, int((fy * size - y) * extent)))
+        features.append((px, py, {
+            'count': item['count'],
+            'hotValue': item['hotValue'],
+            'hotMax': item['hotMax'],
+            'type': item['type']
+        }))
+    return features
+
+
+def extent(city_id=None):
+    """商圈坐标范围 (minLng, minLat, maxLng, maxLat)，没有商圈时返回 None"""
+    query = db.session.query(func.min(BusinessArea.longitude), func.min(BusinessArea.latitude),
+                             func.max(BusinessArea.longitude), func.max(BusinessArea.latitude))
+    if city_id:
+        query = query.filter(BusinessArea.city_id == city_id)
+    bbox = query.one()
+    return tuple(bbox) if bbox[0] is not None else None
+
+
+def init_app(app):
+    """已有商圈数据但瓦片表为空时（如首次升级）执行一次全量重建"""
+    with app.app_context():
+        try:
+            if not db.session.query(HeatmapTile.z).first() \
+                    and db.session.query(BusinessArea.id).first():
+                rebuild()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"初始化热力图瓦片失败: {str(e)}")
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈热度排行榜
+
+内存中为每个城市和全国各维护一个按热度排序的有序索引：
+- 商圈写入提交后按变更增量调整索引（回滚的变更不会生效）
+- 排名和分页通过二分查找/切片完成，不再每次 ORDER BY hot_value
+- 每个爬取批次结束时记录排名快照，rankDelta 为相对上一次快照的名次变化
+其他进程的写入通过定期比对 (行数, 最后更新时间) 签名发现并整体重载。
+"""
+
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, object_session
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.services import post_crawl
+
+logger = logging.getLogger(__name__)
+
+# 全国榜单的键
+GLOBAL = '*'
+
+
+class RankingBoard:
+    """单个榜单：(-热度, 商圈ID) 升序排列的有序列表"""
+
+    def __init__(self):
+        self.entries = []
+        self.scores = {}
+        self.baseline = {}  # 上一次快照的名次
+        self.snapshot = {}  # 最近一次快照的名次
+
+    def update(self, area_id, hot_value):
+        self.remove(area_id)
+        hot_value = hot_value or 0
+        bisect.insort(self.entries, (-hot_value, area_id))
+        self.scores[area_id] = hot_value
+
+    def remove(self, area_id):
+        hot_value = self.scores.pop(area_id, None)
+        if hot_value is None:
+            return
+        index = bisect.bisect_left(self.entries, (-hot_value, area_id))
+        if index < len(self.entries) and self.entries[index][1] == area_id:
+            del self.entries[index]
+
+    def rank_of(self, area_id):
+        hot_value = self.scores.get(area_id)
+        if hot_value is None:
+            return None
+        return bisect.bisect_left(self.entries, (-hot_value, area_id)) + 1
+
+    def page(self, offset=0, limit=10):
+        """返回 [(名次, 商圈ID, 热度)]"""
+        return [
+            (offset + i + 1, area_id, -score)
+            for i, (score, area_id) in enumerate(self.entries[offset:offset + limit])
+        ]
+
+    def rank_delta(self, area_id, rank):
+        """相对上一次快照上升的名次（正数为上升），新上榜为 None"""
+        previous = self.baseline.get(area_id)
+        return previous - rank if previous is not None else None
+
+    def take_snapshot(self):
+        self.baseline = self.snapshot
+        self.snapshot = {area_id: index + 1 for index, (_, area_id) in enumerate(self.entries)}
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_boards = None
+_names = {}
+_cities = {}
+_signature = None
+_checked_at = 0.0
+_lock = threading.RLock()
+
+
+def _current_signature():
+    return tuple(db.session.query(func.count(BusinessArea.id), func.max(BusinessArea.updated_at)).one())
+
+
+def _history_baseline(boards):
+    """用指标历史中最近一天（今天之前）的热度初始化快照名次"""
+    from app.services import metric_history
+
+    today = datetime.utcnow().date()
+    buckets, area_ids, matrices = metric_history.load_series(
+        None, 'day', today - timedelta(days=7), today - timedelta(days=1), ('hot_value',)
+    )
+    if not buckets:
+        return
+
+    last = metric_history.forward_fill(matrices['hot_value'])[-1]
+    previous = {}
+    for area_id, hot_value in zip(area_ids, list(last)):
+        # 跳过缺失值（None 或 NaN）
+        if hot_value is not None and hot_value == hot_value and area_id in _cities:
+            previous[area_id] = hot_value
+
+    for key in {_cities[area_id] for area_id in previous} | {GLOBAL}:
+        ordered = sorted((-hot, area_id) for area_id, hot in previous.items()
+                         if key == GLOBAL or _cities[area_id] == key)
+        if key in boards:
+            boards[key].snapshot = {area_id: index + 1 for index, (_, area_id) in enumerate(ordered)}
+            boards[key].baseline = boards[key].snapshot
+
+
+def reload():
+    """从数据库重新加载全部榜单"""
+    global _boards, _names, _cities, _signature, _checked_at
+
+    with _lock:
+        _checked_at = time.monotonic()
+        _signature = _current_signature()
+        boards = {GLOBAL: RankingBoard()}
+        names, cities = {}, {}
+        rows = db.session.query(BusinessArea.id, BusinessArea.city_id, BusinessArea.name, BusinessArea.hot_value)
+        for area_id, city_id, name, hot_value in rows:
+            names[area_id] = name
+            cities[area_id] = city_id
+            boards.setdefault(city_id, RankingBoard()).update(area_id, hot_value)
+            boards[GLOBAL].update(area_id, hot_value)
+        _boards, _names, _cities = boards, names, cities
+
+        # 加载时的名次作为初始快照，指标历史中有更早的数据时以历史为准
+        for board in boards.values():
+            board.take_snapshot()
+        try:
+            _history_baseline(boards)
+        except Exception as e:
+            logger.warning(f"从指标历史初始化排名快照失败: {str(e)}")
+
+    logger.info(f"热度排行榜加载完成，共 {len(_cities)} 个商圈")
+
+
+def _ensure_loaded():
+    global _checked_at
+
+    if _boards is None:
+        reload()
+        return
+
+    interval = current_app.config.get('HOT_RANKING_CHECK_INTERVAL', 60)
+    if time.monotonic() - _checked_at >= interval:
+        _checked_at = time.monotonic()
+        if _current_signature() != _signature:
+            reload()
+
+
+# ===== 写入提交后增量更新 =====
+
+def _record(target, removed=False):
+    session = object_session(target)
+    if session is None:
+        return
+    session.info.setdefault('hot_ranking_changes', []).append(
+        (target.id, None if removed else target.city_id, target.name, target.hot_value,
+         target.__dict__.get('updated_at'))
+    )
+
+
+def record_bulk(session, rows):
+    """不经过ORM事件的批量更新：rows 为含 id、city_id、name、hot_value、updated_at 的字典，提交后生效"""
+    session.info.setdefault('hot_ranking_changes', []).extend(
+        (row['id'], row['city_id'], row['name'], row['hot_value'], row.get('updated_at')) for row in rows
+    )
+
+
+@event.listens_for(BusinessArea, 'after_insert')
+@event.listens_for(BusinessArea, 'after_update')
+def _area_saved(mapper, connection, target):
+    _record(target)
+
+
+@event.listens_for(BusinessArea, 'after_delete')
+def _area_deleted(mapper, connection, target):
+    _record(target, removed=True)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    global _signature
+
+    changes = session.info.pop('hot_ranking_changes', None)
+    if not changes or _boards is None:
+        return
+
+    with _lock:
+        _, max_updated_at = _signature or (0, None)
+        for area_id, city_id, name, hot_value, updated_at in changes:
+            if updated_at and (max_updated_at is None or updated_at > max_updated_at):
+                max_updated_at = updated_at
+            old_city = _cities.get(area_id)
+            if old_city is not None and old_city != city_id and old_city in _boards:
+                _boards[old_city].remove(area_id)
+            if city_id is None:
+                _boards[GLOBAL].remove(area_id)
+                _names.pop(area_id, None)
+                _cities.pop(area_id, None)
+                continue
+            _names[area_id] = name
+            _cities[area_id] = city_id
+            _boards.setdefault(city_id, RankingBoard()).update(area_id, hot_value)
+            _boards[GLOBAL].update(area_id, hot_value)
+        # 同步签名，避免本进程的写入在下次检查时触发整体重载
+        _signature = (len(_cities), max_updated_at)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('hot_ranking_changes', None)
+
+
+@post_crawl.stage(order=30)
+def _snapshot_stage(city_ids):
+    """爬取批次结束时记录排名快照"""
+    if _boards is None:
+        return
+    with _lock:
+        for key in [GLOBAL, *city_ids]:
+            if key in _boards:
+                _boards[key].take_snapshot()
+
+
+def get_ranking(city_id=None, offset=0, limit=10):
+    """
+    获取榜单的一页，返回 (总数, [{'id', 'name', 'cityId', 'hotValue', 'rank', 'rankDelta'}])
+    """
+    _ensure_loaded()
+    with _lock:
+        board = _boards.get(city_id or GLOBAL)
+        if board is None:
+            return 0, []
+        items = [
+            {
+                'id': area_id,
+                'name': _names.get(area_id),
+                'cityId': _cities.get(area_id),
+                'hotValue': hot_value,
+                'rank': rank,
+                'rankDelta': board.rank_delta(area_id, rank)
+            }
+            for rank, area_id, hot_value in board.page(offset, limit)
+        ]
+        return len(board), items
+
+
+def get_rank(area_id):
+    """获取商圈在所在城市和全国榜单中的名次"""
+    _ensure_loaded()
+    with _lock:
+        city_id = _cities.get(area_id)
+        if city_id is None:
+            return None
+        return {
+            'cityRank': _boards[city_id].rank_of(area_id),
+            'globalRank': _boards[GLOBAL].rank_of(area_id)
+        }
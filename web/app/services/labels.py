@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+标签/设施倒排索引
+
+商圈、店铺写入时在同一事务内把 tags、facilities JSON 字段同步到关联表（area_labels / store_labels），
+列表接口的 tags=、facilities= 筛选按标签ID读取关联表的主键索引：
+- all（默认）：各标签的商圈/店铺ID集合求交集（INTERSECT），不存在的标签直接返回空结果
+- any：任一标签命中即可
+JSON 字段仍保留原样用于展示，关联表只用于筛选。
+"""
+
+import json
+import logging
+
+from sqlalchemy import event, false, intersect, select
+from sqlalchemy.orm.attributes import get_history
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.labels import Label, AreaLabel, StoreLabel
+from app.models.store import Store
+from app.utils import sharding
+
+logger = logging.getLogger(__name__)
+
+labels_table = Label.__table__
+
+# JSON字段 -> 标签类型
+FIELDS = {'tags': 'tag', 'facilities': 'facility'}
+
+# 模型 -> (关联模型, 所属ID列名)
+_ASSOCIATIONS = {
+    BusinessArea: (AreaLabel, 'business_area_id'),
+    Store: (StoreLabel, 'store_id'),
+}
+
+# 已提交的标签 (类型, 名称) -> ID，标签不会删除或改名
+_cache = {}
+
+
+def _association(model):
+    """(关联表, 所属ID列)"""
+    association, column = _ASSOCIATIONS[model]
+    return association.__table__, association.__table__.c[column]
+
+
+def names(value):
+    """JSON字段的值 → 名称集合（设施为字典时取值为真的键）"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return set()
+    if isinstance(value, dict):
+        value = [key for key, enabled in value.items() if enabled]
+    if not isinstance(value, (list, tuple, set)):
+        return set()
+    return {item.strip() for item in value if isinstance(item, str) and item.strip()}
+
+
+def _pairs(row):
+    """{'tags': 值, 'facilities': 值} → {(类型, 名称)}"""
+    return {(kind, name) for field, kind in FIELDS.items() for name in names(row.get(field))}
+
+
+def _lookup(connection, pairs):
+    found = {}
+    for kind in {kind for kind, _ in pairs}:
+        wanted = [name for k, name in pairs if k == kind]
+        for label_id, name in connection.execute(
+            select(labels_table.c.id, labels_table.c.name)
+            .where(labels_table.c.kind == kind, labels_table.c.name.in_(wanted))
+        ):
+            found[(kind, name)] = label_id
+    return found
+
+
+def _ensure(connection, pairs):
+    """(类型, 名称) → 标签ID，缺少的标签在当前事务内创建"""
+    if not pairs:
+        return {}
+    found = _lookup(connection, pairs)
+    missing = [{'kind': kind, 'name': name} for kind, name in pairs if (kind, name) not in found]
+    if missing:
+        connection.execute(labels_table.insert(), missing)
+        found = _lookup(connection, pairs)
+    return found
+
+
+def replace(connection, model, rows):
+    """
+    将 rows（含 id、tags、facilities 的字典）的关联替换为其当前的标签/设施；
+    connection 为 model 所在库的连接（店铺可能在分片中），标签词典写入主库
+    """
+    if not rows:
+        return 0
+    table, column = _association(model)
+    wanted = {row['id']: _pairs(row) for row in rows}
+    ids = _ensure(sharding.primary_connection(connection), set().union(*wanted.values()))
+
+    connection.execute(table.delete().where(column.in_(list(wanted))))
+    values = [{'label_id': ids[pair], column.name: owner_id}
+              for owner_id, pairs in wanted.items() for pair in pairs]
+    if values:
+        connection.execute(table.insert(), values)
+    return len(values)
+
+
+def clear(connection, model, owner_ids):
+    """删除商圈/店铺的全部关联"""
+    if owner_ids:
+        table, column = _association(model)
+        connection.execute(table.delete().where(column.in_(list(owner_ids))))
+
+
+# ===== 写入时同步（与商圈/店铺写入处于同一事务）=====
+
+def _row(target):
+    return {'id': target.id, **{field: getattr(target, field) for field in FIELDS}}
+
+
+def _register(model):
+    @event.listens_for(model, 'after_insert')
+    def _inserted(mapper, connection, target):
+        replace(connection, model, [_row(target)])
+
+    @event.listens_for(model, 'after_update')
+    def _updated(mapper, connection, target):
+        if any(get_history(target, field).has_changes() for field in FIELDS):
+            replace(connection, model, [_row(target)])
+
+    # 先删关联再删行，避免违反外键
+    @event.listens_for(model, 'before_delete')
+    def _deleted(mapper, connection, target):
+        clear(connection, model, [target.id])
+
+
+for _model in _ASSOCIATIONS:
+    _register(_model)
+
+
+# ===== 筛选 =====
+
+def resolve(pairs):
+    """已存在的标签 (类型, 名称) → ID（只读，缓存）"""
+    missing = [pair for pair in pairs if pair not in _cache]
+    if missing:
+        _cache.update(_lookup(db.session, missing))
+    return {pair: _cache[pair] for pair in pairs if pair in _cache}
+
+
+def criterion(model, tags=(), facilities=(), match='all'):
+    """按标签/设施筛选 model 的条件，没有筛选时返回 None"""
+    pairs = {('tag', name) for name in tags} | {('facility', name) for name in facilities}
+    if not pairs:
+        return None
+    label_ids = sorted(resolve(pairs).values())
+    if not label_ids or (match != 'any' and len(label_ids) < len(pairs)):
+        return false()
+
+    table, column = _association(model)
+    if match == 'any':
+        owners = select(column).where(table.c.label_id.in_(label_ids))
+    else:
+        # 各标签的倒排列表（主键 label_id + 所属ID）求交集
+        selects = [select(column).where(table.c.label_id == label_id) for label_id in label_ids]
+        owners = selects[0] if len(selects) == 1 else intersect(*selects)
+    return model.id.in_(owners)
+
+
+def parse(value):
+    """逗号分隔的查询参数 → 名称列表"""
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+# ===== 全量重建 =====
+
+def rebuild(batch_size=1000):
+    """从 JSON 字段全量重建关联表并提交，返回关联数"""
+    total = 0
+    for model in (BusinessArea, Store):
+        association, _ = _ASSOCIATIONS[model]
+        table, _ = _association(model)
+        for _ in (sharding.each_shard() if model is Store else [None]):
+            connection = db.session.connection(bind_arguments={'mapper': association.__mapper__})
+            connection.execute(table.delete())
+            query = db.session.query(model.id, model.tags, model.facilities).yield_per(batch_size)
+            batch = []
+            for owner_id, tags, facilities in query:
+                batch.append({'id': owner_id, 'tags': tags, 'facilities': facilities})
+                if len(batch) >= batch_size:
+                    total += replace(connection, model, batch)
+                    batch = []
+            total += replace(connection, model, batch)
+            db.session.commit()
+
+    logger.info(f"标签/设施关联重建完成，共 {total} 条")
+    return total
+
+
+def init_app(app):
+    """已有商圈数据但关联表为空时（如首次升级）执行一次全量重建"""
+    with app.app_context():
+        try:
+            if not db.session.query(Label.id).first() and db.session.query(BusinessArea.id).filter(
+                    BusinessArea.tags.isnot(None) | BusinessArea.facilities.isnot(None)).first():
+                rebuild()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"初始化标签/设施关联失败: {str(e)}")
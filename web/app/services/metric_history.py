@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈指标历史
+
+每次爬取批次结束后记录受影响城市的商圈指标：
+- area_metric_snapshots：原始快照，只追加，按 (城市, 月份) 分区，可按分区清理
+- area_metric_series：按天/周降采样（取桶内最后一次的值），每个城市每个桶一行，指标按列存储
+
+趋势和增长率从降采样序列构建 [时间桶 × 商圈] 矩阵，用向量化的前向填充/窗口运算计算，
+不需要按请求扫描原始快照。
+"""
+
+import logging
+import math
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.history import AreaMetricSnapshot, AreaMetricSeries
+from app.services import post_crawl
+from app.utils.fragments import LRUCache
+from app.utils import request_cache
+
+# numpy为可选依赖，未安装时使用纯Python实现
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('hot_value', 'rating', 'store_count', 'avg_consumption', 'customer_flow')
+
+# 历史数据版本（每次记录快照后递增），用于缓存增长率计算结果
+_version = 0
+_growth_cache = LRUCache(maxsize=256)
+
+
+def _week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _merge_bucket(city_id, resolution, bucket, values):
+    """将本次快照合并到时间桶（同一商圈以最新值覆盖）"""
+    series = AreaMetricSeries.query.filter_by(city_id=city_id, resolution=resolution, bucket=bucket).first()
+    if series is None:
+        series = AreaMetricSeries(city_id=city_id, resolution=resolution, bucket=bucket)
+        db.session.add(series)
+        area_ids, metrics = [], {metric: [] for metric in METRICS}
+    else:
+        area_ids, metrics = series.get_area_ids(), series.get_metrics()
+        for metric in METRICS:
+            metrics.setdefault(metric, [None] * len(area_ids))
+
+    positions = {area_id: index for index, area_id in enumerate(area_ids)}
+    for area_id, row in values.items():
+        index = positions.get(area_id)
+        if index is None:
+            positions[area_id] = len(area_ids)
+            area_ids.append(area_id)
+            for metric in METRICS:
+                metrics[metric].append(row[metric])
+        else:
+            for metric in METRICS:
+                metrics[metric][index] = row[metric]
+
+    series.set_data(area_ids, metrics)
+
+
+def record_city(city_id, captured_at=None):
+    """记录城市所有商圈的当前指标，返回记录的商圈数"""
+    captured_at = captured_at or datetime.utcnow()
+    rows = (
+        db.session.query(BusinessArea.id, *[getattr(BusinessArea, metric) for metric in METRICS])
+        .filter(BusinessArea.city_id == city_id)
+        .all()
+    )
+    if not rows:
+        return 0
+
+    values = {row[0]: dict(zip(METRICS, row[1:])) for row in rows}
+    period = captured_at.strftime('%Y-%m')
+    db.session.execute(AreaMetricSnapshot.__table__.insert(), [
+        dict(city_id=city_id, period=period, business_area_id=area_id, captured_at=captured_at, **row)
+        for area_id, row in values.items()
+    ])
+
+    day = captured_at.date()
+    _merge_bucket(city_id, 'day', day, values)
+    _merge_bucket(city_id, 'week', _week_start(day), values)
+    return len(values)
+
+
+def record_cities(city_ids, captured_at=None):
+    """记录一批城市并提交"""
+    global _version
+
+    captured_at = captured_at or datetime.utcnow()
+    try:
+        total = sum(record_city(city_id, captured_at) for city_id in city_ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    _version += 1
+    return total
+
+
+@post_crawl.stage(order=20)
+def _record_stage(city_ids):
+    total = record_cities(city_ids)
+    logger.info(f"商圈指标快照记录完成，共 {total} 个商圈")
+
+
+def prune(keep_months=6):
+    """删除早于保留期的原始快照分区（降采样序列保留），返回删除行数"""
+    today = datetime.utcnow().date().replace(day=1)
+    year, month = divmod(today.year * 12 + today.month - 1 - keep_months, 12)
+    cutoff = f'{year:04d}-{month + 1:02d}'
+    deleted = AreaMetricSnapshot.query.filter(AreaMetricSnapshot.period < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+# ===== 序列读取与向量化计算 =====
+
+def load_series(city_ids, resolution='day', start=None, end=None, metrics=METRICS):
+    """
+    读取降采样序列，返回 (buckets, area_ids, {指标: 矩阵})；
+    矩阵为 [时间桶 × 商圈]，缺失值为 NaN（numpy）或 None（纯Python）。
+    """
+    query = AreaMetricSeries.query.filter(AreaMetricSeries.resolution == resolution)
+    if city_ids is not None:
+        query = query.filter(AreaMetricSeries.city_id.in_(list(city_ids)))
+    if start:
+        query = query.filter(AreaMetricSeries.bucket >= start)
+    if end:
+        query = query.filter(AreaMetricSeries.bucket <= end)
+    rows = query.order_by(AreaMetricSeries.bucket).all()
+
+    buckets = sorted({row.bucket for row in rows})
+    bucket_index = {bucket: index for index, bucket in enumerate(buckets)}
+    area_ids, area_index = [], {}
+    cells = []
+    for row in rows:
+        row_ids = row.get_area_ids()
+        row_metrics = row.get_metrics()
+        for area_id in row_ids:
+            if area_id not in area_index:
+                area_index[area_id] = len(area_ids)
+                area_ids.append(area_id)
+        cells.append((bucket_index[row.bucket], [area_index[a] for a in row_ids], row_metrics))
+
+    matrices = {}
+    for metric in metrics:
+        if HAS_NUMPY:
+            matrix = np.full((len(buckets), len(area_ids)), np.nan)
+            for bucket, columns, row_metrics in cells:
+                values = row_metrics.get(metric) or []
+                if columns and values:
+                    matrix[bucket, columns] = np.array(values, dtype=float)
+        else:
+            matrix = [[None] * len(area_ids) for _ in buckets]
+            for bucket, columns, row_metrics in cells:
+                for column, value in zip(columns, row_metrics.get(metric) or []):
+                    matrix[bucket][column] = value
+        matrices[metric] = matrix
+    return buckets, area_ids, matrices
+
+
+def forward_fill(matrix):
+    """沿时间轴前向填充缺失值"""
+    if HAS_NUMPY:
+        if matrix.size == 0:
+            return matrix
+        valid = ~np.isnan(matrix)
+        index = np.where(valid, np.arange(matrix.shape[0])[:, None], 0)
+        np.maximum.accumulate(index, axis=0, out=index)
+        return matrix[index, np.arange(matrix.shape[1])]
+
+    filled = [list(row) for row in matrix]
+    for t in range(1, len(filled)):
+        for column, value in enumerate(filled[t]):
+            if value is None:
+                filled[t][column] = filled[t - 1][column]
+    return filled
+
+
+def window_growth(matrix):
+    """每列窗口内 (最新值 - 首个有效值) / 首个有效值 × 100，有效快照不足两个或无法计算时为 None"""
+    if HAS_NUMPY:
+        if matrix.size == 0:
+            return [None] * matrix.shape[1]
+        valid = ~np.isnan(matrix)
+        columns = np.arange(matrix.shape[1])
+        first = matrix[valid.argmax(axis=0), columns]
+        last = forward_fill(matrix)[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where((first > 0) & (valid.sum(axis=0) >= 2), (last - first) / first * 100, np.nan)
+        return [None if math.isnan(value) else round(float(value), 1) for value in growth]
+
+    result = []
+    for column in range(len(matrix[0]) if matrix else 0):
+        values = [row[column] for row in matrix if row[column] is not None]
+        if len(values) < 2 or not values[0]:
+            result.append(None)
+        else:
+            result.append(round((values[-1] - values[0]) / values[0] * 100, 1))
+    return result
+
+
+def column_sums(matrix):
+    """每个时间桶的列合计（忽略缺失值）"""
+    if HAS_NUMPY:
+        return [float(value) for value in np.nansum(matrix, axis=1)] if matrix.size else []
+    return [sum(value for value in row if value is not None) for row in matrix]
+
+
+def growth_rates(area_ids, city_ids, days=7, metric='hot_value'):
+    """计算商圈在最近 days 天内的增长率，返回 {商圈ID: 百分比或None}"""
+    area_ids = list(area_ids)
+    if not area_ids:
+        return {}
+
+    today = datetime.utcnow().date()
+    key = (frozenset(city_ids), days, metric, today, _version)
+    growth = _growth_cache.get(key)
+    if growth is None:
+        buckets, series_ids, matrices = load_series(
+            key[0], 'day', today - timedelta(days=days), today, (metric,)
+        )
+        growth = dict(zip(series_ids, window_growth(matrices[metric]))) if buckets else {}
+        _growth_cache.set(key, growth)
+    return {area_id: growth.get(area_id) for area_id in area_ids}
+
+
+def daily_totals(city_id=None, days=30):
+    """
+    最近 days 天每天的城市合计：客流（customer_flow 之和）和估算消费额（avg_consumption × customer_flow）。
+    没有爬取的日期沿用前一次的值，第一次快照之前为 None。同一请求内相同参数只计算一次。
+    """
+    return request_cache.memoize(('daily_totals', city_id, days), lambda: _daily_totals(city_id, days))
+
+
+def _daily_totals(city_id, days):
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    # 多取一个周期作为前向填充的起点
+    buckets, area_ids, matrices = load_series(
+        [city_id] if city_id else None, 'day', start - timedelta(days=days), today,
+        ('avg_consumption', 'customer_flow')
+    )
+
+    flow = forward_fill(matrices['customer_flow'])
+    price = forward_fill(matrices['avg_consumption'])
+    if HAS_NUMPY:
+        sales = flow * price if flow.size else flow
+    else:
+        sales = [[(f or 0) * (p or 0) if f is not None else None for f, p in zip(fr, pr)]
+                 for fr, pr in zip(flow, price)]
+    customers_by_bucket = dict(zip(buckets, column_sums(flow)))
+    sales_by_bucket = dict(zip(buckets, column_sums(sales)))
+
+    dates, customers, revenue = [], [], []
+    last_customers = last_sales = None
+    bucket_cursor = [bucket for bucket in buckets if bucket < start]
+    if bucket_cursor:
+        last_customers = customers_by_bucket[bucket_cursor[-1]]
+        last_sales = sales_by_bucket[bucket_cursor[-1]]
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        if day in customers_by_bucket:
+            last_customers = customers_by_bucket[day]
+            last_sales = sales_by_bucket[day]
+        dates.append(day)
+        customers.append(int(last_customers) if last_customers is not None else None)
+        revenue.append(int(last_sales) if last_sales is not None else None)
+    return dates, revenue, customers
+
+
+def daily_flow_by_daytype(city_id=None, weeks=4):
+    """最近 weeks 周工作日/周末的日均客流合计，无历史时返回 (None, None)"""
+    dates, _, customers = daily_totals(city_id, weeks * 7)
+    weekday = [c for d, c in zip(dates, customers) if c is not None and d.weekday() < 5]
+    weekend = [c for d, c in zip(dates, customers) if c is not None and d.weekday() >= 5]
+    return (
+        sum(weekday) / len(weekday) if weekday else None,
+        sum(weekend) / len(weekend) if weekend else None
+    )
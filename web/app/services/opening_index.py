@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+营业时段索引
+
+商圈、店铺写入时由 opening_hours 文本生成 opening_bitmap（一周 7×96 个15分钟时段的位图，见
+app/utils/opening_hours.py），openAt=/openNow= 筛选只判断位图中的一位，查询时不解析文本：
+- SQLite 使用连接上注册的自定义函数 open_at(位图, 位置)
+- 其他数据库取出对应字节按位与（PostgreSQL 用 get_byte，MySQL 等用 ascii(substring(...))）
+升级前已有数据的位图由迁移一次性补齐；分片库中的旧数据或解析规则变化后执行 flask opening rebuild。
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import bindparam, event, func
+from sqlalchemy.orm.attributes import get_history
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.store import Store
+from app.utils import opening_hours, sharding
+
+logger = logging.getLogger(__name__)
+
+
+# ===== 写入时生成位图 =====
+
+def _fill(mapper, connection, target):
+    target.opening_bitmap = opening_hours.encode(target.opening_hours)
+
+
+def _refill(mapper, connection, target):
+    if get_history(target, 'opening_hours').has_changes():
+        _fill(mapper, connection, target)
+
+
+for _model in (BusinessArea, Store):
+    event.listen(_model, 'before_insert', _fill)
+    event.listen(_model, 'before_update', _refill)
+
+
+# ===== 筛选 =====
+
+def parse_time(value, now=None):
+    """openAt 参数 → 时间：ISO 格式（2026-10-21T23:00）或当天的 HH:MM；格式错误抛出 ValueError"""
+    value = value.strip()
+    if 'T' in value or '-' in value:
+        return datetime.fromisoformat(value)
+    hour, minute = value.replace('：', ':').split(':')
+    return (now or datetime.now()).replace(hour=int(hour), minute=int(minute), second=0, microsecond=0)
+
+
+def criterion(model, when):
+    """model 在 when 时营业中的条件"""
+    position = opening_hours.bit(when)
+    column = model.opening_bitmap
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return func.open_at(column, position) == 1
+    if dialect == 'postgresql':
+        # bytea 不支持 ascii/substring 取字节值
+        byte = func.get_byte(column, position // 8)
+    else:
+        byte = func.ascii(func.substring(column, position // 8 + 1, 1))
+    return byte.op('&')(1 << (position % 8)) != 0
+
+
+# ===== 重建 =====
+
+def rebuild():
+    """由 opening_hours 重新生成位图并提交（不改变 updated_at），返回更新的行数"""
+    total = 0
+    for model in (BusinessArea, Store):
+        table = model.__table__
+        statement = (
+            table.update()
+            .where(table.c.id == bindparam('_id'))
+            .values(opening_bitmap=bindparam('_bitmap'), updated_at=table.c.updated_at)
+        )
+        for _ in (sharding.each_shard() if model is Store else [None]):
+            query = db.session.query(model.id, model.opening_hours).filter(model.opening_hours.isnot(None))
+            rows = [{'_id': row_id, '_bitmap': opening_hours.encode(text)} for row_id, text in query]
+            if rows:
+                db.session.connection(bind_arguments={'mapper': model.__mapper__}).execute(statement, rows)
+            db.session.commit()
+            total += len(rows)
+
+    logger.info(f"营业时段位图生成完成，共 {total} 行")
+    return total
+
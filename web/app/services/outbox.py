@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+变更事件发件箱
+
+商圈/店铺的每次插入、更新、删除都在同一事务内写入 outbox_events（事务回滚则事件也不存在），
+无论写入来自爬虫管理器、数据源管理器还是API。
+消费者按事件ID顺序批量读取，分发给已注册的处理器：
+- 每个处理器独立记录消费位置（outbox_offsets），处理器的数据库写入与位置推进在同一事务提交
+- 处理失败时回滚并停在原位置，下次从同一批重新处理（至少一次投递，处理器需保证幂等）
+- 遇到尚未提交的事务造成的ID空洞时，在 OUTBOX_SETTLE_SECONDS 内不越过空洞
+所有处理器都消费过的事件会被清理。
+"""
+
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm.attributes import get_history
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.store import Store
+from app.models.outbox import OutboxEvent, OutboxOffset
+from app.services import post_crawl
+from app.utils import sharding
+
+logger = logging.getLogger(__name__)
+
+events_table = OutboxEvent.__table__
+
+# 处理器：名称 -> (函数, 关注的实体类型或None)
+_handlers = {}
+
+
+def handler(name, entities=None):
+    """
+    注册事件处理器，函数接收一批 OutboxEvent（按ID升序），
+    不需要提交事务；entities 为关注的实体类型，None 表示全部
+    """
+    def decorator(func):
+        _handlers[name] = (func, tuple(entities) if entities else None)
+        return func
+    return decorator
+
+
+def handlers():
+    """已注册的处理器名称"""
+    return sorted(_handlers)
+
+
+# ===== 写入事件 =====
+
+def _columns(mapper):
+    # 大文本字段（描述、图片、标签等JSON）和二进制位图不写入事件
+    return [attr for attr in mapper.column_attrs
+            if not isinstance(attr.columns[0].type, (db.Text, db.LargeBinary))]
+
+
+def _snapshot(mapper, target):
+    return {attr.key: getattr(target, attr.key) for attr in _columns(mapper)}
+
+
+def _event_values(entity, op, row, payload):
+    return {
+        'entity': entity,
+        'entity_id': row['id'],
+        'op': op,
+        'city_id': row.get('city_id'),
+        'business_area_id': row.get('business_area_id'),
+        'payload': json.dumps(payload, ensure_ascii=False, default=str),
+        'created_at': datetime.utcnow()
+    }
+
+
+def _write_event(connection, entity, op, target, payload):
+    row = {'id': target.id,
+           'city_id': getattr(target, 'city_id', None),
+           'business_area_id': getattr(target, 'business_area_id', None)}
+    connection = sharding.primary_connection(connection)
+    connection.execute(events_table.insert().values(**_event_values(entity, op, row, payload)))
+
+
+def _record_insert(entity):
+    def listener(mapper, connection, target):
+        _write_event(connection, entity, 'insert', target, {'after': _snapshot(mapper, target)})
+    return listener
+
+
+def _record_update(entity):
+    def listener(mapper, connection, target):
+        before = {}
+        for attr in _columns(mapper):
+            history = get_history(target, attr.key)
+            if history.deleted or history.added:
+                old = history.deleted[0] if history.deleted else None
+                if not history.added or history.added[0] != old:
+                    before[attr.key] = old
+        if before:
+            _write_event(connection, entity, 'update', target,
+                         {'before': before, 'after': _snapshot(mapper, target)})
+    return listener
+
+
+def _record_delete(entity):
+    def listener(mapper, connection, target):
+        _write_event(connection, entity, 'delete', target, {'before': _snapshot(mapper, target)})
+    return listener
+
+
+def record_bulk(connection, model, entity, inserted=(), updated=(), deleted=()):
+    """
+    为不经过ORM事件的批量语句写入变更事件（与批量语句在同一事务）；
+    行为 {列名: 值}，updated 为 [(旧行, 新行)]，只记录实际变化的字段
+    """
+    keys = [attr.key for attr in _columns(model.__mapper__)]
+
+    def snapshot(row):
+        return {key: row.get(key) for key in keys}
+
+    values = [_event_values(entity, 'insert', row, {'after': snapshot(row)}) for row in inserted]
+    for old, new in updated:
+        before = {key: old.get(key) for key in keys if key in new and new[key] != old.get(key)}
+        if before:
+            values.append(_event_values(entity, 'update', new, {'before': before, 'after': snapshot({**old, **new})}))
+    values.extend(_event_values(entity, 'delete', row, {'before': snapshot(row)}) for row in deleted)
+    if values:
+        connection.execute(events_table.insert(), values)
+
+
+for _model, _entity in ((BusinessArea, 'area'), (Store, 'store')):
+    event.listen(_model, 'after_insert', _record_insert(_entity))
+    event.listen(_model, 'after_update', _record_update(_entity))
+    event.listen(_model, 'after_delete', _record_delete(_entity))
+
+
+# ===== 消费 =====
+
+def get_offset(name):
+    row = db.session.get(OutboxOffset, name)
+    return row.last_event_id if row else 0
+
+
+def _set_offset(name, event_id):
+    row = db.session.get(OutboxOffset, name)
+    if row is None:
+        db.session.add(OutboxOffset(handler=name, last_event_id=event_id))
+    else:
+        row.last_event_id = event_id
+
+
+def mark_consumed(name):
+    """将处理器位置推进到最新事件（如处理器对应的数据刚做过全量重建），不提交"""
+    latest = db.session.query(func.max(OutboxEvent.id)).scalar()
+    if latest is not None:
+        _set_offset(name, latest)
+
+
+def _contiguous(events, offset):
+    """截断到第一个仍可能被晚提交事务填上的ID空洞之前"""
+    settle = datetime.utcnow() - timedelta(seconds=current_app.config.get('OUTBOX_SETTLE_SECONDS', 5))
+    result = []
+    expected = offset + 1
+    for item in events:
+        if item.id != expected and item.created_at > settle:
+            break
+        result.append(item)
+        expected = item.id + 1
+    return result
+
+
+def consume_handler(name, batch_size=None):
+    """让一个处理器消费到最新位置，返回处理的事件数；处理失败时抛出异常且位置不变"""
+    func, entities = _handlers[name]
+    batch_size = batch_size or current_app.config.get('OUTBOX_BATCH_SIZE', 500)
+    offset = get_offset(name)
+
+    processed = 0
+    while True:
+        fetched = (
+            OutboxEvent.query
+            .filter(OutboxEvent.id > offset)
+            .order_by(OutboxEvent.id)
+            .limit(batch_size)
+            .all()
+        )
+        batch = _contiguous(fetched, offset)
+        if not batch:
+            break
+
+        relevant = [item for item in batch if entities is None or item.entity in entities]
+        try:
+            if relevant:
+                func(relevant)
+            _set_offset(name, batch[-1].id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        offset = batch[-1].id
+        processed += len(relevant)
+        if len(batch) < len(fetched) or len(fetched) < batch_size:
+            break
+    return processed
+
+
+def consume(names=None):
+    """让处理器依次消费，返回 {处理器: 处理的事件数}；单个处理器失败不影响其他处理器"""
+    result = {}
+    for name in names or handlers():
+        try:
+            result[name] = consume_handler(name)
+        except Exception as e:
+            logger.error(f"变更事件处理器 {name} 失败: {str(e)}")
+            result[name] = None
+    return result
+
+
+def prune():
+    """删除所有处理器都已消费的事件，返回删除行数"""
+    names = handlers()
+    if not names:
+        return 0
+    offsets = {row.handler: row.last_event_id for row in OutboxOffset.query.filter(OutboxOffset.handler.in_(names))}
+    low = min(offsets.get(name, 0) for name in names)
+    if not low:
+        return 0
+    deleted = OutboxEvent.query.filter(OutboxEvent.id <= low).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def run_forever(interval=None):
+    """消费者循环（用于独立的后台进程）"""
+    interval = interval or current_app.config.get('OUTBOX_POLL_INTERVAL', 2)
+    while True:
+        result = consume()
+        if any(result.values()):
+            logger.info(f"变更事件处理完成: {result}")
+            prune()
+        else:
+            time.sleep(interval)
+
+
+@post_crawl.stage(order=40)
+def _consume_stage(city_ids):
+    """爬取批次结束时在本进程内消费一次，不依赖独立的消费者进程"""
+    result = consume()
+    prune()
+    logger.info(f"变更事件处理完成: {result}")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取批次后处理
+
+商圈和店铺写入时只记录受影响的城市，每个爬取批次结束后调用 run()，
+按顺序执行已注册的处理阶段（城市汇总、指标历史等），每个阶段接收本批次涉及的城市ID。
+"""
+
+import logging
+import threading
+
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.store import Store
+
+logger = logging.getLogger(__name__)
+
+_stages = []
+_pending_cities = set()
+_pending_areas = set()
+_pending_lock = threading.Lock()
+
+
+def stage(order):
+    """注册批次后处理阶段（order 越小越先执行）"""
+    def decorator(func):
+        _stages.append((order, func))
+        _stages.sort(key=lambda item: item[0])
+        return func
+    return decorator
+
+
+# ===== 写入时记录受影响的城市/商圈 =====
+
+@event.listens_for(BusinessArea, 'after_insert')
+@event.listens_for(BusinessArea, 'after_update')
+@event.listens_for(BusinessArea, 'after_delete')
+def _area_changed(mapper, connection, target):
+    with _pending_lock:
+        _pending_cities.add(target.city_id)
+
+
+@event.listens_for(Store, 'after_insert')
+@event.listens_for(Store, 'after_update')
+@event.listens_for(Store, 'after_delete')
+def _store_changed(mapper, connection, target):
+    with _pending_lock:
+        _pending_areas.add(target.business_area_id)
+
+
+def mark_cities(city_ids):
+    """手动标记需要处理的城市"""
+    with _pending_lock:
+        _pending_cities.update(city_id for city_id in city_ids if city_id)
+
+
+def take_pending():
+    """取出并清空待处理城市"""
+    global _pending_cities, _pending_areas
+
+    with _pending_lock:
+        city_ids, area_ids = _pending_cities, _pending_areas
+        _pending_cities, _pending_areas = set(), set()
+
+    if area_ids:
+        city_ids |= {
+            row[0] for row in
+            db.session.query(BusinessArea.city_id).filter(BusinessArea.id.in_(area_ids)).distinct()
+        }
+    return sorted(city_id for city_id in city_ids if city_id)
+
+
+def run():
+    """执行批次后处理，返回处理的城市ID列表"""
+    city_ids = take_pending()
+    if not city_ids:
+        return []
+
+    for order, func in _stages:
+        try:
+            func(city_ids)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"批次后处理 {func.__module__}.{func.__name__} 失败: {str(e)}")
+
+    logger.info(f"批次后处理完成，共 {len(city_ids)} 个城市")
+    return city_ids
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+城市参考数据服务
+
+城市表是几千行的参考数据，这里在启动时一次性加载到内存：
+- 前缀树（名称、拼音、首字母缩写）用于自动补全
+- KD树（城市/区县中心点，单位球面三维坐标）用于最近城市查询
+- 省 → 市 → 区县 层级关系
+本进程内的城市写入会标记数据过期；其他进程（如导入脚本）的写入通过
+定期比对 (行数, 最后更新时间) 签名发现，下次访问时重新加载。
+"""
+
+import logging
+import math
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event, func
+
+from app.extensions import db
+from app.models.city import City
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixTrie:
+    """前缀树，每个节点预先保存排序后的前若干个结果"""
+
+    def __init__(self, max_results=20):
+        self.max_results = max_results
+        self.root = {}
+
+    def insert(self, key, item_id, sort_key):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+            node.setdefault('', {})[item_id] = sort_key
+
+    def finalize(self):
+        """对各节点结果排序并截断（插入完成后调用一次）"""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char == '':
+                    continue
+                bucket = child.get('')
+                if bucket:
+                    ranked = sorted(bucket.items(), key=lambda entry: entry[1])
+                    child[''] = [item_id for item_id, _ in ranked[:self.max_results]]
+                stack.append(child)
+
+    def search(self, prefix, limit=None):
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        results = node.get('', [])
+        return results[:limit] if limit else list(results)
+
+
+def _to_xyz(longitude, latitude):
+    """经纬度转换为单位球面三维坐标，欧氏距离与球面距离单调一致"""
+    lng, lat = math.radians(longitude), math.radians(latitude)
+    cos_lat = math.cos(lat)
+    return (cos_lat * math.cos(lng), cos_lat * math.sin(lng), math.sin(lat))
+
+
+class KDTree:
+    """三维KD树（最近邻查询）"""
+
+    def __init__(self, points):
+        # points: [((x, y, z), item_id)]
+        self.root = self._build(list(points), 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        mid = len(points) // 2
+        return (
+            points[mid],
+            axis,
+            self._build(points[:mid], depth + 1),
+            self._build(points[mid + 1:], depth + 1)
+        )
+
+    def nearest(self, target):
+        best_id, best_dist = None, float('inf')
+        # 栈元素：(节点, 到分割面的最小距离平方)
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            # 超球面与该子树的分割面不相交时剪枝
+            if node is None or bound >= best_dist:
+                continue
+            (point, item_id), axis, left, right = node
+            dist = sum((a - b) ** 2 for a, b in zip(point, target))
+            if dist < best_dist:
+                best_id, best_dist = item_id, dist
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # 远侧先入栈，近侧先访问
+            stack.append((far, diff * diff))
+            stack.append((near, 0.0))
+        return best_id, best_dist
+
+
+class ReferenceSnapshot:
+    """某一时刻的城市参考数据（只读，整体替换）"""
+
+    def __init__(self, cities, signature=None):
+        from app.utils.response import dumps, make_fragment
+
+        self.signature = signature
+        self.records = {}
+        self.fragments = {}
+        self.children = {}
+        self.provinces = []
+        self.hot_cities = []
+        self.tries = {}
+        self.trees = {}
+
+        points = {'city': [], 'district': []}
+        for city in cities:
+            try:
+                record = city.to_dict()
+            except (LookupError, ValueError, TypeError):
+                # 无法加载的记录（如上级城市的层级不在模型定义中）不影响其余数据
+                continue
+            self.records[city.id] = record
+            self.fragments[city.id] = make_fragment(dumps(record))
+            if city.parent_id:
+                self.children.setdefault((city.parent_id, city.level), []).append(city.id)
+            if city.level == 'province':
+                self.provinces.append(city.id)
+            if city.level == 'city' and city.is_hot:
+                self.hot_cities.append(city.id)
+            if city.level in points and city.longitude is not None and city.latitude is not None:
+                points[city.level].append((_to_xyz(city.longitude, city.latitude), city.id))
+
+            trie = self.tries.setdefault(city.level, PrefixTrie())
+            # 热门城市优先，其次名称越短越优先
+            sort_key = (0 if city.is_hot else 1, len(city.name), city.name)
+            for key in (city.name, (city.pinyin or '').lower(), (city.pinyin_abbr or '').lower()):
+                if key:
+                    trie.insert(key, city.id, sort_key)
+
+        by_name = lambda item_id: self.records[item_id]['name']
+        for ids in self.children.values():
+            ids.sort(key=by_name)
+        self.provinces.sort(key=by_name)
+        self.hot_cities.sort(key=by_name)
+        for trie in self.tries.values():
+            trie.finalize()
+        self.trees = {level: KDTree(items) for level, items in points.items() if items}
+
+    def autocomplete(self, keyword, level='city', limit=20):
+        trie = self.tries.get(level)
+        if not trie or not keyword:
+            return []
+        return trie.search(keyword.lower(), limit)
+
+    def nearest(self, longitude, latitude, level='city'):
+        """返回 (城市ID, 距离公里)"""
+        tree = self.trees.get(level)
+        if not tree:
+            return None, None
+        item_id, chord_sq = tree.nearest(_to_xyz(longitude, latitude))
+        # 弦长换算为球面距离
+        chord = math.sqrt(chord_sq)
+        return item_id, 2 * math.asin(min(1.0, chord / 2)) * 6371.0
+
+    def children_of(self, parent_id, level):
+        return self.children.get((parent_id, level), [])
+
+
+_snapshot = None
+_stale = True
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+@event.listens_for(City, 'after_insert')
+@event.listens_for(City, 'after_update')
+@event.listens_for(City, 'after_delete')
+def _mark_stale(mapper, connection, target):
+    global _stale
+    _stale = True
+
+
+def _signature():
+    return tuple(db.session.query(func.count(City.id), func.max(City.updated_at)).one())
+
+
+def reload():
+    """从数据库重新加载参考数据"""
+    global _snapshot, _stale, _checked_at
+
+    with _lock:
+        _stale = False
+        _checked_at = time.monotonic()
+        signature = _signature()
+        _snapshot = ReferenceSnapshot(City.loadable().all(), signature)
+
+    skipped = signature[0] - len(_snapshot.records)
+    if skipped:
+        logger.warning(f"城市参考数据跳过 {skipped} 条无效记录")
+    logger.info(f"城市参考数据加载完成，共 {len(_snapshot.records)} 条")
+    return _snapshot
+
+
+def get_snapshot():
+    """获取当前参考数据（过期时重新加载）"""
+    global _checked_at
+
+    if _stale or _snapshot is None:
+        return reload()
+
+    interval = current_app.config.get('REFERENCE_DATA_CHECK_INTERVAL', 60)
+    if time.monotonic() - _checked_at >= interval:
+        _checked_at = time.monotonic()
+        if _signature() != _snapshot.signature:
+            return reload()
+    return _snapshot
+
+
+def init_app(app):
+    """启动时加载参考数据"""
+    with app.app_context():
+        try:
+            reload()
+        except Exception as e:
+            logger.error(f"加载城市参考数据失败: {str(e)}")
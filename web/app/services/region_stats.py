@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+城市/区县汇总维护
+
+作为爬取批次后处理阶段（见 post_crawl），按受影响的城市重新汇总
+（商圈列 + area_store_stats + 店铺完整度），写入 region_stats。
+分析接口只读取汇总行，响应时间与城市店铺数量无关。
+商圈没有区县字段，按坐标归属到所在城市最近的区县。
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import case, func
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.store import Store
+from app.models.statistics import AreaStoreStats, RegionStats
+from app.services import post_crawl
+from app.utils import sharding
+
+logger = logging.getLogger(__name__)
+
+# 活跃商圈热度阈值
+ACTIVE_HOT_VALUE = 5000
+
+
+def district_locator(city_id):
+    """返回将坐标归属到该城市最近区县的函数"""
+    from app.services import reference_data
+
+    snapshot = reference_data.get_snapshot()
+    districts = [
+        (district_id, snapshot.records[district_id]['longitude'], snapshot.records[district_id]['latitude'])
+        for district_id in snapshot.children_of(city_id, 'district')
+        if snapshot.records[district_id]['longitude'] is not None
+    ]
+
+    def locate(longitude, latitude):
+        if not districts or longitude is None or latitude is None:
+            return None
+        return min(districts, key=lambda d: (d[1] - longitude) ** 2 + (d[2] - latitude) ** 2)[0]
+
+    return locate
+
+
+def _new_totals(region_id, level, parent_id=None):
+    totals = {column.name: column.default.arg for column in RegionStats.__table__.columns
+              if column.default is not None and not callable(column.default.arg)}
+    totals.update(region_id=region_id, level=level, parent_id=parent_id,
+                  type_distribution={}, level_distribution={})
+    return totals
+
+
+def _accumulate(totals, area, store_stats, quality):
+    totals['area_count'] += 1
+    if (area.hot_value or 0) > ACTIVE_HOT_VALUE:
+        totals['active_area_count'] += 1
+    if area.longitude is not None and area.latitude is not None:
+        totals['areas_with_coords'] += 1
+    totals['area_store_count'] += area.store_count or 0
+    totals['hot_value_sum'] += area.hot_value or 0
+    if (area.rating or 0) > 0:
+        totals['rated_area_count'] += 1
+        totals['area_rating_sum'] += area.rating
+    totals['type_distribution'][area.type] = totals['type_distribution'].get(area.type, 0) + 1
+    totals['level_distribution'][area.level] = totals['level_distribution'].get(area.level, 0) + 1
+
+    if store_stats is not None:
+        for column in ('store_count', 'high_rating_count', 'medium_rating_count', 'low_rating_count',
+                       'high_price_count', 'medium_price_count', 'low_price_count'):
+            totals[column] += getattr(store_stats, column) or 0
+    if quality is not None:
+        totals['stores_with_rating'] += quality[0] or 0
+        totals['stores_with_phone'] += quality[1] or 0
+
+
+def _summarize(city_id):
+    """汇总单个城市及其区县，返回未写入的 RegionStats 行（城市行在前）"""
+    areas = (
+        db.session.query(BusinessArea.id, BusinessArea.type, BusinessArea.level,
+                         BusinessArea.hot_value, BusinessArea.rating, BusinessArea.store_count,
+                         BusinessArea.longitude, BusinessArea.latitude)
+        .filter(BusinessArea.city_id == city_id)
+        .all()
+    )
+    area_ids = [area.id for area in areas]
+
+    store_stats = {}
+    quality = {}
+    if area_ids:
+        store_stats = {
+            stats.business_area_id: stats
+            for stats in AreaStoreStats.query.filter(AreaStoreStats.business_area_id.in_(area_ids))
+        }
+        # 店铺可能在分片库中，按商圈ID过滤而不与商圈表联表
+        with sharding.use_city(city_id):
+            quality = {
+                row[0]: row[1:]
+                for row in db.session.query(
+                    Store.business_area_id,
+                    func.sum(case((Store.rating > 0, 1), else_=0)),
+                    func.count(Store.phone)
+                )
+                .filter(Store.business_area_id.in_(area_ids))
+                .group_by(Store.business_area_id)
+            }
+
+    locate = district_locator(city_id)
+    city_totals = _new_totals(city_id, 'city')
+    district_totals = {}
+    for area in areas:
+        _accumulate(city_totals, area, store_stats.get(area.id), quality.get(area.id))
+        district_id = locate(area.longitude, area.latitude)
+        if district_id:
+            totals = district_totals.setdefault(district_id, _new_totals(district_id, 'district', city_id))
+            _accumulate(totals, area, store_stats.get(area.id), quality.get(area.id))
+
+    now = datetime.utcnow()
+    rows = []
+    for totals in [city_totals, *district_totals.values()]:
+        type_distribution = totals.pop('type_distribution')
+        level_distribution = totals.pop('level_distribution')
+        row = RegionStats(updated_at=now, **totals)
+        row.set_type_distribution(type_distribution)
+        row.set_level_distribution(level_distribution)
+        rows.append(row)
+    return rows
+
+
+def refresh_city(city_id):
+    """重新汇总单个城市及其区县"""
+    rows = _summarize(city_id)
+    RegionStats.query.filter(
+        (RegionStats.region_id == city_id) |
+        ((RegionStats.parent_id == city_id) & (RegionStats.level == 'district'))
+    ).delete(synchronize_session=False)
+    db.session.add_all(rows)
+
+
+def refresh_cities(city_ids):
+    """重新汇总一批城市并提交，返回刷新的城市数"""
+    city_ids = [city_id for city_id in set(city_ids) if city_id]
+    try:
+        for city_id in city_ids:
+            refresh_city(city_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(city_ids)
+
+
+@post_crawl.stage(order=10)
+def _refresh_stage(city_ids):
+    count = refresh_cities(city_ids)
+    logger.info(f"城市汇总刷新完成，共 {count} 个城市")
+
+
+def rebuild():
+    """全量重建所有城市/区县汇总"""
+    city_ids = [row[0] for row in db.session.query(BusinessArea.city_id).distinct()]
+    RegionStats.query.delete(synchronize_session=False)
+    count = refresh_cities(city_ids)
+    logger.info(f"城市汇总重建完成，共 {count} 个城市")
+    return count
+
+
+def get_city_stats(city_id):
+    """
+    读取城市汇总；尚未生成时在内存中汇总一次用于响应，不写入
+    （汇总行只由批次后处理和 rebuild 写入）
+    """
+    stats = db.session.get(RegionStats, city_id)
+    if stats is None and BusinessArea.query.filter_by(city_id=city_id).first() is not None:
+        stats = _summarize(city_id)[0]
+    return stats
+
+
+def get_district_stats(city_id):
+    """读取城市下各区县汇总；城市尚未汇总时同 get_city_stats 在内存中汇总，不写入"""
+    if db.session.get(RegionStats, city_id) is None:
+        return _summarize(city_id)[1:]
+    return RegionStats.query.filter_by(parent_id=city_id, level='district').all()
+
+
+def get_totals(city_id=None):
+    """读取单个城市汇总，或不指定城市时合计所有城市汇总"""
+    if city_id:
+        return get_city_stats(city_id)
+
+    columns = [column for column in RegionStats.__table__.columns
+               if column.name not in ('region_id', 'level', 'parent_id', 'updated_at',
+                                      'type_distribution', 'level_distribution')]
+    row = (
+        db.session.query(*[func.coalesce(func.sum(column), 0) for column in columns])
+        .filter(RegionStats.level == 'city')
+        .one()
+    )
+    totals = RegionStats(region_id=None, level='city')
+    for column, value in zip(columns, row):
+        setattr(totals, column.name, value)
+    return totals
+
+
+def init_app(app):
+    """已有商圈数据但汇总表为空时（如首次升级）执行一次全量重建"""
+    with app.app_context():
+        try:
+            if not db.session.query(RegionStats.region_id).first() \
+                    and db.session.query(BusinessArea.id).first():
+                rebuild()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"初始化城市汇总失败: {str(e)}")
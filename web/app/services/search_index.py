@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈/城市全文搜索索引
+
+基于 SQLite FTS5：中文名称在写入时切分为单字 + 二元组（n-gram），
+同时生成拼音全拼、音节和首字母缩写词元，查询时走倒排索引而不是 LIKE 全表扫描。
+非 SQLite 数据库或 FTS5 不可用时回退到原有的 LIKE 查询。
+"""
+
+import json
+import logging
+import math
+import re
+
+from sqlalchemy import event, text
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.city import City
+
+# pypinyin为可选依赖，未安装时商圈只索引中文n-gram（启动时警告拼音搜索不可用）
+try:
+    from pypinyin import lazy_pinyin, Style
+    HAS_PYPINYIN = True
+except ImportError:
+    HAS_PYPINYIN = False
+
+logger = logging.getLogger(__name__)
+
+INDEX_TABLE = 'search_index'
+
+_CJK_RE = re.compile(r'[㐀-鿿]+')
+_WORD_RE = re.compile(r'[0-9a-zA-Z]+')
+
+# 索引是否可用（init_app 时检测）
+_enabled = False
+
+
+def _cjk_ngrams(value):
+    """中文片段切分为单字和二元组"""
+    tokens = []
+    for segment in _CJK_RE.findall(value or ''):
+        tokens.extend(segment)
+        tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return tokens
+
+
+def _pinyin_tokens(name, pinyin=None, pinyin_abbr=None):
+    """拼音词元：全拼、各音节、首字母缩写"""
+    tokens = []
+    if pinyin:
+        tokens.append(pinyin.lower())
+    if pinyin_abbr:
+        tokens.append(pinyin_abbr.lower())
+
+    if HAS_PYPINYIN and name and not (pinyin and pinyin_abbr):
+        syllables = [s for s in lazy_pinyin(name, style=Style.NORMAL) if s.isalnum()]
+        initials = [s for s in lazy_pinyin(name, style=Style.FIRST_LETTER) if s.isalnum()]
+        if syllables:
+            tokens.append(''.join(syllables).lower())
+            tokens.extend(s.lower() for s in syllables)
+        if initials:
+            tokens.append(''.join(initials).lower())
+    return tokens
+
+
+def build_tokens(name, pinyin=None, pinyin_abbr=None):
+    """生成写入索引的词元串"""
+    tokens = _cjk_ngrams(name)
+    tokens.extend(word.lower() for word in _WORD_RE.findall(name or ''))
+    tokens.extend(_pinyin_tokens(name, pinyin, pinyin_abbr))
+    # 去重并保持顺序
+    return ' '.join(dict.fromkeys(tokens))
+
+
+def build_match_query(keyword):
+    """将用户关键词转换为 FTS5 MATCH 表达式"""
+    terms = []
+    for segment in _CJK_RE.findall(keyword or ''):
+        # 多字片段用二元组匹配，单字片段用单字匹配
+        if len(segment) == 1:
+            terms.append(f'"{segment}"')
+        else:
+            terms.extend(f'"{segment[i:i + 2]}"' for i in range(len(segment) - 1))
+    for word in _WORD_RE.findall(keyword or ''):
+        # 拼音/英文按前缀匹配，支持边输入边搜索
+        terms.append(f'"{word.lower()}"*')
+    return ' AND '.join(dict.fromkeys(terms))
+
+
+def _area_row(area):
+    return {
+        'entity_type': 'area',
+        'entity_id': area.id,
+        'city_id': area.city_id,
+        'category': area.type,
+        'hot_value': area.hot_value or 0,
+        'longitude': area.longitude,
+        'latitude': area.latitude,
+        'tokens': build_tokens(area.name)
+    }
+
+
+def _city_row(city):
+    return {
+        'entity_type': 'city',
+        'entity_id': city.id,
+        'city_id': city.parent_id,
+        'category': city.level,
+        'hot_value': 1 if city.is_hot else 0,
+        'longitude': city.longitude,
+        'latitude': city.latitude,
+        'tokens': build_tokens(city.name, city.pinyin, city.pinyin_abbr)
+    }
+
+
+_INSERT_SQL = text(
+    f"INSERT INTO {INDEX_TABLE} "
+    "(entity_type, entity_id, city_id, category, hot_value, longitude, latitude, tokens) "
+    "VALUES (:entity_type, :entity_id, :city_id, :category, :hot_value, :longitude, :latitude, :tokens)"
+)
+_DELETE_SQL = text(f"DELETE FROM {INDEX_TABLE} WHERE entity_type = :entity_type AND entity_id = :entity_id")
+
+
+def _upsert(connection, row):
+    connection.execute(_DELETE_SQL, {'entity_type': row['entity_type'], 'entity_id': row['entity_id']})
+    connection.execute(_INSERT_SQL, row)
+
+
+def _remove(connection, entity_type, entity_id):
+    connection.execute(_DELETE_SQL, {'entity_type': entity_type, 'entity_id': entity_id})
+
+
+_HOT_VALUE_SQL = text(
+    f"UPDATE {INDEX_TABLE} SET hot_value = (SELECT value FROM json_each(:values) WHERE key = entity_id) "
+    "WHERE entity_type = 'area' AND entity_id IN (SELECT key FROM json_each(:values))"
+)
+
+
+# ===== 写入时维护索引（与业务写入处于同一事务）=====
+
+@event.listens_for(BusinessArea, 'after_insert')
+@event.listens_for(BusinessArea, 'after_update')
+def _index_area(mapper, connection, target):
+    if _enabled:
+        _upsert(connection, _area_row(target))
+
+
+@event.listens_for(BusinessArea, 'after_delete')
+def _unindex_area(mapper, connection, target):
+    if _enabled:
+        _remove(connection, 'area', target.id)
+
+
+@event.listens_for(City, 'after_insert')
+@event.listens_for(City, 'after_update')
+def _index_city(mapper, connection, target):
+    if _enabled:
+        _upsert(connection, _city_row(target))
+
+
+@event.listens_for(City, 'after_delete')
+def _unindex_city(mapper, connection, target):
+    if _enabled:
+        _remove(connection, 'city', target.id)
+
+
+def record_bulk(connection, areas):
+    """
+    为不经过ORM事件的批量更新同步商圈热度（与批量语句同一连接、同一事务）；
+    areas 为 [{'id', 'hot_value'}]，每批扫描一次索引表
+    """
+    if not _enabled or not areas:
+        return
+    for i in range(0, len(areas), 500):
+        values = {area['id']: area['hot_value'] or 0 for area in areas[i:i + 500]}
+        connection.execute(_HOT_VALUE_SQL, {'values': json.dumps(values)})
+
+
+def is_enabled():
+    """索引是否可用"""
+    return _enabled
+
+
+def init_app(app):
+    """创建FTS5索引表；首次创建时从现有数据构建索引"""
+    global _enabled
+
+    if not app.config.get('SEARCH_INDEX_ENABLED', True):
+        return
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            logger.info("非SQLite数据库，搜索使用LIKE查询")
+            return
+
+        try:
+            with db.engine.begin() as connection:
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {'name': INDEX_TABLE}
+                ).first()
+                if not exists:
+                    connection.execute(text(
+                        f"CREATE VIRTUAL TABLE {INDEX_TABLE} USING fts5("
+                        "entity_type UNINDEXED, entity_id UNINDEXED, city_id UNINDEXED, "
+                        "category UNINDEXED, hot_value UNINDEXED, longitude UNINDEXED, "
+                        "latitude UNINDEXED, tokens, tokenize = 'unicode61', prefix = '2 3')"
+                    ))
+                else:
+                    # 上次构建失败时索引为空，重新构建
+                    exists = connection.execute(text(f"SELECT 1 FROM {INDEX_TABLE} LIMIT 1")).first()
+        except Exception as e:
+            logger.warning(f"FTS5不可用，搜索使用LIKE查询: {str(e)}")
+            return
+
+        _enabled = True
+        if not HAS_PYPINYIN:
+            logger.warning("未安装pypinyin，拼音搜索不可用（pip install pypinyin 后执行 flask search rebuild）")
+        if not exists:
+            try:
+                rebuild()
+            except Exception as e:
+                _enabled = False
+                logger.error(f"构建搜索索引失败，搜索使用LIKE查询: {str(e)}")
+
+
+def rebuild():
+    """全量重建搜索索引"""
+    with db.engine.begin() as connection:
+        connection.execute(text(f"DELETE FROM {INDEX_TABLE}"))
+
+        # 跳过无法加载的城市（如模型未定义的层级）
+        rows = [_city_row(city) for city in City.loadable().yield_per(1000)]
+        skipped = db.session.query(db.func.count(City.id)).scalar() - len(rows)
+        if skipped:
+            logger.warning(f"搜索索引跳过 {skipped} 个无法加载的城市")
+        rows.extend(_area_row(area) for area in BusinessArea.query.yield_per(1000))
+        for i in range(0, len(rows), 1000):
+            connection.execute(_INSERT_SQL, rows[i:i + 1000])
+
+    logger.info(f"搜索索引重建完成，共 {len(rows)} 条")
+    return len(rows)
+
+
+def _distance_km(lng1, lat1, lng2, lat2):
+    """等距圆柱投影近似距离（公里），城市范围内误差可忽略"""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * 6371.0
+
+
+def search(entity_type, keyword, city_id=None, category=None,
+           longitude=None, latitude=None, limit=20, weights=None):
+    """
+    搜索并按综合得分排序，返回 [(entity_id, score, distance_km)]
+
+    得分 = 文本相关度(bm25) * text + 热度 * hot - 距离(公里) * distance
+    """
+    match = build_match_query(keyword)
+    if not match:
+        return []
+
+    weights = weights or {}
+    text_weight = weights.get('text', 1.0)
+    hot_weight = weights.get('hot', 0.02)
+    distance_weight = weights.get('distance', 0.05)
+
+    sql = (
+        f"SELECT entity_id, hot_value, longitude, latitude, bm25({INDEX_TABLE}) AS relevance "
+        f"FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH :match AND entity_type = :entity_type"
+    )
+    params = {'match': match, 'entity_type': entity_type, 'candidates': max(limit * 10, 100)}
+    if city_id:
+        sql += " AND city_id = :city_id"
+        params['city_id'] = city_id
+    if category:
+        sql += " AND category = :category"
+        params['category'] = category
+    # 先按文本相关度取候选集，再在内存中混合热度和距离排序
+    sql += " ORDER BY relevance LIMIT :candidates"
+
+    results = []
+    for entity_id, hot_value, lng, lat, relevance in db.session.execute(text(sql), params):
+        distance = None
+        score = -relevance * text_weight + (hot_value or 0) * hot_weight
+        if longitude is not None and latitude is not None and lng is not None and lat is not None:
+            distance = _distance_km(longitude, latitude, lng, lat)
+            score -= distance * distance_weight
+        results.append((entity_id, score, distance))
+
+    results.sort(key=lambda item: item[1], reverse=True)
+    return results[:limit]
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+店铺分面搜索
+
+按商圈或城市建立内存位图索引：每个维度的每个取值一个位图（Python整数，第 i 位对应范围内第 i 个店铺），
+价格、评分另有区间分桶的位图。
+- 筛选：同一维度多个取值为或（标签为与），不同维度之间为与
+- 分面计数：某维度各取值的位图 & 其他维度筛选结果的位数，选中本维度的取值后其他取值仍有计数，
+  前端筛选面板不再逐项请求数量
+- 索引按范围缓存，店铺数量或最新更新时间变化时重建；分面计数和排序后的匹配ID按
+  (范围, 版本, 筛选签名) 缓存，翻页、重复筛选直接读取
+- 营业中（openNow/openAt）读取店铺的营业时段位图（见 opening_index），签名中包含时段
+"""
+
+import logging
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.labels import Label, StoreLabel
+from app.models.store import Store
+from app.utils import opening_hours, sharding
+from app.utils.fragments import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# 与商圈店铺统计相同的区间
+PRICE_BUCKETS = (('low', None, 50), ('medium', 50, 100), ('high', 100, None))
+RATING_BUCKETS = (('low', None, 3.0), ('medium', 3.0, 4.0), ('high', 4.0, None))
+
+SORTS = {
+    'rating': lambda index: lambda i: (-index.rating[i], index.ids[i]),
+    'price': lambda index: lambda i: (index.price[i], index.ids[i]),
+    'review_count': lambda index: lambda i: (-index.reviews[i], index.ids[i]),
+}
+
+_indexes = LRUCache(maxsize=256)
+_results = LRUCache(maxsize=2048)
+
+
+# 字节取值 → 其中置位的位序号，枚举位图时逐字节查表
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def _pack(positions, size):
+    """位序号 → 位图（先写入字节数组再一次转换为整数，避免逐位构造大整数）"""
+    buffer = bytearray((size + 7) // 8)
+    for i in positions:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class _Index:
+    """一个范围内店铺的位图索引"""
+
+    def __init__(self, rows, tags):
+        self.ids = [row.id for row in rows]
+        self.rating = [row.rating or 0.0 for row in rows]
+        self.price = [row.avg_price or 0.0 for row in rows]
+        self.reviews = [row.review_count or 0 for row in rows]
+        self.hours = [opening_hours.decode(row.opening_bitmap) for row in rows]
+        self.all = (1 << len(rows)) - 1
+        positions = {'category': {}, 'sub_category': {}, 'recommended': {}, 'tags': {}}
+        for i, row in enumerate(rows):
+            self._add(positions, 'category', row.category, i)
+            self._add(positions, 'sub_category', row.sub_category, i)
+            self._add(positions, 'recommended', bool(row.is_recommended), i)
+        position = {store_id: i for i, store_id in enumerate(self.ids)}
+        for store_id, name in tags:
+            self._add(positions, 'tags', name, position[store_id])
+        self.values = {
+            dimension: {value: _pack(items, len(rows)) for value, items in values.items()}
+            for dimension, values in positions.items()
+        }
+        # 区间位图按 (列, 下限, 上限, 是否含上限) 缓存，索引随版本重建，缓存随之失效
+        self._ranges = {}
+        self._open = {}
+        self.buckets = {
+            'price': {name: self.between('price', low, high, upper_open=True) for name, low, high in PRICE_BUCKETS},
+            'rating': {name: self.between('rating', low, high, upper_open=True) for name, low, high in RATING_BUCKETS},
+        }
+
+    @staticmethod
+    def _add(positions, dimension, value, i):
+        if value is not None:
+            positions[dimension].setdefault(value, []).append(i)
+
+    def between(self, column, low, high, upper_open=False):
+        """column 列（price/rating）low <= 值 <= high（upper_open 时不含 high）的位图"""
+        key = (column, low, high, upper_open)
+        bitmap = self._ranges.get(key)
+        if bitmap is None:
+            values = getattr(self, column)
+            bitmap = _pack((
+                i for i, value in enumerate(values)
+                if (low is None or value >= low) and
+                (high is None or (value < high if upper_open else value <= high))
+            ), len(values))
+            self._ranges[key] = bitmap
+        return bitmap
+
+    def open_at(self, when):
+        """when 所在时段营业中的位图（按时段缓存）"""
+        position = opening_hours.bit(when)
+        bitmap = self._open.get(position)
+        if bitmap is None:
+            bitmap = _pack((i for i, hours in enumerate(self.hours) if hours >> position & 1), len(self.hours))
+            self._open[position] = bitmap
+        return bitmap
+
+    def positions(self, bitmap):
+        """位图中置位的位序号（转换为字节后一次遍历）"""
+        data = bitmap.to_bytes((len(self.ids) + 7) // 8, 'little')
+        return [offset * 8 + bit for offset, value in enumerate(data) if value for bit in _BYTE_BITS[value]]
+
+
+# ===== 范围与索引 =====
+
+def _scope(area_id=None, city_id=None):
+    """范围 → (缓存键, 商圈ID列表, 分片上下文)"""
+    if area_id:
+        return ('area', area_id), [area_id], sharding.use_area(area_id)
+    area_ids = [row[0] for row in db.session.query(BusinessArea.id).filter(BusinessArea.city_id == city_id)]
+    return ('city', city_id), area_ids, sharding.use_city(city_id)
+
+
+def _version(area_ids):
+    count, updated_at = db.session.query(func.count(Store.id), func.max(Store.updated_at)) \
+        .filter(Store.business_area_id.in_(area_ids)).one()
+    return count, updated_at.timestamp() if updated_at else 0
+
+
+def _build(area_ids):
+    store_ids = select(Store.id).where(Store.business_area_id.in_(area_ids))
+    rows = (
+        db.session.query(Store.id, Store.category, Store.sub_category, Store.avg_price, Store.rating,
+                         Store.review_count, Store.is_recommended, Store.opening_bitmap)
+        .filter(Store.business_area_id.in_(area_ids))
+        .order_by(Store.id)
+        .all()
+    )
+    links = db.session.query(StoreLabel.store_id, StoreLabel.label_id).filter(StoreLabel.store_id.in_(store_ids)).all()
+    # 标签词典在主库，单独查询名称
+    names = dict(
+        db.session.query(Label.id, Label.name)
+        .filter(Label.kind == 'tag', Label.id.in_({label_id for _, label_id in links}))
+    ) if links else {}
+    return _Index(rows, [(store_id, names[label_id]) for store_id, label_id in links if label_id in names])
+
+
+def _index(key, area_ids):
+    version = _version(area_ids)
+    cached = _indexes.get(key)
+    if cached is not None and cached[0] == version:
+        return version, cached[1]
+    index = _build(area_ids)
+    _indexes.set(key, (version, index))
+    return version, index
+
+
+# ===== 筛选与分面 =====
+
+def _masks(index, filters, now):
+    """各维度的筛选位图（未筛选的维度不出现）"""
+    masks = {}
+    for dimension in ('category', 'sub_category'):
+        if filters.get(dimension):
+            bitmaps = index.values[dimension]
+            mask = 0
+            for value in filters[dimension]:
+                mask |= bitmaps.get(value, 0)
+            masks[dimension] = mask
+    if filters.get('recommended') is not None:
+        masks['recommended'] = index.values['recommended'].get(filters['recommended'], 0)
+    if filters.get('tags'):
+        mask = index.all
+        for name in filters['tags']:
+            mask &= index.values['tags'].get(name, 0)
+        masks['tags'] = mask
+    for dimension in ('price', 'rating'):
+        low, high = filters.get(dimension) or (None, None)
+        if low is not None or high is not None:
+            masks[dimension] = index.between(dimension, low, high)
+    if filters.get('open_now') or filters.get('open_at'):
+        masks['open_now'] = index.open_at(now)
+    return masks
+
+
+def _excluding(index, masks, dimension):
+    result = index.all
+    for name, mask in masks.items():
+        if name != dimension:
+            result &= mask
+    return result
+
+
+def _facets(index, masks, now):
+    limit = current_app.config.get('STORE_FACET_LIMIT', 20)
+    facets = {}
+    for dimension in ('category', 'sub_category', 'tags'):
+        base = _excluding(index, masks, dimension)
+        counts = {value: (bitmap & base).bit_count() for value, bitmap in index.values[dimension].items()}
+        ranked = sorted(((value, count) for value, count in counts.items() if count),
+                        key=lambda item: (-item[1], str(item[0])))
+        facets[dimension] = [{'value': value, 'count': count} for value, count in ranked[:limit]]
+    base = _excluding(index, masks, 'recommended')
+    facets['recommended'] = {str(value).lower(): (bitmap & base).bit_count()
+                             for value, bitmap in index.values['recommended'].items()}
+    for dimension in ('price', 'rating'):
+        base = _excluding(index, masks, dimension)
+        facets[dimension] = {name: (bitmap & base).bit_count() for name, bitmap in index.buckets[dimension].items()}
+    facets['open_now'] = (index.open_at(now) & _excluding(index, masks, 'open_now')).bit_count()
+    return facets
+
+
+def _signature(filters, sort_by, now):
+    return (
+        tuple(sorted(filters.get('category') or ())),
+        tuple(sorted(filters.get('sub_category') or ())),
+        tuple(filters.get('price') or (None, None)),
+        tuple(filters.get('rating') or (None, None)),
+        filters.get('recommended'),
+        tuple(sorted(filters.get('tags') or ())),
+        bool(filters.get('open_now') or filters.get('open_at')),
+        sort_by,
+        # 营业中的分面计数与时段有关
+        (now.weekday(), opening_hours.slot(now)),
+    )
+
+
+def search(area_id=None, city_id=None, filters=None, sort_by='rating', page=1, per_page=20, now=None):
+    """
+    分面搜索商圈（或城市）内的店铺，返回 (当前页店铺, 总数, 分面计数)
+    filters: category/sub_category/tags 为列表，price/rating 为 (最小值, 最大值)，
+    recommended 为 True/False/None，open_now 为布尔值，open_at 为时间（指定时营业中，优先于 open_now）
+    """
+    filters = filters or {}
+    # 指定 open_at 时营业中的筛选和分面计数都按该时间
+    now = filters.get('open_at') or now or datetime.now()
+    sort_by = sort_by if sort_by in SORTS else 'rating'
+    _results.maxsize = current_app.config.get('STORE_SEARCH_CACHE_SIZE', _results.maxsize)
+
+    key, area_ids, shard = _scope(area_id, city_id)
+    if not area_ids:
+        return [], 0, {}
+    with shard:
+        version, index = _index(key, area_ids)
+        result_key = (key, version, _signature(filters, sort_by, now))
+        result = _results.get(result_key)
+        if result is None:
+            masks = _masks(index, filters, now)
+            matched = sorted(index.positions(_excluding(index, masks, None)), key=SORTS[sort_by](index))
+            result = ([index.ids[i] for i in matched], _facets(index, masks, now))
+            _results.set(result_key, result)
+
+        ids, facets = result
+        page_ids = ids[(page - 1) * per_page:page * per_page]
+        stores = {store.id: store for store in Store.query.filter(Store.id.in_(page_ids))} if page_ids else {}
+        return [stores[store_id] for store_id in page_ids if store_id in stores], len(ids), facets
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈店铺统计汇总维护
+
+店铺插入/更新/删除时，在同一事务内按增量更新 area_store_stats，
+商圈详情和统计接口只需读取一行汇总数据，不再对 stores 做多次 COUNT/AVG。
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import event, case, func
+from sqlalchemy.orm.attributes import get_history
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.store import Store
+from app.models.statistics import AreaStoreStats
+from app.utils import sharding
+
+logger = logging.getLogger(__name__)
+
+stats_table = AreaStoreStats.__table__
+
+# 参与统计的店铺字段
+TRACKED_FIELDS = ('business_area_id', 'category', 'rating', 'avg_price', 'is_recommended')
+
+
+def _rating_bucket(rating):
+    if rating >= 4.0:
+        return 'high_rating_count'
+    if rating >= 3.0:
+        return 'medium_rating_count'
+    return 'low_rating_count'
+
+
+def _price_bucket(price):
+    if price >= 100:
+        return 'high_price_count'
+    if price >= 50:
+        return 'medium_price_count'
+    return 'low_price_count'
+
+
+def contribution(values):
+    """单个店铺对汇总各列的贡献"""
+    delta = {'store_count': 1}
+    if values.get('is_recommended'):
+        delta['recommended_count'] = 1
+    if values.get('category') in AreaStoreStats.CATEGORIES:
+        delta[f"{values['category']}_count"] = 1
+
+    rating = values.get('rating')
+    if rating is not None:
+        delta['rating_sum'] = rating
+        delta['rated_count'] = 1
+        delta[_rating_bucket(rating)] = 1
+
+    price = values.get('avg_price')
+    if price is not None:
+        delta['price_sum'] = price
+        delta['priced_count'] = 1
+        delta[_price_bucket(price)] = 1
+    return delta
+
+
+def accumulate(total, values, sign=1):
+    """将单个店铺（字段 -> 值）的贡献累加到 total，批量写入时合并为一次 apply_delta"""
+    for column, value in contribution(values).items():
+        total[column] = total.get(column, 0) + value * sign
+    return total
+
+
+def _current_values(store):
+    return {field: getattr(store, field) for field in TRACKED_FIELDS}
+
+
+def _previous_values(store):
+    values = {}
+    for field in TRACKED_FIELDS:
+        history = get_history(store, field)
+        if history.deleted:
+            values[field] = history.deleted[0]
+        elif history.unchanged:
+            values[field] = history.unchanged[0]
+        else:
+            values[field] = getattr(store, field)
+    return values
+
+
+def apply_delta(connection, business_area_id, delta, sign=1):
+    """将增量累加到商圈汇总行（不存在时创建）"""
+    delta = {column: value * sign for column, value in delta.items() if value}
+    if not business_area_id or not delta:
+        return
+
+    connection = sharding.primary_connection(connection)
+    now = datetime.utcnow()
+    result = connection.execute(
+        stats_table.update()
+        .where(stats_table.c.business_area_id == business_area_id)
+        .values(updated_at=now, **{column: stats_table.c[column] + value for column, value in delta.items()})
+    )
+    if result.rowcount == 0:
+        row = AreaStoreStats.empty(business_area_id)
+        values = {column.name: getattr(row, column.name) for column in stats_table.columns}
+        for column, value in delta.items():
+            values[column] += value
+        values['updated_at'] = now
+        connection.execute(stats_table.insert().values(**values))
+
+
+# ===== 写入时增量维护（与店铺写入处于同一事务）=====
+
+@event.listens_for(Store, 'after_insert')
+def _store_inserted(mapper, connection, target):
+    apply_delta(connection, target.business_area_id, contribution(_current_values(target)))
+
+
+@event.listens_for(Store, 'after_update')
+def _store_updated(mapper, connection, target):
+    old, new = _previous_values(target), _current_values(target)
+    if old == new:
+        return
+    apply_delta(connection, old['business_area_id'], contribution(old), sign=-1)
+    apply_delta(connection, new['business_area_id'], contribution(new))
+
+
+@event.listens_for(Store, 'after_delete')
+def _store_deleted(mapper, connection, target):
+    apply_delta(connection, target.business_area_id, contribution(_previous_values(target)), sign=-1)
+
+
+@event.listens_for(BusinessArea, 'after_delete')
+def _area_deleted(mapper, connection, target):
+    connection.execute(stats_table.delete().where(stats_table.c.business_area_id == target.id))
+
+
+def get_area_with_stats(area_id):
+    """一次主键查询读取商圈及其店铺统计，返回 (area, stats)"""
+    row = (
+        db.session.query(BusinessArea, AreaStoreStats)
+        .outerjoin(AreaStoreStats, AreaStoreStats.business_area_id == BusinessArea.id)
+        .filter(BusinessArea.id == area_id)
+        .populate_existing()
+        .first()
+    )
+    if row is None:
+        return None, None
+    area, stats = row
+    return area, stats or AreaStoreStats.empty(area_id)
+
+
+def rebuild(business_area_id=None):
+    """从 stores 全量（或单个商圈）重建统计汇总，返回重建的商圈数"""
+    def count_if(condition):
+        return func.sum(case((condition, 1), else_=0))
+
+    columns = [
+        Store.business_area_id,
+        func.count(Store.id),
+        count_if(Store.is_recommended.is_(True)),
+        *[count_if(Store.category == category) for category in AreaStoreStats.CATEGORIES],
+        func.coalesce(func.sum(Store.rating), 0.0),
+        func.count(Store.rating),
+        count_if(Store.rating >= 4.0),
+        count_if((Store.rating >= 3.0) & (Store.rating < 4.0)),
+        count_if(Store.rating < 3.0),
+        func.coalesce(func.sum(Store.avg_price), 0.0),
+        func.count(Store.avg_price),
+        count_if(Store.avg_price >= 100),
+        count_if((Store.avg_price >= 50) & (Store.avg_price < 100)),
+        count_if(Store.avg_price < 50),
+    ]
+    names = [
+        'business_area_id', 'store_count', 'recommended_count',
+        *[f'{category}_count' for category in AreaStoreStats.CATEGORIES],
+        'rating_sum', 'rated_count', 'high_rating_count', 'medium_rating_count', 'low_rating_count',
+        'price_sum', 'priced_count', 'high_price_count', 'medium_price_count', 'low_price_count',
+    ]
+
+    def aggregate():
+        query = db.session.query(*columns).group_by(Store.business_area_id)
+        if business_area_id:
+            query = query.filter(Store.business_area_id == business_area_id)
+        return [tuple(row) for row in query.all()]
+
+    delete = stats_table.delete()
+    if business_area_id:
+        delete = delete.where(stats_table.c.business_area_id == business_area_id)
+        with sharding.use_area(business_area_id):
+            results = aggregate()
+    else:
+        # 各分片分别聚合（每个商圈只在一个分片中）
+        results = [row for _, rows in sharding.fan_out(aggregate) for row in rows]
+
+    now = datetime.utcnow()
+    rows = [dict(zip(names, row), updated_at=now) for row in results]
+
+    db.session.execute(delete)
+    if rows:
+        db.session.execute(stats_table.insert(), rows)
+    db.session.commit()
+
+    logger.info(f"商圈店铺统计重建完成，共 {len(rows)} 个商圈")
+    return len(rows)
+
+
+def init_app(app):
+    """已有店铺数据但汇总表为空时（如首次升级）执行一次全量重建"""
+    with app.app_context():
+        try:
+            if not db.session.query(AreaStoreStats.business_area_id).first() \
+                    and any(found for _, found in sharding.fan_out(
+                        lambda: db.session.query(Store.id).first() is not None)):
+                rebuild()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"初始化商圈店铺统计失败: {str(e)}")
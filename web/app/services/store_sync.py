@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商圈店铺差量同步
+
+按店铺ID（爬虫由POI身份生成的稳定ID，即外部POI标识）对比商圈现有店铺和爬取结果：
+- 新出现的店铺批量插入，字段有变化的店铺按变化的字段分组批量更新，未变化的不写
+- 消失的店铺批量删除并写入删除记录（tombstone），只有这些店铺的评价随之删除
+写入量与实际变化成正比，保留的店铺ID不变，评价不受刷新影响。
+城市有商圈边界时按边界归属爬取结果（见 area_boundaries）：归属到其他商圈的店铺记录爬取商圈，
+消失的店铺按爬取商圈判断；所属商圈已有同一POI（其他商圈爬取到的）时不重复写入。
+
+批量语句不经过ORM事件，这里在同一事务内显式维护店铺汇总、标签关联、变更事件、删除记录，
+并标记批次后处理的城市。启用分片时店铺和评价写入商圈所在的分片，其余写入主库。
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import and_, bindparam, or_, select
+
+from app.extensions import db
+from app.models.business_area import BusinessArea
+from app.models.review import StoreReview
+from app.models.store import Store
+from app.services import area_boundaries, delta_sync, labels, outbox, post_crawl, store_stats
+from app.utils import opening_hours, sharding
+
+logger = logging.getLogger(__name__)
+
+stores_table = Store.__table__
+
+# 不参与比较的列
+_SKIPPED = ('id', 'created_at', 'updated_at')
+
+
+def _normalize(store_data):
+    """爬取结果 → {列名: 值}（JSON字段按模型的方式序列化），忽略未知字段"""
+    store = Store(**dict(store_data))
+    keys = [column.name for column in stores_table.columns if column.name not in _SKIPPED]
+    row = {key: getattr(store, key) for key in keys if key in store_data}
+    row['id'] = store_data['id']
+    if 'opening_hours' in row:
+        # 批量语句不经过 opening_index 的ORM事件
+        row['opening_bitmap'] = opening_hours.encode(row['opening_hours'])
+    return row
+
+
+def _uniform(rows):
+    """批量插入要求各行字段一致：缺少的字段取列的默认值"""
+    keys = {key for row in rows for key in row}
+    defaults = {}
+    for key in keys:
+        default = stores_table.c[key].default
+        defaults[key] = default.arg if default is not None and default.is_scalar else None
+    return [{key: row.get(key, defaults[key]) for key in keys} for row in rows]
+
+
+def sync_area_stores(area_id, stores_data):
+    """
+    将商圈店铺同步为 stores_data，不提交事务；
+    返回 {'inserted', 'updated', 'deleted', 'unchanged'} 行数
+    """
+    area = db.session.get(BusinessArea, area_id)
+    incoming = {}
+    for store_data in stores_data:
+        if not store_data.get('id'):
+            continue
+        row = _normalize({**store_data, 'business_area_id': area_id, 'crawl_area_id': None})
+        incoming[row['id']] = row
+
+    # 按边界归属：不在任何边界内的店铺归属本商圈
+    owners = area_boundaries.locate_rows(area.city_id, incoming.values()) if area and incoming else None
+    located = []
+    for row, owner in zip(incoming.values(), owners or ()):
+        if owner is None:
+            continue
+        located.append(row)
+        if owner != area_id:
+            row['business_area_id'], row['crawl_area_id'] = owner, area_id
+
+    connection = db.session.connection()
+    with sharding.use_area(area_id):
+        # 店铺和评价所在的连接（未分片时即主库连接）
+        store_connection = db.session.connection(bind_arguments={'mapper': Store.__mapper__})
+    existing = {
+        row['id']: dict(row) for row in store_connection.execute(
+            select(stores_table).where(or_(
+                and_(stores_table.c.business_area_id == area_id, stores_table.c.crawl_area_id.is_(None)),
+                stores_table.c.crawl_area_id == area_id,
+                stores_table.c.id.in_(list(incoming))
+            ))
+        ).mappings()
+    }
+    duplicated = area_boundaries.duplicates(
+        store_connection, [row for row in located if row['id'] not in existing]
+    )
+
+    now = datetime.utcnow()
+    inserted, updated, deleted = [], [], []
+    unchanged = 0
+    for store_id, new in incoming.items():
+        if store_id in duplicated:
+            unchanged += 1
+            continue
+        old = existing.get(store_id)
+        if old is None:
+            inserted.append({**new, 'created_at': now, 'updated_at': now})
+            continue
+        changes = {key: value for key, value in new.items() if old.get(key) != value}
+        if changes:
+            updated.append((old, {'id': store_id, **changes, 'updated_at': now}))
+        else:
+            unchanged += 1
+    deleted = [old for store_id, old in existing.items()
+               if store_id not in incoming and (old['crawl_area_id'] or old['business_area_id']) == area_id]
+
+    # 批量写入：插入、按变化字段分组更新、删除（先删除消失店铺的评价）
+    if inserted:
+        inserted = _uniform(inserted)
+        store_connection.execute(stores_table.insert(), inserted)
+    groups = {}
+    for _, new in updated:
+        groups.setdefault(tuple(sorted(key for key in new if key != 'id')), []).append(new)
+    for keys, rows in groups.items():
+        store_connection.execute(
+            stores_table.update()
+            .where(stores_table.c.id == bindparam('_id'))
+            .values({key: bindparam(key) for key in keys}),
+            [{'_id': row['id'], **{key: row[key] for key in keys}} for row in rows]
+        )
+    if deleted:
+        gone = [row['id'] for row in deleted]
+        store_connection.execute(StoreReview.__table__.delete().where(StoreReview.__table__.c.store_id.in_(gone)))
+        labels.clear(store_connection, Store, gone)
+        store_connection.execute(stores_table.delete().where(stores_table.c.id.in_(gone)))
+
+    # 标签/设施关联：新店铺和标签/设施有变化的店铺
+    labels.replace(store_connection, Store, inserted + [
+        {**old, **new} for old, new in updated if 'tags' in new or 'facilities' in new
+    ])
+
+    # 店铺汇总：合并为每个商圈一次增量更新
+    deltas = {}
+    for row in inserted:
+        store_stats.accumulate(deltas.setdefault(row['business_area_id'], {}), row)
+    for old, new in updated:
+        merged = {**old, **new}
+        if any(old.get(field) != merged.get(field) for field in store_stats.TRACKED_FIELDS):
+            store_stats.accumulate(deltas.setdefault(old['business_area_id'], {}), old, sign=-1)
+            store_stats.accumulate(deltas.setdefault(merged['business_area_id'], {}), merged)
+    for row in deleted:
+        store_stats.accumulate(deltas.setdefault(row['business_area_id'], {}), row, sign=-1)
+    for business_area_id, delta in deltas.items():
+        store_stats.apply_delta(connection, business_area_id, delta)
+
+    # 移到其他商圈的店铺在原商圈写入删除记录
+    moved = [old for old, new in updated if 'business_area_id' in new]
+    outbox.record_bulk(connection, Store, 'store', inserted, updated, deleted)
+    delta_sync.record_bulk(connection, 'store', [row['id'] for row in inserted + moved], deleted + moved)
+
+    # 批次后处理：本商圈及店铺移出的商圈所在城市
+    if inserted or updated or deleted:
+        moved_from = {old['business_area_id'] for old in moved} - {area_id}
+        city_ids = {area.city_id} if area else set()
+        if moved_from:
+            city_ids |= {row[0] for row in db.session.query(BusinessArea.city_id)
+                         .filter(BusinessArea.id.in_(moved_from))}
+        post_crawl.mark_cities(city_ids)
+
+    result = {'inserted': len(inserted), 'updated': len(updated), 'deleted': len(deleted), 'unchanged': unchanged}
+    logger.info(f"商圈 {area_id} 店铺同步: {result}")
+    return result
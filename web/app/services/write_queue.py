@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 单写线程
+
+SQLite 同一时刻只允许一个写事务，多个爬取线程各自提交时会互相等待锁（或超时报 database is locked）。
+爬取写入通过 run()/submit() 交给唯一的写线程执行：
+- 普通任务在各自的 SAVEPOINT 中执行（不要自行提交），写线程把排队的任务合并为一个事务提交，
+  单个任务失败只回滚它自己的 SAVEPOINT，提交之后才返回结果
+- exclusive 任务（如批次后处理，内部自行提交）单独执行
+读请求不经过写线程，在 WAL 模式下不会被写入阻塞。
+未启用（SQLITE_WRITE_QUEUE=false、非SQLite或内存库）时任务在调用线程内执行并提交。
+任务的返回值应为普通数据（写线程的会话在每批结束后关闭）。
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app
+
+from app.extensions import db
+from app.utils import sqlite
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue()
+_thread = None
+_lock = threading.Lock()
+
+
+class _Job:
+    def __init__(self, func, args, kwargs, exclusive):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.exclusive = exclusive
+        self.future = Future()
+
+    def __call__(self):
+        return self.func(*self.args, **self.kwargs)
+
+
+def is_enabled(app=None):
+    """是否使用单写线程（SQLite文件库且 SQLITE_WRITE_QUEUE 开启）"""
+    app = app or current_app
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    return (app.config.get('SQLITE_WRITE_QUEUE', True)
+            and sqlite.is_sqlite(uri) and ':memory:' not in uri)
+
+
+def in_writer():
+    """当前线程是否为写线程"""
+    return _thread is not None and threading.current_thread() is _thread
+
+
+def _ensure_started(app):
+    global _thread
+
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_worker, args=(app,), name='sqlite-writer', daemon=True)
+            _thread.start()
+
+
+def submit(func, *args, exclusive=False, **kwargs):
+    """提交写任务，返回 Future（提交后才有结果）"""
+    job = _Job(func, args, kwargs, exclusive)
+    if not is_enabled() or in_writer():
+        _run_inline(job)
+        return job.future
+
+    _ensure_started(current_app._get_current_object())
+    _queue.put(job)
+    return job.future
+
+
+def run(func, *args, exclusive=False, **kwargs):
+    """执行写任务并等待提交完成，返回任务结果（失败时抛出任务的异常）"""
+    return submit(func, *args, exclusive=exclusive, **kwargs).result()
+
+
+# ===== 执行 =====
+
+def _run_inline(job):
+    try:
+        result = job()
+        if not job.exclusive:
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job.future.set_exception(e)
+        return
+    job.future.set_result(result)
+
+
+def _collect(first, app):
+    """从队列中取出可与 first 合并提交的任务（最多再等待 SQLITE_WRITE_BATCH_WINDOW 毫秒）"""
+    batch = [first]
+    max_size = app.config.get('SQLITE_WRITE_BATCH_SIZE', 50)
+    deadline = time.monotonic() + app.config.get('SQLITE_WRITE_BATCH_WINDOW', 0) / 1000
+    while len(batch) < max_size:
+        timeout = deadline - time.monotonic()
+        try:
+            job = _queue.get(timeout=timeout) if timeout > 0 else _queue.get_nowait()
+        except queue.Empty:
+            break
+        if job.exclusive:
+            return batch, job
+        batch.append(job)
+    return batch, None
+
+
+def _run_batch(batch):
+    results = []
+    for job in batch:
+        try:
+            with db.session.begin_nested():
+                results.append((job, job(), None))
+        except Exception as e:
+            results.append((job, None, e))
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"写线程提交 {len(batch)} 个任务失败: {str(e)}")
+        for job in batch:
+            job.future.set_exception(e)
+        return
+
+    for job, result, error in results:
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+
+def _worker(app):
+    pending = None
+    while True:
+        job = pending or _queue.get()
+        pending = None
+        with app.app_context(), sqlite.immediate():
+            if job.exclusive:
+                _run_inline(job)
+                continue
+            batch, pending = _collect(job, app)
+            _run_batch(batch)
+            if len(batch) > 1:
+                logger.debug(f"写线程合并提交 {len(batch)} 个任务")
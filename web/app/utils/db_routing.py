@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+读写分离（主库 + 只读副本）
+
+SQLALCHEMY_REPLICA_URIS 中的副本注册为 replica_0、replica_1 ... 等bind，会话按语句选择引擎：
+- REPLICA_BLUEPRINTS 中蓝图的 GET/HEAD 请求，其 SELECT 查询读副本（同一会话固定一个副本）
+- 写语句、flush、非SELECT语句、请求之外（后台线程、命令行）一律使用主库
+- 读己之写：本请求内发生过写入后，之后的查询都读主库；primary() 块内强制读主库
+- 副本延迟：比较副本与主库的发件箱事件ID，副本尚未同步的最早事件的时间即为延迟，
+  每 REPLICA_LAG_CHECK_INTERVAL 秒检查一次；延迟超过 REPLICA_MAX_LAG_SECONDS 或连接失败的副本不使用，
+  没有可用副本时读主库
+- 启用店铺分片时，分片表上的语句由 sharding 选择分片（分片不使用副本）
+"""
+
+import contextlib
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, func, select
+
+from app.utils import sharding, sqlite
+
+logger = logging.getLogger(__name__)
+
+REPLICA_PREFIX = 'replica_'
+
+_READS = (sa.Select, sa.CompoundSelect)
+
+_lags = {}  # 副本bind -> 延迟秒数（None 表示不可用）
+_checked_at = None
+_check_lock = threading.Lock()
+
+
+def replica_binds(config):
+    """由 SQLALCHEMY_REPLICA_URIS 生成副本的bind配置"""
+    binds = {}
+    for index, uri in enumerate(config.get('SQLALCHEMY_REPLICA_URIS') or []):
+        options = sqlite.engine_options(config) if sqlite.is_sqlite(uri) \
+            else dict(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        binds[f'{REPLICA_PREFIX}{index}'] = {'url': uri, **options}
+    return binds
+
+
+def replica_keys(engines):
+    return [key for key in engines if isinstance(key, str) and key.startswith(REPLICA_PREFIX)]
+
+
+# ===== 路由状态（保存在应用上下文中） =====
+
+@contextlib.contextmanager
+def primary():
+    """块内的查询都读主库（先读后写、需要最新数据的场景）"""
+    previous = g.get('db_primary', False)
+    g.db_primary = True
+    try:
+        yield
+    finally:
+        g.db_primary = previous
+
+
+def mark_written():
+    """记录本请求已写入，之后的查询读主库"""
+    if has_app_context():
+        g.db_wrote = True
+
+
+def current():
+    """当前上下文的路由状态（批量查询的工作线程沿用调用方的状态）"""
+    return {'db_primary': g.get('db_primary', False), 'db_wrote': g.get('db_wrote', False)}
+
+
+def bind(state):
+    for key, value in state.items():
+        setattr(g, key, value)
+
+
+def _routable():
+    if not has_request_context() or g.get('db_primary') or g.get('db_wrote'):
+        return False
+    return (request.method in ('GET', 'HEAD')
+            and request.blueprint in current_app.config.get('REPLICA_BLUEPRINTS', ()))
+
+
+# ===== 副本延迟 =====
+
+def _measure(engines):
+    from app.models.outbox import OutboxEvent
+
+    events = OutboxEvent.__table__
+    lags = {}
+    for key in replica_keys(engines):
+        try:
+            with engines[key].connect() as connection:
+                applied = connection.execute(select(func.max(events.c.id))).scalar() or 0
+            with engines[None].connect() as connection:
+                oldest = connection.execute(
+                    select(events.c.created_at).where(events.c.id > applied).order_by(events.c.id).limit(1)
+                ).scalar()
+            lags[key] = max((datetime.utcnow() - oldest).total_seconds(), 0.0) if oldest else 0.0
+        except Exception as e:
+            logger.warning(f"只读副本 {key} 不可用: {str(e)}")
+            lags[key] = None
+    return lags
+
+
+def replica_lags(engines):
+    """各副本的延迟秒数（不可用为 None），超过检查间隔时由一个线程重新检查，其他线程使用上次结果"""
+    global _lags, _checked_at
+
+    interval = current_app.config.get('REPLICA_LAG_CHECK_INTERVAL', 5)
+    if _checked_at is not None and time.monotonic() - _checked_at < interval:
+        return _lags
+    # 首次检查时等待结果，之后检查中的线程不阻塞其他请求
+    if not _check_lock.acquire(blocking=_checked_at is None):
+        return _lags
+    try:
+        if _checked_at is None or time.monotonic() - _checked_at >= interval:
+            _lags = _measure(engines)
+            _checked_at = time.monotonic()
+    finally:
+        _check_lock.release()
+    return _lags
+
+
+def available_replicas(engines):
+    """延迟在 REPLICA_MAX_LAG_SECONDS 以内的副本"""
+    max_lag = current_app.config.get('REPLICA_MAX_LAG_SECONDS', 10)
+    return [key for key, lag in replica_lags(engines).items() if lag is not None and lag <= max_lag]
+
+
+def status(engines):
+    """副本状态，供健康检查输出"""
+    return {key: {'lag_seconds': lag, 'available': lag is not None
+                  and lag <= current_app.config.get('REPLICA_MAX_LAG_SECONDS', 10)}
+            for key, lag in replica_lags(engines).items()}
+
+
+# ===== 会话 =====
+
+class RoutingSession(Session):
+    """按语句类型和请求选择主库或只读副本的会话"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        engines = self._db.engines
+        if bind is None and sharding.is_sharded(engines) and sharding.touches_sharded(mapper, clause):
+            if self._flushing or isinstance(clause, sa.UpdateBase):
+                mark_written()
+            return sharding.engine(engines)
+        if bind is not None or engine is not engines.get(None) or not replica_keys(engines):
+            return engine
+        if isinstance(clause, sa.UpdateBase):
+            mark_written()
+            return engine
+        if self._flushing or not isinstance(clause, _READS) or not _routable():
+            return engine
+
+        # 同一会话固定读一个副本，避免前后查询看到不同的同步进度
+        key = self.info.get('replica')
+        if key is None:
+            candidates = available_replicas(engines)
+            if not candidates:
+                return engine
+            key = self.info['replica'] = random.choice(candidates)
+        return engines[key]
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    mark_written()
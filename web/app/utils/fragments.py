@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预编码JSON片段缓存
+
+商圈卡片、城市记录在两次爬取之间不会变化，这里按 (实体, ID, 更新时间) 缓存
+它们编码后的JSON字节，响应时直接拼接，避免重复执行 to_dict 和编码。
+"""
+
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class LRUCache:
+    """线程安全的LRU缓存"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def discard_prefix(self, prefix):
+        """删除以指定前缀开头的所有键（元组键按前几个元素比较）"""
+        with self._lock:
+            if isinstance(prefix, tuple):
+                stale = [key for key in self._data
+                         if isinstance(key, tuple) and key[:len(prefix)] == prefix]
+            else:
+                stale = [key for key in self._data if str(key).startswith(prefix)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# 全局片段缓存（容量在首次使用时按配置调整）
+fragment_cache = LRUCache(maxsize=20000)
+
+
+def _version(entity):
+    """实体版本号：更新时间戳"""
+    updated_at = getattr(entity, 'updated_at', None)
+    return updated_at.timestamp() if updated_at else 0
+
+
+def _sync_capacity():
+    try:
+        fragment_cache.maxsize = current_app.config.get('FRAGMENT_CACHE_SIZE', fragment_cache.maxsize)
+    except RuntimeError:
+        # 没有应用上下文时保持默认容量
+        pass
+
+
+def entity_fragment(kind, entity, to_dict=None):
+    """获取实体的预编码JSON片段，未命中时编码并缓存"""
+    from app.utils.response import dumps, make_fragment
+
+    key = (kind, entity.id, _version(entity))
+    raw = fragment_cache.get(key)
+    if raw is None:
+        _sync_capacity()
+        raw = dumps(to_dict(entity) if to_dict else entity.to_dict())
+        fragment_cache.set(key, raw)
+    return make_fragment(raw)
+
+
+def area_card_fragment(area):
+    """商圈卡片片段（BusinessArea.to_dict）"""
+    return entity_fragment('area', area)
+
+
+def city_fragment(city):
+    """城市记录片段（City.to_dict）"""
+    return entity_fragment('city', city)
+
+
+def invalidate_entity(kind, entity_id):
+    """使某个实体的所有版本片段失效"""
+    return fragment_cache.discard_prefix((kind, entity_id))
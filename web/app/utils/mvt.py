@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mapbox Vector Tile 编码
+
+只需要输出点要素，这里直接按 vector_tile.proto 编码 protobuf，不依赖第三方库。
+坐标为瓦片内的整数像素坐标（0 ~ extent），即按瓦片分辨率量化。
+"""
+
+import struct
+
+DEFAULT_EXTENT = 4096
+
+# 几何类型
+POINT = 1
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _varint_field(field, value):
+    return _key(field, 0) + _varint(value)
+
+
+def _packed(field, values):
+    return _bytes_field(field, b''.join(_varint(value) for value in values))
+
+
+def _value(value):
+    """编码 Value 消息（字符串/布尔/整数/浮点）"""
+    if isinstance(value, bool):
+        return _varint_field(7, int(value))
+    if isinstance(value, int):
+        return _key(6, 0) + _varint(_zigzag(value)) if value < 0 else _varint_field(5, value)
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack('<d', value)
+    return _bytes_field(1, str(value).encode('utf-8'))
+
+
+def encode_layer(name, features, extent=DEFAULT_EXTENT):
+    """
+    编码一个点图层；features 为 [(px, py, {属性: 值})]，px/py 为瓦片内像素坐标，
+    值为 None 的属性不输出。
+    """
+    keys, values = {}, {}
+    body = bytearray()
+    for feature_id, (px, py, properties) in enumerate(features, 1):
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value).__name__, value), len(values)))
+        geometry = [(1 & 0x7) | (1 << 3), _zigzag(int(px)), _zigzag(int(py))]
+        feature = (_varint_field(1, feature_id) + _packed(2, tags)
+                   + _varint_field(3, POINT) + _packed(4, geometry))
+        body += _bytes_field(2, feature)
+
+    layer = _varint_field(15, 2) + _bytes_field(1, name.encode('utf-8')) + bytes(body)
+    layer += b''.join(_bytes_field(3, key.encode('utf-8')) for key in keys)
+    layer += b''.join(_bytes_field(4, _value(value)) for _, value in values)
+    layer += _varint_field(5, extent)
+    return _bytes_field(3, layer)
+
+
+def encode(layers, extent=DEFAULT_EXTENT):
+    """编码瓦片；layers 为 {图层名: features}"""
+    return b''.join(encode_layer(name, features, extent) for name, features in layers.items())
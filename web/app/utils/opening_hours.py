@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+营业时间解析
+
+opening_hours 为爬取到的文本，解析为一周的营业时段位图：7天 × 每天96个15分钟时段，
+第 (星期 × 96 + 时段) 位为1表示营业（星期一为0），按小端序保存为84字节。支持的写法：
+- "10:00-22:00"、"09:00-14:00,17:00-21:30"、"10：00~22：00"
+- 跨夜 "18:00-02:00"、"18:00-次日02:00"（延续到第二天，周日延续到周一）
+- "24小时营业"、"全天"
+- 星期："周一至周五 09:00-18:00 周六、周日 10:00-22:00"、"工作日"、"周末"、"每天"
+- 休息日："10:00-22:00（周二休息）"、"周二休息 10:00-22:00"、"周一休息，10:00-22:00"
+没有星期的时间段适用于每天；无法识别的文本视为未知（位图为空，不算营业中）。
+"""
+
+import re
+
+# 每天的时段数（15分钟一个时段）
+SLOTS_PER_DAY = 96
+WEEK_SLOTS = 7 * SLOTS_PER_DAY
+BITMAP_BYTES = WEEK_SLOTS // 8
+
+_ALL_DAYS = frozenset(range(7))
+_DAY_NAMES = {'一': 0, '二': 1, '三': 2, '四': 3, '五': 4, '六': 5, '日': 6, '天': 6, '七': 6}
+_KEYWORDS = {
+    '工作日': frozenset(range(5)),
+    '周末': frozenset((5, 6)),
+    '双休日': frozenset((5, 6)),
+    '每天': _ALL_DAYS,
+    '每日': _ALL_DAYS,
+    '全周': _ALL_DAYS,
+}
+
+_DAY = r'(?:周|星期|礼拜)'
+_TOKEN = re.compile(
+    rf'(?P<range>{_DAY}(?P<first>[一二三四五六日天七])\s*[至到\-~—–]\s*{_DAY}?(?P<last>[一二三四五六日天七]))'
+    rf'|(?P<day>{_DAY}(?P<single>[一二三四五六日天七]))'
+    r'|(?P<keyword>工作日|周末|双休日|每天|每日|全周)'
+    r'|(?P<time>(?P<h1>\d{1,2})[:：](?P<m1>\d{2})\s*[-~至到—–]\s*(?P<next>次日)?\s*(?P<h2>\d{1,2})[:：](?P<m2>\d{2}))'
+    r'|(?P<all_day>24小时|全天)'
+    r'|(?P<closed>休息|闭店|不营业|歇业|休业|公休)'
+)
+
+
+def _day_range(first, last):
+    days = set()
+    day = first
+    while True:
+        days.add(day)
+        if day == last:
+            return days
+        day = (day + 1) % 7
+
+
+def _token_days(match):
+    if match.group('range'):
+        return _day_range(_DAY_NAMES[match.group('first')], _DAY_NAMES[match.group('last')])
+    if match.group('day'):
+        return {_DAY_NAMES[match.group('single')]}
+    return set(_KEYWORDS[match.group('keyword')])
+
+
+def _intervals(text):
+    """文本 → ([(星期, 开始分钟, 结束分钟)], 休息日)，结束分钟可超过1440（跨夜）；无法识别时返回 None"""
+    intervals = []
+    closed = set()
+    days = None
+    after_hours = False  # 上一个词是时间段或休息，之后的星期开始新的一组
+    recognized = False
+    for match in _TOKEN.finditer(text):
+        if match.group('range') or match.group('day') or match.group('keyword'):
+            found = _token_days(match)
+            days = found if after_hours or days is None else days | found
+            after_hours = False
+            continue
+
+        recognized = True
+        if match.group('closed'):
+            if days is not None:
+                closed |= days
+            # 休息日之后的时间段适用于其余各天（如 "周二休息 10:00-22:00"）
+            days = None
+        elif match.group('all_day'):
+            intervals.extend((day, 0, 24 * 60) for day in (days or _ALL_DAYS))
+        else:
+            start = int(match.group('h1')) * 60 + int(match.group('m1'))
+            end = int(match.group('h2')) * 60 + int(match.group('m2'))
+            if start >= 24 * 60 or end > 24 * 60:
+                continue
+            if match.group('next') or end <= start:
+                end += 24 * 60
+            intervals.extend((day, start, end) for day in (days or _ALL_DAYS))
+        after_hours = True
+    if not recognized:
+        return None
+    return intervals, closed
+
+
+def parse(text):
+    """营业时间文本 → 一周时段位图（整数），无法识别时返回 None"""
+    if not text:
+        return None
+    parsed = _intervals(text)
+    if parsed is None:
+        return None
+    intervals, closed = parsed
+    bitmap = 0
+    for day, start, end in intervals:
+        if day in closed:
+            continue
+        for slot in range(start // 15, -(-end // 15)):
+            bitmap |= 1 << ((day * SLOTS_PER_DAY + slot) % WEEK_SLOTS)
+    return bitmap
+
+
+def encode(text):
+    """营业时间文本 → 84字节位图（保存到 opening_bitmap 列），无法识别时返回 None"""
+    bitmap = parse(text)
+    return bitmap.to_bytes(BITMAP_BYTES, 'little') if bitmap is not None else None
+
+
+def decode(value):
+    """opening_bitmap 列的值 → 整数位图（空为0）"""
+    return int.from_bytes(value, 'little') if value else 0
+
+
+def slot(when):
+    """时间所在的时段（0-95）"""
+    return (when.hour * 60 + when.minute) // 15
+
+
+def bit(when):
+    """时间在一周位图中的位置"""
+    return when.weekday() * SLOTS_PER_DAY + slot(when)
+
+
+def test_bit(value, position):
+    """位图（字节）的第 position 位是否为1，供 SQLite 自定义函数 open_at 使用"""
+    if not value or position is None or not 0 <= position < WEEK_SLOTS:
+        return 0
+    return (value[position >> 3] >> (position & 7)) & 1
+
+
+def is_open(text, when):
+    """when 时是否在营业时间内"""
+    return bool((parse(text) or 0) >> bit(when) & 1)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求级查找缓存
+
+同一请求内多处用到的查找结果（城市记录、城市汇总、指标趋势等）只计算一次。
+批量查询接口让并发执行子查询的各线程共享同一个缓存，相同的键只由一个线程计算，
+其他线程等待结果。缓存值应为普通数据（不要放ORM对象，各线程使用各自的会话）。
+"""
+
+import threading
+
+from flask import g, has_app_context
+
+
+class RequestCache:
+    """线程安全的请求级缓存，同一个键并发请求时只计算一次"""
+
+    def __init__(self):
+        self._values = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, loader):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._values:
+                self._values[key] = loader()
+            return self._values[key]
+
+    def __len__(self):
+        return len(self._values)
+
+
+def current():
+    """当前请求的缓存（没有时创建）"""
+    cache = g.get('request_cache')
+    if cache is None:
+        cache = g.request_cache = RequestCache()
+    return cache
+
+
+def bind(cache):
+    """让当前应用上下文使用指定的缓存（批量查询的工作线程共享调用方的缓存）"""
+    g.request_cache = cache
+
+
+def memoize(key, loader):
+    """读取请求级缓存，未命中时调用 loader；不在应用上下文中时直接调用"""
+    if not has_app_context():
+        return loader()
+    return current().get_or_compute(key, loader)
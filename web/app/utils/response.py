@@ -4,38 +4,259 @@
 统一响应格式工具
 """
 
-from flask import jsonify
-from datetime import datetime
+import gzip
+import json
+from datetime import datetime, date
+from decimal import Decimal
 
-def success_response(data=None, message='success', code=200):
-    """成功响应"""
-    response = {
+from flask import current_app, g, request
+
+# 优先使用orjson编码（需支持 orjson.Fragment 以拼接预编码片段），否则回退到标准库json
+try:
+    import orjson
+    HAS_ORJSON = hasattr(orjson, 'Fragment')
+except ImportError:
+    HAS_ORJSON = False
+
+# brotli为可选依赖，未安装时只提供gzip压缩
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# msgpack为可选依赖，未安装时不提供 MessagePack 格式
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+# 响应格式及其MIME类型（columnar/msgpack 中的对象数组按列存储）
+MIMETYPES = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.columnar+json',
+    'msgpack': 'application/x-msgpack',
+    'mvt': 'application/vnd.mapbox-vector-tile',
+}
+
+# 默认可协商的格式（MVT 只用于瓦片接口）
+ROW_FORMATS = ('json', 'columnar', 'msgpack')
+
+# 列式格式中坐标量化为整数：值 × COORD_SCALE 取整（10^-5 度，约1米）
+COORD_SCALE = 100000
+QUANTIZED_FIELDS = ('longitude', 'latitude')
+
+
+class JSONFragment:
+    """已编码的JSON片段（标准库json回退路径使用）"""
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+
+def make_fragment(raw):
+    """将已编码的JSON字节包装为可拼接片段"""
+    if HAS_ORJSON:
+        return orjson.Fragment(raw)
+    return JSONFragment(raw)
+
+
+def _default(obj):
+    """处理json无法直接编码的类型"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8')
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _use_fast_encoder():
+    try:
+        return HAS_ORJSON and current_app.config.get('JSON_FAST_ENCODER', True)
+    except RuntimeError:
+        return HAS_ORJSON
+
+
+def dumps(obj):
+    """将对象编码为JSON字节，支持拼接预编码片段"""
+    if _use_fast_encoder():
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    # 标准库路径：先用占位符替换片段，编码后再替换回原始字节
+    fragments = []
+
+    def default(o):
+        if isinstance(o, JSONFragment):
+            fragments.append(o.raw)
+            return f'\x00frag{len(fragments) - 1}\x00'
+        if HAS_ORJSON and isinstance(o, orjson.Fragment):
+            # 配置关闭了快速编码器，但片段由orjson创建
+            fragments.append(orjson.dumps(o))
+            return f'\x00frag{len(fragments) - 1}\x00'
+        return _default(o)
+
+    body = json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default).encode('utf-8')
+    for index, raw in enumerate(fragments):
+        body = body.replace(f'"\\u0000frag{index}\\u0000"'.encode('utf-8'), raw, 1)
+    return body
+
+
+def _available(fmt):
+    return fmt in MIMETYPES and (fmt != 'msgpack' or HAS_MSGPACK)
+
+
+def response_format(allowed=ROW_FORMATS):
+    """
+    按 ?format= 参数或 Accept 头选择响应格式；
+    显式指定了不支持的格式时返回 None（调用方返回406），Accept 头无法满足时回退到JSON。
+    """
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt if fmt in allowed and _available(fmt) else None
+
+    g.format_negotiated = True
+    candidates = [MIMETYPES[name] for name in allowed if _available(name)]
+    best = request.accept_mimetypes.best_match(candidates, default=MIMETYPES['json'])
+    return next((name for name in allowed if MIMETYPES[name] == best), 'json')
+
+
+def columnar(rows, quantize=QUANTIZED_FIELDS):
+    """
+    对象数组 → 列式结构 {'length': n, 'columns': {字段: [值, ...]}, 'scale': {字段: 倍数}}；
+    坐标字段量化为整数，行中缺少的字段为 null。
+    """
+    fields = {}
+    for row in rows:
+        for key in row:
+            fields.setdefault(key, None)
+    columns = {key: [row.get(key) for row in rows] for key in fields}
+
+    scale = {}
+    for key in quantize:
+        if key in columns:
+            columns[key] = [round(value * COORD_SCALE) if value is not None else None for value in columns[key]]
+            scale[key] = COORD_SCALE
+    return {'length': len(rows), 'columns': columns, 'scale': scale}
+
+
+def compact_rows(rows, fmt):
+    """按响应格式转换对象数组（JSON 保持原样，其余转为列式）"""
+    return rows if fmt == 'json' else columnar(rows)
+
+
+def _encode(payload, fmt):
+    if isinstance(payload, bytes):
+        return payload
+    if fmt == 'msgpack':
+        return msgpack.packb(payload, default=_default, use_bin_type=True)
+    return dumps(payload)
+
+
+def accepted_encoding():
+    """根据 Accept-Encoding 选择压缩算法"""
+    try:
+        accept = request.headers.get('Accept-Encoding', '')
+    except RuntimeError:
+        return None
+    if HAS_BROTLI and 'br' in accept:
+        return 'br'
+    if 'gzip' in accept:
+        return 'gzip'
+    return None
+
+
+def _compress(body, encoding):
+    level = current_app.config.get('RESPONSE_COMPRESSION_LEVEL', 6)
+    if encoding == 'br':
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=level)
+
+
+def precompress(raw):
+    """离线预压缩（最高压缩级别），返回 {编码: 字节}"""
+    encoded = {'gzip': gzip.compress(raw, compresslevel=9)}
+    if HAS_BROTLI:
+        encoded['br'] = brotli.compress(raw, quality=11)
+    return encoded
+
+
+def precompressed_response(body, etag, encoding=None):
+    """
+    输出预编码/预压缩的JSON响应体（encoding 为 body 的压缩算法），
+    带 ETag，客户端 If-None-Match 匹配时返回304
+    """
+    response = current_app.response_class(mimetype=MIMETYPES['json'])
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+
+    response.set_data(body)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def json_response(payload, status=200, compress=False, fmt='json'):
+    """
+    构建响应（默认JSON，fmt 见 MIMETYPES，payload 为 bytes 时原样输出）；
+    compress 为 True 时按客户端能力压缩大响应体。
+    """
+    encoding = accepted_encoding() if compress else None
+
+    body = _encode(payload, fmt)
+    if encoding and len(body) >= current_app.config.get('RESPONSE_COMPRESSION_MIN_SIZE', 1024):
+        body = _compress(body, encoding)
+    else:
+        encoding = None
+
+    response = current_app.response_class(body, status=status, mimetype=MIMETYPES[fmt])
+    if compress:
+        response.vary.add('Accept-Encoding')
+    if g.get('format_negotiated'):
+        response.vary.add('Accept')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _envelope(data, message, code):
+    return {
         'code': code,
         'message': message,
         'data': data,
         'timestamp': int(datetime.now().timestamp())
     }
-    return jsonify(response), 200
+
+
+def success_response(data=None, message='success', code=200, compress=False, fmt='json'):
+    """成功响应（fmt 非 JSON 时，data 中的对象数组应先经 compact_rows 转换）"""
+    return json_response(_envelope(data, message, code), 200, compress=compress, fmt=fmt)
+
 
 def error_response(message='error', code=400, data=None):
     """错误响应"""
-    response = {
-        'code': code,
-        'message': message,
-        'data': data,
-        'timestamp': int(datetime.now().timestamp())
-    }
-    return jsonify(response), code
+    return json_response(_envelope(data, message, code), code)
+
 
-def paginated_response(items, total, page, per_page, message='success'):
-    """分页响应"""
+def paginated_response(items, total, page, per_page, message='success', compress=False, fmt='json', cursor=None,
+                       extra=None):
+    """分页响应（fmt 非 JSON 时列表转为列式；cursor 为之后获取增量的同步游标；extra 合并到 data 中）"""
     total_pages = (total + per_page - 1) // per_page
-    
+
     response = {
         'code': 200,
         'message': message,
         'data': {
-            'list': items,
+            'list': compact_rows(items, fmt),
             'total': total,
             'page': page,
             'pageSize': per_page,
@@ -45,4 +266,8 @@ def paginated_response(items, total, page, per_page, message='success'):
         },
         'timestamp': int(datetime.now().timestamp())
     }
-    return jsonify(response), 200
+    if cursor is not None:
+        response['data']['cursor'] = cursor
+    if extra:
+        response['data'].update(extra)
+    return json_response(response, 200, compress=compress, fmt=fmt)
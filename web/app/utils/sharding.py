@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+店铺数据按城市分片（可选）
+
+配置 SHARD_DATABASE_URIS（{分片名: URI}）后，stores、store_reviews、store_labels 等店铺级的表按城市（SHARD_BY=city）
+或省份（SHARD_BY=province）存放在各分片库中（bind 为 shard_<分片名>），其余表仍在主库：
+- 分片映射：SHARD_MAP 显式指定 {城市或省份ID: 分片名}，未指定的按ID的 crc32 哈希到分片
+- 路由：use()/use_city()/use_area() 块内，分片表上的语句使用该分片的引擎；请求中按路径参数
+  city_id/area_id 或查询参数 areaId/cityId 自动选择分片。未选择分片时访问分片表抛出 ShardError，
+  分片表与主库表联表同样抛出 ShardError
+- 商圈所属城市从主库查询并缓存（商圈不会移到其他城市）
+- 跨分片查询：fan_out() 在线程池中对每个分片并行执行，返回各分片的结果由调用方合并；
+  scan() 依次在每个分片上执行查询并逐行产出
+- 分片表上的ORM事件写主库的表（店铺汇总、变更事件、删除记录）时，通过 primary_connection()
+  使用同一会话的主库连接；主库与分片分别提交，不是跨库原子事务
+"""
+
+import contextlib
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import MetaData, select
+from sqlalchemy.sql.util import find_tables
+
+from app.utils import sqlite
+
+SHARD_PREFIX = 'shard_'
+
+SHARDED_TABLES = frozenset(('stores', 'store_reviews', 'store_labels'))
+
+_area_cities = {}
+_area_lock = threading.Lock()
+
+
+class ShardError(RuntimeError):
+    """未选择分片，或分片表与主库表联表"""
+
+
+def _db():
+    return current_app.extensions['sqlalchemy']
+
+
+def shard_binds(config):
+    """由 SHARD_DATABASE_URIS 生成分片的bind配置"""
+    binds = {}
+    for name, uri in (config.get('SHARD_DATABASE_URIS') or {}).items():
+        options = sqlite.engine_options(config) if sqlite.is_sqlite(uri) \
+            else dict(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        binds[f'{SHARD_PREFIX}{name}'] = {'url': uri, **options}
+    return binds
+
+
+def is_sharded(engines):
+    """引擎中是否配置了分片"""
+    return any(isinstance(key, str) and key.startswith(SHARD_PREFIX) for key in engines)
+
+
+def is_enabled():
+    return has_app_context() and bool(current_app.config.get('SHARD_DATABASE_URIS'))
+
+
+def shard_names():
+    return sorted(current_app.config.get('SHARD_DATABASE_URIS') or {})
+
+
+# ===== 分片解析 =====
+
+def _province_of(city_id):
+    from app.services import reference_data
+
+    records = reference_data.get_snapshot().records
+    record = records.get(city_id)
+    while record is not None and record.get('level') != 'province' and record.get('parent_id'):
+        record = records.get(record['parent_id'])
+    return record['id'] if record is not None and record.get('level') == 'province' else city_id
+
+
+def shard_for_city(city_id):
+    """城市所在的分片名"""
+    key = _province_of(city_id) if current_app.config.get('SHARD_BY', 'city') == 'province' else city_id
+    shard_map = current_app.config.get('SHARD_MAP') or {}
+    if key in shard_map:
+        return shard_map[key]
+    names = shard_names()
+    return names[zlib.crc32(key.encode('utf-8')) % len(names)]
+
+
+def city_of_area(area_id):
+    """商圈所属城市ID（缓存），商圈不存在时返回 None"""
+    city_id = _area_cities.get(area_id)
+    if city_id is None:
+        from app.models.business_area import BusinessArea
+
+        city_id = _db().session.query(BusinessArea.city_id).filter(BusinessArea.id == area_id).scalar()
+        if city_id is not None:
+            with _area_lock:
+                _area_cities[area_id] = city_id
+    return city_id
+
+
+def shard_for_area(area_id):
+    """商圈所在的分片名，商圈不存在时返回 None"""
+    city_id = city_of_area(area_id)
+    return shard_for_city(city_id) if city_id else None
+
+
+# ===== 当前分片（保存在应用上下文中） =====
+
+def current():
+    return g.get('db_shard') if has_app_context() else None
+
+
+@contextlib.contextmanager
+def use(shard):
+    """块内分片表上的语句使用指定分片"""
+    previous = g.get('db_shard')
+    g.db_shard = shard
+    try:
+        yield shard
+    finally:
+        g.db_shard = previous
+
+
+def use_city(city_id):
+    """块内使用城市所在的分片（未启用分片时不做任何事）"""
+    if not is_enabled() or not city_id:
+        return contextlib.nullcontext(current())
+    return use(shard_for_city(city_id))
+
+
+def use_area(area_id):
+    """块内使用商圈所在的分片（未启用分片时不做任何事）"""
+    if not is_enabled() or not area_id:
+        return contextlib.nullcontext(current())
+    return use(shard_for_area(area_id))
+
+
+def select_request_shard():
+    """请求开始时按路径参数 city_id/area_id 或查询参数 areaId/cityId 选择分片"""
+    if not is_enabled() or not has_request_context():
+        return
+    view_args = request.view_args or {}
+    area_id = view_args.get('area_id') or request.args.get('areaId')
+    city_id = view_args.get('city_id') or request.args.get('cityId') or request.args.get('city_id')
+    if area_id is not None:
+        g.db_shard = shard_for_area(str(area_id))
+    elif city_id:
+        g.db_shard = shard_for_city(city_id)
+
+
+# ===== 会话路由 =====
+
+def touches_sharded(mapper, clause):
+    """语句是否访问分片表；分片表与其他表联表时抛出 ShardError"""
+    tables = set()
+    if mapper is not None:
+        tables.add(mapper.local_table.name)
+    if clause is not None:
+        tables.update(table.name for table in find_tables(clause, include_crud=True)
+                      if hasattr(table, 'name'))
+    sharded = tables & SHARDED_TABLES
+    if sharded and tables - SHARDED_TABLES:
+        raise ShardError(f"分片表不能与主库表联表: {', '.join(sorted(tables))}")
+    return bool(sharded)
+
+
+def engine(engines):
+    """当前分片的引擎"""
+    shard = current()
+    if shard is None:
+        raise ShardError('访问店铺数据前需要选择分片（use_city/use_area）')
+    return engines[f'{SHARD_PREFIX}{shard}']
+
+
+def primary_connection(connection):
+    """分片连接上触发的ORM事件写主库表时，改用同一会话的主库连接"""
+    db = _db()
+    if connection.engine is db.engine:
+        return connection
+    return db.session.connection(bind_arguments={'bind': db.engine})
+
+
+# ===== 跨分片查询 =====
+
+def fan_out(func, *args, **kwargs):
+    """
+    对每个分片并行执行 func(*args, **kwargs)，返回 [(分片名, 结果)]；
+    未启用分片时在当前上下文执行一次，返回 [(None, 结果)]。结果应为普通数据。
+    """
+    if not is_enabled():
+        return [(None, func(*args, **kwargs))]
+
+    from app.utils import db_routing
+
+    app = current_app._get_current_object()
+    routing = db_routing.current()
+
+    def run(shard):
+        with app.app_context():
+            db_routing.bind(routing)
+            with use(shard):
+                return shard, func(*args, **kwargs)
+
+    names = shard_names()
+    with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix='shard-fan-out') as executor:
+        return list(executor.map(run, names))
+
+
+def each_shard():
+    """依次进入每个分片，产出分片名（未启用分片时产出一次 None）"""
+    if not is_enabled():
+        yield None
+        return
+    for shard in shard_names():
+        with use(shard):
+            yield shard
+
+
+def scan(build):
+    """依次在每个分片上执行 build() 返回的查询并逐行产出（未启用分片时直接执行）"""
+    for _ in each_shard():
+        yield from build()
+
+
+# ===== 分片表结构 =====
+
+def shard_metadata(metadata):
+    """分片库的表结构：分片表的副本，去掉指向主库表的外键"""
+    copy = MetaData()
+    for name in sorted(SHARDED_TABLES):
+        table = metadata.tables[name].to_metadata(copy)
+        for constraint in list(table.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.split('.')[0] not in SHARDED_TABLES:
+                table.constraints.discard(constraint)
+                for element in constraint.elements:
+                    table.foreign_keys.discard(element)
+                    element.parent.foreign_keys.discard(element)
+    return copy
+
+
+def migrate_from_primary():
+    """将主库中已有的店铺及其评价、标签关联按商圈复制到所在分片（分片中已有的ID跳过），返回 {分片名: 复制的店铺数}"""
+    from app.models.business_area import BusinessArea
+
+    db = _db()
+    stores = db.metadata.tables['stores']
+    reviews = db.metadata.tables['store_reviews']
+    labels = db.metadata.tables['store_labels']
+    counts = {name: 0 for name in shard_names()}
+    with db.engine.connect() as source:
+        areas = source.execute(select(BusinessArea.__table__.c.id, BusinessArea.__table__.c.city_id)).all()
+        for area_id, city_id in areas:
+            rows = [dict(row) for row in source.execute(
+                select(stores).where(stores.c.business_area_id == area_id)).mappings()]
+            if not rows:
+                continue
+            shard = shard_for_city(city_id)
+            with db.engines[f'{SHARD_PREFIX}{shard}'].begin() as target:
+                ids = [row['id'] for row in rows]
+                existing = set(target.execute(select(stores.c.id).where(stores.c.id.in_(ids))).scalars())
+                rows = [row for row in rows if row['id'] not in existing]
+                if not rows:
+                    continue
+                target.execute(stores.insert(), rows)
+                ids = [row['id'] for row in rows]
+                for table in (reviews, labels):
+                    dependents = [dict(row) for row in source.execute(
+                        select(table).where(table.c.store_id.in_(ids))).mappings()]
+                    if dependents:
+                        target.execute(table.insert(), dependents)
+            counts[shard] += len(rows)
+    return counts
+
+
+def init_app(app):
+    """在各分片库创建分片表，注册请求的分片选择"""
+    if not app.config.get('SHARD_DATABASE_URIS'):
+        return
+
+    db = app.extensions['sqlalchemy']
+    with app.app_context():
+        metadata = shard_metadata(db.metadata)
+        for name in shard_names():
+            metadata.create_all(db.engines[f'{SHARD_PREFIX}{name}'])
+    app.before_request(select_request_shard)
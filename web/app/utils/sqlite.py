@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 生产配置
+
+- 连接池参数：SQLite 是文件库，pool_recycle/pool_pre_ping 无意义，pool_size 交给 SQLAlchemy 默认值
+- 每个新连接执行 SQLITE_PRAGMAS（WAL、synchronous=NORMAL、mmap、busy_timeout、页缓存），
+  并注册自定义函数 open_at（营业时段位图）
+- 单写线程内的事务显式发出 BEGIN IMMEDIATE（关闭 pysqlite 自带的事务处理，SAVEPOINT 才能正常工作），
+  开始事务时即取得写锁，之后的读写都基于最新数据；其他线程保持 pysqlite 默认行为
+  （只在写语句前开始事务），读取不持有快照，不会因读事务升级为写事务而报 database is locked
+"""
+
+import contextlib
+import threading
+
+from sqlalchemy import event
+
+from app.utils import opening_hours
+
+# 对SQLite无意义的连接池参数
+_POOL_ONLY = ('pool_size', 'max_overflow', 'pool_recycle', 'pool_pre_ping', 'pool_timeout')
+
+_local = threading.local()
+
+
+def is_sqlite(uri):
+    """数据库URI是否为SQLite"""
+    return bool(uri) and uri.startswith('sqlite')
+
+
+def engine_options(config):
+    """SQLite 使用的引擎参数（去掉连接池参数，设置锁等待超时）"""
+    options = {key: value for key, value in config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).items()
+               if key not in _POOL_ONLY}
+    connect_args = dict(options.get('connect_args', {}))
+    connect_args.setdefault('timeout', config.get('SQLITE_BUSY_TIMEOUT', 5000) / 1000)
+    options['connect_args'] = connect_args
+    return options
+
+
+@contextlib.contextmanager
+def immediate():
+    """当前线程内开始的事务使用 BEGIN IMMEDIATE（单写线程使用）"""
+    previous = getattr(_local, 'immediate', False)
+    _local.immediate = True
+    try:
+        yield
+    finally:
+        _local.immediate = previous
+
+
+def install(engine, config):
+    """为引擎注册连接初始化（PRAGMA、自定义函数）和写线程的 BEGIN IMMEDIATE"""
+    pragmas = dict(config.get('SQLITE_PRAGMAS', {}))
+    pragmas.setdefault('busy_timeout', config.get('SQLITE_BUSY_TIMEOUT', 5000))
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+        # 营业时段位图的按位判断（见 app/services/opening_index.py）
+        dbapi_connection.create_function('open_at', 2, opening_hours.test_bit, deterministic=True)
+
+    @event.listens_for(engine, 'begin')
+    def _on_begin(connection):
+        dbapi_connection = connection.connection.driver_connection
+        if getattr(_local, 'immediate', False):
+            dbapi_connection.isolation_level = None
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+        elif dbapi_connection.isolation_level is None:
+            # 连接池中的连接可能刚被写线程使用过
+            dbapi_connection.isolation_level = ''
+
+
+def journal_mode(engine):
+    """当前日志模式（wal/delete/memory 等）"""
+    with engine.connect() as connection:
+        return connection.exec_driver_sql('PRAGMA journal_mode').scalar()
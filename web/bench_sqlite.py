@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 并发读写基准
+
+对比两种配置下并发读取与爬取写入的吞吐（与部署方式一致：读请求在各Web工作进程中，
+爬取写入在调度进程的多个线程中）：
+- baseline: 回滚日志（journal_mode=DELETE, synchronous=FULL），各线程自行提交
+- tuned:    WAL + synchronous=NORMAL + mmap + 页缓存，写入经单写线程合并提交
+
+用法: python bench_sqlite.py [--readers 4] [--writers 4] [--seconds 10] [--profile baseline|tuned]
+不指定 --profile 时依次在子进程中运行两种配置并输出对比。
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+PROFILES = {
+    'baseline': {
+        'SQLITE_PRAGMAS': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+        'SQLITE_WRITE_QUEUE': False
+    },
+    'tuned': {}
+}
+
+AREAS = 20
+STORES_PER_WRITE = 10
+
+
+def _create_app(name, db_path):
+    from config.config import Config
+    from app import create_app
+
+    attrs = {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path,
+        'TESTING': True,
+        'SEARCH_INDEX_ENABLED': False,
+        **PROFILES[name]
+    }
+    return create_app(type('BenchConfig', (Config,), attrs))
+
+
+def _reader_process(name, db_path, seconds, start, results):
+    """读进程：按商圈查询店铺列表和商圈详情"""
+    import logging
+    logging.disable(logging.INFO)
+
+    from app.extensions import db
+    from app.models.business_area import BusinessArea
+    from app.models.store import Store
+
+    app = _create_app(name, db_path)
+    latencies = []
+    errors = 0
+    with app.app_context():
+        start.wait()
+        deadline = time.monotonic() + seconds
+        i = 0
+        while time.monotonic() < deadline:
+            began = time.perf_counter()
+            try:
+                area_id = f'bench-{i % AREAS}'
+                Store.query.filter_by(business_area_id=area_id).limit(50).all()
+                db.session.get(BusinessArea, area_id)
+                db.session.rollback()
+                latencies.append(time.perf_counter() - began)
+            except Exception:
+                db.session.rollback()
+                errors += 1
+            i += 1
+    results.put((latencies, errors))
+
+
+def run_profile(name, readers, writers, seconds):
+    """运行一种配置，返回统计结果"""
+    import logging
+    logging.disable(logging.INFO)
+
+    from app.extensions import db
+    from app.models.business_area import BusinessArea
+    from app.models.city import City
+    from app.models.store import Store
+    from app.services import write_queue
+    from app.utils import sqlite
+
+    db_path = tempfile.mktemp(suffix='.db')
+    app = _create_app(name, db_path)
+    with app.app_context():
+        db.session.add(City(id='bench', name='基准城市', code='999999', level='city',
+                            longitude=116.4, latitude=39.9))
+        for i in range(AREAS):
+            db.session.add(BusinessArea(id=f'bench-{i}', name=f'商圈{i}', city_id='bench',
+                                        longitude=116.4 + i * 0.01, latitude=39.9, hot_value=i))
+        db.session.commit()
+        mode = sqlite.journal_mode(db.engine)
+
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=_reader_process, args=(name, db_path, seconds, start, results))
+                 for _ in range(readers)]
+    for process in processes:
+        process.start()
+
+    counts = {'writes': 0, 'write_errors': 0}
+    counts_lock = threading.Lock()
+
+    def insert_stores(area_id):
+        for _ in range(STORES_PER_WRITE):
+            db.session.add(Store(id=uuid.uuid4().hex[:16], name='基准店铺', business_area_id=area_id,
+                                 category='restaurant', longitude=116.4, latitude=39.9, rating=4.0))
+
+    def writer(index, deadline):
+        with app.app_context():
+            i = index
+            while time.monotonic() < deadline:
+                try:
+                    write_queue.run(insert_stores, f'bench-{i % AREAS}')
+                    key = 'writes'
+                except Exception:
+                    key = 'write_errors'
+                with counts_lock:
+                    counts[key] += 1
+                i += 1
+
+    # 读进程完成初始化后同时开始
+    time.sleep(5)
+    start.set()
+    deadline = time.monotonic() + seconds
+    threads = [threading.Thread(target=writer, args=(i, deadline)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies, read_errors = [], 0
+    for _ in processes:
+        process_latencies, errors = results.get()
+        latencies.extend(process_latencies)
+        read_errors += errors
+    latencies.sort()
+    for process in processes:
+        process.join()
+
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    return {
+        'profile': name,
+        'journal_mode': mode,
+        'reads_per_sec': round(len(latencies) / seconds, 1),
+        'read_p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1) if latencies else None,
+        'read_max_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+        'writes_per_sec': round(counts['writes'] / seconds, 1),
+        'read_errors': read_errors,
+        'write_errors': counts['write_errors']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 并发读写基准')
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--profile', choices=list(PROFILES))
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args.profile, args.readers, args.writers, args.seconds)))
+        return
+
+    # 每种配置在独立进程中运行（写线程和引擎都是进程级的）
+    results = []
+    for name in PROFILES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--profile', name, '--readers', str(args.readers),
+             '--writers', str(args.writers), '--seconds', str(args.seconds)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"读进程 {args.readers}，写线程 {args.writers}（每次写入 {STORES_PER_WRITE} 个店铺），{args.seconds} 秒")
+    print(f"{'配置':<10}{'日志模式':<10}{'读/秒':>10}{'读p99(ms)':>12}{'读最大(ms)':>12}"
+          f"{'写/秒':>10}{'读失败':>8}{'写失败':>8}")
+    for r in results:
+        print(f"{r['profile']:<10}{r['journal_mode']:<10}{r['reads_per_sec']:>10}{r['read_p99_ms']:>12}"
+              f"{r['read_max_ms']:>12}{r['writes_per_sec']:>10}{r['read_errors']:>8}{r['write_errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
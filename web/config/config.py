@@ -20,8 +20,32 @@ class Config:
         'pool_size': 10,
         'pool_recycle': 120,
         'pool_pre_ping': True
+    }  # 使用SQLite时去掉连接池参数（见 app/utils/sqlite.py）
+
+    # SQLite 连接参数与单写线程
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # 等待写锁的毫秒数
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # 读写互不阻塞
+        'synchronous': 'NORMAL',  # WAL下只在检查点时fsync
+        'cache_size': -64000,  # 页缓存（负数为KB）
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),  # 内存映射读取的字节数
+        'temp_store': 'MEMORY'
     }
-    
+    SQLITE_WRITE_QUEUE = os.environ.get('SQLITE_WRITE_QUEUE', 'true').lower() in ['true', 'on', '1']  # 爬取写入经单写线程合并提交
+    SQLITE_WRITE_BATCH_SIZE = int(os.environ.get('SQLITE_WRITE_BATCH_SIZE', 50))  # 单个事务最多合并的写任务数
+    SQLITE_WRITE_BATCH_WINDOW = int(os.environ.get('SQLITE_WRITE_BATCH_WINDOW', 0))  # 等待更多任务合并的毫秒数，0 表示只合并已排队的任务
+
+    # 只读副本（读写分离，见 app/utils/db_routing.py）
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]  # 逗号分隔
+    REPLICA_BLUEPRINTS = ['cities', 'business', 'analytics']  # 这些蓝图的GET请求读副本
+    REPLICA_MAX_LAG_SECONDS = int(os.environ.get('REPLICA_MAX_LAG_SECONDS', 10))  # 延迟超过后改读主库
+    REPLICA_LAG_CHECK_INTERVAL = int(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 5))  # 秒
+
+    # 店铺数据分片（见 app/utils/sharding.py），DATABASE_SHARD_URLS 格式为 "名称=URI,名称=URI"
+    SHARD_DATABASE_URIS = dict(item.split('=', 1) for item in os.environ.get('DATABASE_SHARD_URLS', '').split(',') if item)
+    SHARD_BY = os.environ.get('SHARD_BY', 'city')  # city 或 province
+    SHARD_MAP = {}  # {城市或省份ID: 分片名}，未列出的按哈希分配
+
     # JWT配置
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-string'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
@@ -56,6 +80,87 @@ class Config:
     # 数据分析配置
     DATA_REFRESH_INTERVAL = int(os.environ.get('DATA_REFRESH_INTERVAL') or 3600)  # 秒
     CACHE_TIMEOUT = int(os.environ.get('CACHE_TIMEOUT') or 300)  # 缓存超时时间（秒）
+    
+    # 响应编码配置
+    JSON_FAST_ENCODER = os.environ.get('JSON_FAST_ENCODER', 'true').lower() in ['true', 'on', '1']  # 安装orjson时启用
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE') or 20000)  # 预编码片段缓存条数
+    RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESSION_MIN_SIZE') or 1024)  # 字节
+    RESPONSE_COMPRESSION_LEVEL = int(os.environ.get('RESPONSE_COMPRESSION_LEVEL') or 6)
+    
+    # 搜索索引配置（SQLite FTS5）
+    SEARCH_INDEX_ENABLED = os.environ.get('SEARCH_INDEX_ENABLED', 'true').lower() in ['true', 'on', '1']
+    SEARCH_RANK_WEIGHTS = {
+        'text': 1.0,  # 文本相关度
+        'hot': 0.02,  # 热度值
+        'distance': 0.05  # 每公里扣分
+    }
+    
+    # 城市参考数据（内存前缀树/KD树）跨进程变更检查间隔（秒）
+    REFERENCE_DATA_CHECK_INTERVAL = int(os.environ.get('REFERENCE_DATA_CHECK_INTERVAL', 60))
+    
+    # 热度排行榜（内存有序索引）跨进程变更检查间隔（秒）
+    HOT_RANKING_CHECK_INTERVAL = int(os.environ.get('HOT_RANKING_CHECK_INTERVAL', 60))
+    
+    # 热力图瓦片金字塔（修改缩放范围或网格大小后需执行 flask heatmap rebuild）
+    HEATMAP_MIN_ZOOM = int(os.environ.get('HEATMAP_MIN_ZOOM', 3))
+    HEATMAP_MAX_ZOOM = int(os.environ.get('HEATMAP_MAX_ZOOM', 16))
+    HEATMAP_TILE_BINS = int(os.environ.get('HEATMAP_TILE_BINS', 16))  # 每个瓦片每边的网格数
+    HEATMAP_MAX_TILES = int(os.environ.get('HEATMAP_MAX_TILES', 48))  # 单次请求最多返回的瓦片数
+    
+    # 增量同步（?since=游标）
+    SYNC_SETTLE_SECONDS = int(os.environ.get('SYNC_SETTLE_SECONDS', 5))  # 只返回早于该时长的变更，容忍晚提交的事务
+    SYNC_MAX_CHANGES = int(os.environ.get('SYNC_MAX_CHANGES', 1000))  # 单次最多返回的变更行数
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+    
+    # 变更事件发件箱消费
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 500))
+    OUTBOX_SETTLE_SECONDS = int(os.environ.get('OUTBOX_SETTLE_SECONDS', 5))  # ID空洞等待未提交事务的时长
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 2))  # 独立消费者进程的轮询间隔（秒）
+    
+    # 分析批量查询接口
+    BATCH_MAX_QUERIES = int(os.environ.get('BATCH_MAX_QUERIES', 20))  # 单次最多子查询数
+    BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 4))  # 并发执行的线程数，1 表示在请求线程内依次执行
+    
+    # 城市仪表盘快照
+    DASHBOARD_SNAPSHOT_MAX_AGE = int(os.environ.get('DASHBOARD_SNAPSHOT_MAX_AGE', 3600))  # 秒，超过后在后台重新生成，0 表示只在爬取后生成
+    DASHBOARD_SNAPSHOT_WORKERS = int(os.environ.get('DASHBOARD_SNAPSHOT_WORKERS', 1))  # 后台生成线程数
+    
+    # 店铺分面搜索
+    STORE_SEARCH_CACHE_SIZE = int(os.environ.get('STORE_SEARCH_CACHE_SIZE', 2048))  # 缓存的筛选结果数
+    STORE_FACET_LIMIT = int(os.environ.get('STORE_FACET_LIMIT', 20))  # 子分类、标签分面最多返回的取值数
+    
+    # 商圈评分（爬取批次后由店铺数据重新计算热度、评分、人均消费）
+    AREA_SCORING_ENABLED = os.environ.get('AREA_SCORING_ENABLED', 'true').lower() in ['true', 'on', '1']
+    AREA_SCORING_WEIGHTS = {
+        'stores': 0.25,  # 店铺数量（对数）
+        'reviews': 0.3,  # 评价总数（对数）
+        'rating': 0.2,  # 贝叶斯平均评分
+        'recommended': 0.1,  # 推荐店铺占比
+        'diversity': 0.1,  # 分类多样性（熵）
+        'growth': 0.05  # 店铺数近期增长率
+    }
+    AREA_SCORING_RATING_PRIOR = int(os.environ.get('AREA_SCORING_RATING_PRIOR', 5))  # 评分先验的店铺数权重
+    AREA_SCORING_GROWTH_DAYS = int(os.environ.get('AREA_SCORING_GROWTH_DAYS', 7))  # 增长率窗口天数
+    
+    # 商圈发现（店铺密度聚类，flask discovery run）
+    DISCOVERY_EPS_METERS = int(os.environ.get('DISCOVERY_EPS_METERS', 150))  # 邻域半径（米）
+    DISCOVERY_MIN_SAMPLES = int(os.environ.get('DISCOVERY_MIN_SAMPLES', 10))  # 核心点邻域内的最少店铺数（含自身）
+    DISCOVERY_MIN_STORES = int(os.environ.get('DISCOVERY_MIN_STORES', 30))  # 候选商圈的最少店铺数
+    DISCOVERY_SUBGRID = int(os.environ.get('DISCOVERY_SUBGRID', 8))  # 密集格子之间连通判断的子网格边数
+    DISCOVERY_MATCH_SHARE = float(os.environ.get('DISCOVERY_MATCH_SHARE', 0.5))  # 对应现有商圈的店铺占比
+    DISCOVERY_OVERLAP_SHARE = float(os.environ.get('DISCOVERY_OVERLAP_SHARE', 0.2))  # 视为覆盖该商圈的店铺占比
+    
+    # 商圈边界与店铺归属（flask boundaries assign）
+    BOUNDARY_GRID_DEGREES = float(os.environ.get('BOUNDARY_GRID_DEGREES', 0.01))  # 边界网格索引的格子边长（度）
+    
+    # 店铺指标分布（分位数、直方图）
+    DISTRIBUTION_CACHE_AREAS = int(os.environ.get('DISTRIBUTION_CACHE_AREAS', 20000))  # 缓存排序数组的商圈数
+    
+    # 商圈详细数据后台刷新（crawl-details）
+    AREA_DETAILS_MAX_AGE_HOURS = int(os.environ.get('AREA_DETAILS_MAX_AGE_HOURS', 48))  # 超过后返回旧数据并后台刷新
+    AREA_REFRESH_WORKERS = int(os.environ.get('AREA_REFRESH_WORKERS', 2))  # 后台爬取线程数
+    AREA_REFRESH_RETRY_SECONDS = int(os.environ.get('AREA_REFRESH_RETRY_SECONDS', 60))  # 刷新结束后（失败或数据仍不完整）的重试间隔
+    AREA_REFRESH_STATUS_TTL = int(os.environ.get('AREA_REFRESH_STATUS_TTL', 600))  # 完成的任务状态保留秒数
 
 class DevelopmentConfig(Config):
     """开发环境配置"""
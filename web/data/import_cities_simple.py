@@ -292,6 +292,9 @@ if __name__ == '__main__':
     with app.app_context():
         success = import_cities_from_json()
         if success:
+            # 重新加载内存参考数据
+            from app.services import reference_data
+            reference_data.reload()
             print("城市数据导入完成！")
         else:
             print("城市数据导入失败！")
@@ -280,6 +280,10 @@ def init_cities():
         db.session.commit()
         print(f"成功初始化 {len(cities_data)} 个城市数据")
         
+        # 重新加载内存参考数据
+        from app.services import reference_data
+        reference_data.reload()
+        
     except Exception as e:
         db.session.rollback()
         print(f"初始化城市数据失败: {str(e)}")
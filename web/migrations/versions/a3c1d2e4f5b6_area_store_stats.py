@@ -0,0 +1,39 @@
+"""area store stats
+
+Revision ID: a3c1d2e4f5b6
+Revises: e97ecf833e75
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c1d2e4f5b6'
+down_revision = 'e97ecf833e75'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    counters = [
+        'store_count', 'recommended_count',
+        'restaurant_count', 'retail_count', 'entertainment_count', 'service_count',
+        'rated_count', 'high_rating_count', 'medium_rating_count', 'low_rating_count',
+        'priced_count', 'high_price_count', 'medium_price_count', 'low_price_count',
+    ]
+    op.create_table(
+        'area_store_stats',
+        sa.Column('business_area_id', sa.String(length=50), nullable=False),
+        *[sa.Column(name, sa.Integer(), nullable=False) for name in counters],
+        sa.Column('rating_sum', sa.Float(), nullable=False),
+        sa.Column('price_sum', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['business_area_id'], ['business_areas.id'], ),
+        sa.PrimaryKeyConstraint('business_area_id')
+    )
+
+
+def downgrade():
+    op.drop_table('area_store_stats')
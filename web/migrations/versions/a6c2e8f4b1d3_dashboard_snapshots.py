@@ -0,0 +1,35 @@
+"""per-city dashboard snapshots
+
+Revision ID: a6c2e8f4b1d3
+Revises: f3b8d1e5a7c2
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c2e8f4b1d3'
+down_revision = 'f3b8d1e5a7c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'dashboard_snapshots',
+        sa.Column('city_id', sa.String(length=20), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('etag', sa.String(length=80), nullable=False),
+        sa.Column('content_hash', sa.String(length=40), nullable=False),
+        sa.Column('body', sa.LargeBinary(length=2 ** 24 - 1), nullable=False),
+        sa.Column('body_gzip', sa.LargeBinary(length=2 ** 24 - 1), nullable=False),
+        sa.Column('body_br', sa.LargeBinary(length=2 ** 24 - 1), nullable=True),
+        sa.Column('generated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('city_id')
+    )
+
+
+def downgrade():
+    op.drop_table('dashboard_snapshots')
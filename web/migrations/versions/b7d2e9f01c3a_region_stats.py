@@ -0,0 +1,49 @@
+"""region stats
+
+Revision ID: b7d2e9f01c3a
+Revises: a3c1d2e4f5b6
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e9f01c3a'
+down_revision = 'a3c1d2e4f5b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    counters = [
+        'area_count', 'active_area_count', 'areas_with_coords', 'area_store_count',
+        'hot_value_sum', 'rated_area_count', 'store_count',
+        'high_rating_count', 'medium_rating_count', 'low_rating_count',
+        'high_price_count', 'medium_price_count', 'low_price_count',
+        'stores_with_rating', 'stores_with_phone',
+    ]
+    op.create_table(
+        'region_stats',
+        sa.Column('region_id', sa.String(length=20), nullable=False),
+        sa.Column('level', sa.Enum('city', 'district', name='region_level_enum'), nullable=False),
+        sa.Column('parent_id', sa.String(length=20), nullable=True),
+        *[sa.Column(name, sa.Integer(), nullable=False) for name in counters],
+        sa.Column('area_rating_sum', sa.Float(), nullable=False),
+        sa.Column('type_distribution', sa.Text(), nullable=True),
+        sa.Column('level_distribution', sa.Text(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('region_id')
+    )
+    with op.batch_alter_table('region_stats', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_region_stats_level'), ['level'], unique=False)
+        batch_op.create_index(batch_op.f('ix_region_stats_parent_id'), ['parent_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('region_stats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_region_stats_parent_id'))
+        batch_op.drop_index(batch_op.f('ix_region_stats_level'))
+
+    op.drop_table('region_stats')
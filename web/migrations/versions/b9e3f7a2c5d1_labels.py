@@ -0,0 +1,93 @@
+"""normalized tag/facility labels
+
+Revision ID: b9e3f7a2c5d1
+Revises: a6c2e8f4b1d3
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e3f7a2c5d1'
+down_revision = 'a6c2e8f4b1d3'
+branch_labels = None
+depends_on = None
+
+
+def _names(value):
+    try:
+        value = json.loads(value) if value else None
+    except (ValueError, TypeError):
+        return set()
+    if isinstance(value, dict):
+        value = [key for key, enabled in value.items() if enabled]
+    if not isinstance(value, list):
+        return set()
+    return {item.strip() for item in value if isinstance(item, str) and item.strip()}
+
+
+def _backfill(connection, source, association, owner_column, ids):
+    """从 tags/facilities JSON 字段填充关联表，ids 为已创建的标签 (类型, 名称) -> ID"""
+    labels = sa.table('labels', sa.column('id'), sa.column('kind'), sa.column('name'))
+    rows = []
+    for owner_id, tags, facilities in connection.execute(
+        sa.text(f'SELECT id, tags, facilities FROM {source}')
+    ):
+        for kind, value in (('tag', tags), ('facility', facilities)):
+            for name in _names(value):
+                if (kind, name) not in ids:
+                    connection.execute(labels.insert().values(kind=kind, name=name))
+                    ids[(kind, name)] = connection.execute(
+                        sa.select(labels.c.id).where(labels.c.kind == kind, labels.c.name == name)
+                    ).scalar()
+                rows.append({'label_id': ids[(kind, name)], owner_column: owner_id})
+    if rows:
+        table = sa.table(association, sa.column('label_id'), sa.column(owner_column))
+        connection.execute(table.insert(), rows)
+
+
+def upgrade():
+    op.create_table(
+        'labels',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.Enum('tag', 'facility', name='label_kind_enum'), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'name', name='uq_labels_kind_name')
+    )
+    op.create_table(
+        'area_labels',
+        sa.Column('label_id', sa.Integer(), nullable=False),
+        sa.Column('business_area_id', sa.String(length=50), nullable=False),
+        sa.ForeignKeyConstraint(['business_area_id'], ['business_areas.id'], ),
+        sa.ForeignKeyConstraint(['label_id'], ['labels.id'], ),
+        sa.PrimaryKeyConstraint('label_id', 'business_area_id')
+    )
+    op.create_index(op.f('ix_area_labels_business_area_id'), 'area_labels', ['business_area_id'], unique=False)
+    op.create_table(
+        'store_labels',
+        sa.Column('label_id', sa.Integer(), nullable=False),
+        sa.Column('store_id', sa.String(length=50), nullable=False),
+        sa.ForeignKeyConstraint(['label_id'], ['labels.id'], ),
+        sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+        sa.PrimaryKeyConstraint('label_id', 'store_id')
+    )
+    op.create_index(op.f('ix_store_labels_store_id'), 'store_labels', ['store_id'], unique=False)
+
+    # 迁移已有数据
+    connection = op.get_bind()
+    ids = {}
+    _backfill(connection, 'business_areas', 'area_labels', 'business_area_id', ids)
+    _backfill(connection, 'stores', 'store_labels', 'store_id', ids)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_store_labels_store_id'), table_name='store_labels')
+    op.drop_table('store_labels')
+    op.drop_index(op.f('ix_area_labels_business_area_id'), table_name='area_labels')
+    op.drop_table('area_labels')
+    op.drop_table('labels')
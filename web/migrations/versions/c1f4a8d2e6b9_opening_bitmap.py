@@ -0,0 +1,52 @@
+"""opening hours bitmap
+
+Revision ID: c1f4a8d2e6b9
+Revises: b9e3f7a2c5d1
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils import opening_hours
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1f4a8d2e6b9'
+down_revision = 'b9e3f7a2c5d1'
+branch_labels = None
+depends_on = None
+
+
+def _backfill(connection, source):
+    """由 opening_hours 文本生成位图（不改变 updated_at）"""
+    rows = [
+        {'_id': row_id, '_bitmap': opening_hours.encode(text)}
+        for row_id, text in connection.execute(
+            sa.text(f'SELECT id, opening_hours FROM {source} WHERE opening_hours IS NOT NULL')
+        )
+    ]
+    if rows:
+        connection.execute(
+            sa.text(f'UPDATE {source} SET opening_bitmap = :_bitmap WHERE id = :_id'), rows
+        )
+
+
+def upgrade():
+    with op.batch_alter_table('business_areas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('opening_bitmap', sa.LargeBinary(length=84), nullable=True))
+
+    with op.batch_alter_table('stores', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('opening_bitmap', sa.LargeBinary(length=84), nullable=True))
+
+    connection = op.get_bind()
+    _backfill(connection, 'business_areas')
+    _backfill(connection, 'stores')
+
+
+def downgrade():
+    with op.batch_alter_table('stores', schema=None) as batch_op:
+        batch_op.drop_column('opening_bitmap')
+
+    with op.batch_alter_table('business_areas', schema=None) as batch_op:
+        batch_op.drop_column('opening_bitmap')
@@ -0,0 +1,58 @@
+"""area metric history
+
+Revision ID: c4e8a1b2d9f0
+Revises: b7d2e9f01c3a
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a1b2d9f0'
+down_revision = 'b7d2e9f01c3a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'area_metric_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('city_id', sa.String(length=20), nullable=False),
+        sa.Column('period', sa.String(length=7), nullable=False),
+        sa.Column('business_area_id', sa.String(length=50), nullable=False),
+        sa.Column('captured_at', sa.DateTime(), nullable=False),
+        sa.Column('hot_value', sa.Integer(), nullable=True),
+        sa.Column('rating', sa.Float(), nullable=True),
+        sa.Column('store_count', sa.Integer(), nullable=True),
+        sa.Column('avg_consumption', sa.Float(), nullable=True),
+        sa.Column('customer_flow', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('area_metric_snapshots', schema=None) as batch_op:
+        batch_op.create_index('ix_area_metric_snapshots_partition', ['city_id', 'period'], unique=False)
+        batch_op.create_index(batch_op.f('ix_area_metric_snapshots_business_area_id'), ['business_area_id'], unique=False)
+
+    op.create_table(
+        'area_metric_series',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('city_id', sa.String(length=20), nullable=False),
+        sa.Column('resolution', sa.Enum('day', 'week', name='series_resolution_enum'), nullable=False),
+        sa.Column('bucket', sa.Date(), nullable=False),
+        sa.Column('area_ids', sa.Text(), nullable=False),
+        sa.Column('metrics', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('city_id', 'resolution', 'bucket', name='uq_area_metric_series_bucket')
+    )
+
+
+def downgrade():
+    op.drop_table('area_metric_series')
+    with op.batch_alter_table('area_metric_snapshots', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_area_metric_snapshots_business_area_id'))
+        batch_op.drop_index('ix_area_metric_snapshots_partition')
+
+    op.drop_table('area_metric_snapshots')
@@ -0,0 +1,37 @@
+"""heatmap tiles
+
+Revision ID: d5f1a7c3e2b4
+Revises: c4e8a1b2d9f0
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f1a7c3e2b4'
+down_revision = 'c4e8a1b2d9f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'heatmap_tiles',
+        sa.Column('layer', sa.Enum('area', 'store', name='heatmap_layer_enum'), nullable=False),
+        sa.Column('z', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('x', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('y', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('count', sa.Integer(), nullable=True),
+        sa.Column('hot_sum', sa.BigInteger(), nullable=True),
+        sa.Column('hot_max', sa.Integer(), nullable=True),
+        sa.Column('dominant_type', sa.String(length=20), nullable=True),
+        sa.Column('bins', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('layer', 'z', 'x', 'y')
+    )
+
+
+def downgrade():
+    op.drop_table('heatmap_tiles')
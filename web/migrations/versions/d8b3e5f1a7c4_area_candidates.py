@@ -0,0 +1,48 @@
+"""area candidates from store density clustering
+
+Revision ID: d8b3e5f1a7c4
+Revises: c1f4a8d2e6b9
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8b3e5f1a7c4'
+down_revision = 'c1f4a8d2e6b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('area_candidates',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('city_id', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.Enum('new', 'matched', 'merge', 'unsupported', name='candidate_status_enum'), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('radius', sa.Float(), nullable=False),
+        sa.Column('hull', sa.Text(), nullable=True),
+        sa.Column('store_count', sa.Integer(), nullable=False),
+        sa.Column('density', sa.Float(), nullable=False),
+        sa.Column('category_mix', sa.Text(), nullable=True),
+        sa.Column('matched_area_id', sa.String(length=50), nullable=True),
+        sa.Column('area_ids', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('area_candidates', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_area_candidates_city_id'), ['city_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_area_candidates_status'), ['status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_area_candidates_matched_area_id'), ['matched_area_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('area_candidates', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_area_candidates_matched_area_id'))
+        batch_op.drop_index(batch_op.f('ix_area_candidates_status'))
+        batch_op.drop_index(batch_op.f('ix_area_candidates_city_id'))
+
+    op.drop_table('area_candidates')
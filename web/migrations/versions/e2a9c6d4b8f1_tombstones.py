@@ -0,0 +1,52 @@
+"""tombstones and updated_at indexes for delta sync
+
+Revision ID: e2a9c6d4b8f1
+Revises: d5f1a7c3e2b4
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9c6d4b8f1'
+down_revision = 'd5f1a7c3e2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.Enum('area', 'store', name='tombstone_entity_enum'), nullable=False),
+        sa.Column('entity_id', sa.String(length=50), nullable=False),
+        sa.Column('city_id', sa.String(length=20), nullable=True),
+        sa.Column('business_area_id', sa.String(length=50), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('tombstones', schema=None) as batch_op:
+        batch_op.create_index('ix_tombstones_entity_deleted_at', ['entity', 'deleted_at'], unique=False)
+        batch_op.create_index('ix_tombstones_entity_id', ['entity', 'entity_id'], unique=False)
+
+    with op.batch_alter_table('business_areas', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_business_areas_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('stores', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stores_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('stores', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_stores_updated_at'))
+
+    with op.batch_alter_table('business_areas', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_business_areas_updated_at'))
+
+    with op.batch_alter_table('tombstones', schema=None) as batch_op:
+        batch_op.drop_index('ix_tombstones_entity_id')
+        batch_op.drop_index('ix_tombstones_entity_deleted_at')
+
+    op.drop_table('tombstones')
@@ -0,0 +1,36 @@
+"""area boundary polygons and store crawl area
+
+Revision ID: e5a9c2f7b3d6
+Revises: d8b3e5f1a7c4
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c2f7b3d6'
+down_revision = 'd8b3e5f1a7c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('business_areas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('boundary', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('boundary_source', sa.Enum('aoi', 'hull', 'manual', name='boundary_source_enum'), nullable=True))
+
+    with op.batch_alter_table('stores', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('crawl_area_id', sa.String(length=50), nullable=True))
+        batch_op.create_index(batch_op.f('ix_stores_crawl_area_id'), ['crawl_area_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('stores', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_stores_crawl_area_id'))
+        batch_op.drop_column('crawl_area_id')
+
+    with op.batch_alter_table('business_areas', schema=None) as batch_op:
+        batch_op.drop_column('boundary_source')
+        batch_op.drop_column('boundary')
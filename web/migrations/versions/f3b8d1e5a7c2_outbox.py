@@ -0,0 +1,44 @@
+"""change data capture outbox
+
+Revision ID: f3b8d1e5a7c2
+Revises: e2a9c6d4b8f1
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d1e5a7c2'
+down_revision = 'e2a9c6d4b8f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'outbox_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.Enum('area', 'store', name='outbox_entity_enum'), nullable=False),
+        sa.Column('entity_id', sa.String(length=50), nullable=False),
+        sa.Column('op', sa.Enum('insert', 'update', 'delete', name='outbox_op_enum'), nullable=False),
+        sa.Column('city_id', sa.String(length=20), nullable=True),
+        sa.Column('business_area_id', sa.String(length=50), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True
+    )
+    op.create_table(
+        'outbox_offsets',
+        sa.Column('handler', sa.String(length=100), nullable=False),
+        sa.Column('last_event_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('handler')
+    )
+
+
+def downgrade():
+    op.drop_table('outbox_offsets')
+    op.drop_table('outbox_events')